@@ -0,0 +1,40 @@
+"""Add composite time-range indexes for scheduling queries
+
+Revision ID: 3f9a1c7d2b84
+Revises: 7e22940322c0
+Create Date: 2025-10-28 10:12:31.208417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c7d2b84'
+down_revision: Union[str, Sequence[str], None] = '7e22940322c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 与 schedule/service.py 中的时间重叠查询对应:
+    #   <资源列> = / IN (...) AND start_time < :end AND end_time > :start
+    op.create_index('ix_shifts_location_time', 'shifts', ['location_id', 'start_time', 'end_time'], unique=False)
+    op.create_index('ix_shifts_technician_time', 'shifts', ['technician_id', 'start_time', 'end_time'], unique=False)
+    op.create_index('ix_appt_tech_links_tech_time', 'appointment_technician_links', ['technician_id', 'start_time', 'end_time'], unique=False)
+    op.create_index('ix_appt_resource_links_resource_time', 'appointment_resource_links', ['resource_id', 'start_time', 'end_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 链接表原来依赖 MySQL 为外键自动创建的索引，创建复合索引后它会被 MySQL 自动移除。
+    # 先补一个单列索引，否则外键会阻止删除复合索引。
+    op.create_index('ix_appt_resource_links_resource_id', 'appointment_resource_links', ['resource_id'], unique=False)
+    op.create_index('ix_appt_tech_links_technician_id', 'appointment_technician_links', ['technician_id'], unique=False)
+    op.drop_index('ix_appt_resource_links_resource_time', table_name='appointment_resource_links')
+    op.drop_index('ix_appt_tech_links_tech_time', table_name='appointment_technician_links')
+    op.drop_index('ix_shifts_technician_time', table_name='shifts')
+    op.drop_index('ix_shifts_location_time', table_name='shifts')
@@ -0,0 +1,31 @@
+"""Add per-service and per-location slot interval
+
+Revision ID: 5b8e2d4a9c13
+Revises: 3f9a1c7d2b84
+Create Date: 2025-11-03 15:40:12.583102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2d4a9c13'
+down_revision: Union[str, Sequence[str], None] = '3f9a1c7d2b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 可预约开始时间的步长：服务 > 地点 > 系统默认 (均为空时沿用原来的 10 分钟)
+    op.add_column('services', sa.Column('slot_interval_minutes', sa.Integer(), nullable=True, comment='in minutes'))
+    op.add_column('locations', sa.Column('slot_interval_minutes', sa.Integer(), nullable=True, comment='in minutes'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('locations', 'slot_interval_minutes')
+    op.drop_column('services', 'slot_interval_minutes')
@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# 性能基准测试脚本 (不参与线上运行)
+# 在 backend 目录下运行，例如: python -m benchmarks.bench_availability_engine
@@ -0,0 +1,150 @@
+# benchmarks/bench_assignment.py
+
+"""
+技师 / 房间分配策略的模拟对比 (src/modules/schedule/assignment.py)
+
+模拟一个门店的一天 (纯内存，不访问数据库)：
+    - 客户按随机顺序到来，每人想做一个服务，有一个期望的开始时间
+    - 用扫描线引擎计算当前的可用时间，客户接受距离期望时间最近、且相差不超过 --flex 分钟的时间，
+      否则放弃 (记为未接待)
+    - 接受后按策略在该时间空闲的技师 / 房间中选择，记为占用
+对同一批请求依次使用各个策略，输出每个策略实际接到的预约数和房间利用率。
+房间数少于技师数 (房间是瓶颈)，这也是分配策略影响最大的情况。
+
+用法 (在 backend 目录下，需要 .env 或等价的环境变量):
+    python -m benchmarks.bench_assignment
+    python -m benchmarks.bench_assignment --techs 10 --rooms 5 --requests 120 --days 50
+"""
+
+import argparse
+import bisect
+import random
+from datetime import date, datetime, timedelta
+
+from src.modules.schedule import assignment, engine
+from src.modules.schedule.snapshot import DaySchedule
+
+from .synthetic import SERVICE_SHAPES
+from .bench_availability_engine import LOCAL_TIMEZONE, SLOT_INTERVAL_MINUTES
+
+TARGET_DATE = date(2025, 10, 27)
+
+
+def build_requests(rng: random.Random, day_start: datetime, n_requests: int, services: list[str]):
+    """(服务UID, 期望开始时间) 列表，期望时间集中在下午和晚上"""
+    requests = []
+    for _ in range(n_requests):
+        minute = min(int(rng.triangular(9 * 60, 21 * 60, 15 * 60)) // 10 * 10, 20 * 60)
+        requests.append((rng.choice(services), day_start + timedelta(minutes=minute)))
+    return requests
+
+
+def build_location(rng: random.Random, day_start: datetime, n_techs: int, n_rooms: int):
+    """技师排班 (整班为主，少数两头班) 和技能"""
+    def at(minutes: int) -> datetime:
+        return day_start + timedelta(minutes=minutes)
+
+    services = {
+        f"service-{i}": (
+            timedelta(minutes=tech + buffer),
+            timedelta(minutes=room + buffer),
+        )
+        for i, (tech, room, buffer) in enumerate(SERVICE_SHAPES)
+    }
+    shifts, tech_services = {}, {}
+    for i in range(n_techs):
+        start = rng.choice(range(9 * 60, 12 * 60 + 1, 30))
+        if rng.random() < 0.2:
+            first_end = start + rng.choice((180, 240))
+            shifts[f"tech-{i}"] = [(at(start), at(first_end)), (at(first_end + 60), at(first_end + 60 + rng.choice((240, 300))))]
+        else:
+            shifts[f"tech-{i}"] = [(at(start), at(start + rng.choice((480, 540, 600))))]
+        tech_services[f"tech-{i}"] = frozenset(uid for uid in services if rng.random() < 0.8)
+    room_uids = [f"room-{i}" for i in range(n_rooms)]
+    return services, shifts, tech_services, room_uids
+
+
+def simulate(strategy: str, services, shifts, tech_services, room_uids, requests, flex: timedelta) -> tuple[int, timedelta]:
+    """按顺序处理请求，返回 (接到的预约数, 房间总占用时长)"""
+    schedule = DaySchedule(
+        location_uid="location",
+        target_date=TARGET_DATE,
+        version=None,
+        services=services,
+        tech_services=tech_services,
+        shifts=shifts,
+        room_uids=room_uids,
+        tech_bookings={},
+        room_bookings={},
+    )
+    day_start = datetime.combine(TARGET_DATE, datetime.min.time(), tzinfo=LOCAL_TIMEZONE)
+    day_end = datetime.combine(TARGET_DATE, datetime.max.time(), tzinfo=LOCAL_TIMEZONE)
+    search_start, search_end = engine.search_bounds(
+        (interval for intervals in shifts.values() for interval in intervals), day_start, day_end
+    )
+
+    accepted, room_time = 0, timedelta(0)
+    for service_uid, wanted in requests:
+        tech_duration, room_duration = services[service_uid]
+        starts = engine.sweep_available_starts(
+            tech_shifts=schedule.shifts_for(service_uid),
+            tech_bookings=schedule.tech_bookings,
+            room_uids=room_uids,
+            room_bookings=schedule.room_bookings,
+            tech_duration=tech_duration,
+            room_duration=room_duration,
+            search_start=search_start,
+            search_end=search_end,
+            step=timedelta(minutes=SLOT_INTERVAL_MINUTES),
+        )
+        start = min(starts, key=lambda s: (abs(s - wanted), s), default=None)
+        if start is None or abs(start - wanted) > flex:
+            continue
+
+        tech_end, room_end = start + tech_duration, start + room_duration
+        techs, rooms = schedule.free_candidates(service_uid, start, tech_end, room_end)
+        techs, rooms = assignment.rank_candidates(strategy, schedule, techs, rooms, start, tech_end, room_end)
+        bisect.insort(schedule.tech_bookings.setdefault(techs[0], []), (start, tech_end))
+        bisect.insort(schedule.room_bookings.setdefault(rooms[0], []), (start, room_end))
+        accepted += 1
+        room_time += room_duration
+    return accepted, room_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="技师 / 房间分配策略模拟")
+    parser.add_argument("--techs", type=int, default=8)
+    parser.add_argument("--rooms", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=80, help="每天的预约请求数")
+    parser.add_argument("--flex", type=int, default=60, help="客户能接受的与期望时间的最大偏差 (分钟)")
+    parser.add_argument("--days", type=int, default=30, help="模拟的天数 (每天随机生成排班和请求)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    day_start = datetime.combine(TARGET_DATE, datetime.min.time(), tzinfo=LOCAL_TIMEZONE)
+    flex = timedelta(minutes=args.flex)
+
+    totals = {name: [0, timedelta(0)] for name in assignment.STRATEGIES}
+    for _ in range(args.days):
+        services, shifts, tech_services, room_uids = build_location(rng, day_start, args.techs, args.rooms)
+        requests = build_requests(rng, day_start, args.requests, list(services))
+        for name in assignment.STRATEGIES:
+            accepted, room_time = simulate(name, services, shifts, tech_services, room_uids, requests, flex)
+            totals[name][0] += accepted
+            totals[name][1] += room_time
+
+    open_minutes = 12 * 60 * args.rooms * args.days # 09:00 ~ 21:00 (近似营业时间)
+    baseline = totals["first"][0]
+    print(
+        f"{args.techs} 技师 / {args.rooms} 房间 / 每天 {args.requests} 个请求 / 可偏差 {args.flex} 分钟 / {args.days} 天\n"
+    )
+    for name, (accepted, room_time) in totals.items():
+        print(
+            f"{name:<13} | 每天接到 {accepted / args.days:6.2f} 个预约 ({(accepted - baseline) / baseline:+6.1%}) | "
+            f"房间利用率 {room_time / timedelta(minutes=1) / open_minutes:6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# benchmarks/bench_availability_engine.py
+
+"""
+对比 旧版三重循环 (scan_slot_grid) 与 扫描线引擎 (sweep_available_starts)。
+另外对比每个时间的容量 (还能同时接的预约数)：逐个时间槽统计空闲技师 / 房间 (naive_slot_capacity)
+与扫描线容量引擎 (sweep_slot_capacity)。
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_availability_engine
+    python -m benchmarks.bench_availability_engine --techs 40 --rooms 30 --bookings 300 --repeat 20
+    python -m benchmarks.bench_availability_engine --step 5   # 更细的时间步长 (服务 / 地点的 slot_interval_minutes)
+
+每个场景都会先校验各算法的结果完全一致，再输出耗时。
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from src.modules.schedule import engine
+
+# 与 schedule/service.py 保持一致 (这里不直接 import service，避免加载数据库配置)
+LOCAL_TIMEZONE = timezone(timedelta(hours=8), 'Asia/Shanghai')
+SLOT_INTERVAL_MINUTES = 10
+
+
+def build_day(
+    rng: random.Random,
+    target_date: date,
+    n_techs: int,
+    n_rooms: int,
+    n_bookings: int,
+):
+    """随机生成一天的排班和预约 (每个技师 1~2 个排班，预约随机分配到技师和房间)"""
+    day_start = datetime.combine(target_date, datetime.min.time(), tzinfo=LOCAL_TIMEZONE)
+
+    def at(minutes: int) -> datetime:
+        return day_start + timedelta(minutes=minutes)
+
+    tech_shifts: dict[str, list[engine.Interval]] = {}
+    for i in range(n_techs):
+        start = rng.choice(range(7 * 60, 11 * 60, 5))
+        if rng.random() < 0.3:
+            # 早班 + 晚班，中间休息
+            mid = start + rng.choice(range(180, 300, 5))
+            tech_shifts[f"tech-{i}"] = [
+                (at(start), at(mid)),
+                (at(mid + 60), at(mid + 60 + rng.choice(range(180, 300, 5)))),
+            ]
+        else:
+            tech_shifts[f"tech-{i}"] = [(at(start), at(start + rng.choice(range(360, 600, 5))))]
+
+    room_uids = [f"room-{i}" for i in range(n_rooms)]
+    tech_bookings: dict[str, list[engine.Interval]] = {}
+    room_bookings: dict[str, list[engine.Interval]] = {}
+    tech_uids = list(tech_shifts)
+    for _ in range(n_bookings):
+        start = at(rng.choice(range(8 * 60, 20 * 60, 10)))
+        length = timedelta(minutes=rng.choice((45, 60, 75, 90, 105)))
+        tech_bookings.setdefault(rng.choice(tech_uids), []).append((start, start + length))
+        room_bookings.setdefault(rng.choice(room_uids), []).append((start, start + length))
+
+    return tech_shifts, tech_bookings, room_uids, room_bookings
+
+
+def naive_slot_capacity(
+    tech_shifts, tech_bookings, room_uids, room_bookings,
+    tech_duration, room_duration, search_start, search_end, step,
+) -> list[tuple[datetime, int]]:
+    """逐个时间槽统计所有空闲的合格技师和空闲房间，容量 = min(两者)，作为容量引擎的对照"""
+    result = []
+    current = search_start
+    while current < search_end:
+        tech_end = current + tech_duration
+        room_end = current + room_duration
+        free_techs = sum(
+            1 for tech_uid, shifts in tech_shifts.items()
+            if any(s <= current and e >= tech_end for s, e in shifts)
+            and not any(bs < tech_end and be > current for bs, be in tech_bookings.get(tech_uid, ()))
+        )
+        free_rooms = sum(
+            1 for room_uid in room_uids
+            if not any(bs < room_end and be > current for bs, be in room_bookings.get(room_uid, ()))
+        )
+        if min(free_techs, free_rooms) > 0:
+            result.append((current, min(free_techs, free_rooms)))
+        current += step
+    return result
+
+
+def time_call(fn, kwargs: dict, repeat: int) -> float:
+    """返回单次调用的平均耗时 (毫秒)"""
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        fn(**kwargs)
+    return (time.perf_counter() - begin) * 1000 / repeat
+
+
+def run_case(rng: random.Random, n_techs: int, n_rooms: int, n_bookings: int, repeat: int, step_minutes: int) -> None:
+    target_date = date(2025, 10, 27)
+    tech_shifts, tech_bookings, room_uids, room_bookings = build_day(
+        rng, target_date, n_techs, n_rooms, n_bookings
+    )
+    day_start = datetime.combine(target_date, datetime.min.time(), tzinfo=LOCAL_TIMEZONE)
+    day_end = datetime.combine(target_date, datetime.max.time(), tzinfo=LOCAL_TIMEZONE)
+    search_start, search_end = engine.search_bounds(
+        (s for shifts in tech_shifts.values() for s in shifts), day_start, day_end
+    )
+
+    kwargs = dict(
+        tech_shifts=tech_shifts,
+        tech_bookings=tech_bookings,
+        room_uids=room_uids,
+        room_bookings=room_bookings,
+        tech_duration=timedelta(minutes=75),
+        room_duration=timedelta(minutes=90),
+        search_start=search_start,
+        search_end=search_end,
+        step=timedelta(minutes=step_minutes),
+    )
+
+    legacy = engine.scan_slot_grid(**kwargs)
+    sweep = engine.sweep_available_starts(**kwargs)
+    assert legacy == sweep, "扫描线引擎与旧版算法结果不一致！"
+    capacity = engine.sweep_slot_capacity(**kwargs)
+    assert capacity == naive_slot_capacity(**kwargs), "容量引擎与逐槽统计结果不一致！"
+    assert [slot for slot, _ in capacity] == sweep, "容量引擎的时间与扫描线引擎不一致！"
+
+    legacy_ms = time_call(engine.scan_slot_grid, kwargs, repeat)
+    sweep_ms = time_call(engine.sweep_available_starts, kwargs, repeat)
+    naive_capacity_ms = time_call(naive_slot_capacity, kwargs, repeat)
+    capacity_ms = time_call(engine.sweep_slot_capacity, kwargs, repeat)
+    print(
+        f"techs={n_techs:>3} rooms={n_rooms:>3} bookings={n_bookings:>4} slots={len(sweep):>3} | "
+        f"legacy {legacy_ms:8.3f} ms | sweep {sweep_ms:7.3f} ms (x{legacy_ms / sweep_ms:5.1f}) | "
+        f"capacity naive {naive_capacity_ms:8.3f} ms, sweep {capacity_ms:7.3f} ms (x{naive_capacity_ms / capacity_ms:5.1f})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="可用时间计算引擎基准测试")
+    parser.add_argument("--techs", type=int, help="技师数量 (不指定则运行默认的一组场景)")
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--bookings", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--step", type=int, default=SLOT_INTERVAL_MINUTES, help="时间步长 (分钟)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.techs:
+        run_case(rng, args.techs, args.rooms, args.bookings, args.repeat, args.step)
+        return
+
+    # 默认场景：从小门店到最繁忙的门店
+    for n_techs, n_rooms, n_bookings in (
+        (3, 3, 10),
+        (10, 8, 40),
+        (25, 20, 150),
+        (50, 40, 400),
+    ):
+        run_case(rng, n_techs, n_rooms, n_bookings, args.repeat, args.step)
+
+
+if __name__ == "__main__":
+    main()
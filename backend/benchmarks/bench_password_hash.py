@@ -0,0 +1,97 @@
+# benchmarks/bench_password_hash.py
+
+"""
+管理员登录 (argon2 校验密码) 对事件循环的影响：
+在一批并发的管理员登录期间，同时持续发起 "客户请求" (一次很短的异步操作)，测量
+    - 事件循环延迟：一个每 1 ms 唤醒一次的探针任务，实际唤醒时间比预期晚了多少
+    - 客户请求延迟：p50 / p99
+分别对比
+    - 直接在协程中调用 verify_password (旧实现，阻塞事件循环)
+    - verify_password_async (在 password_executor 有界线程池中执行)
+
+用法 (在 backend 目录下，需要 .env 或等价的环境变量):
+    python -m benchmarks.bench_password_hash
+    python -m benchmarks.bench_password_hash --logins 100 --customers 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from src.modules.auth import service as auth_service
+
+from .bench_scheduling import percentile
+
+PASSWORD = "correct horse battery staple"
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    """每 1 ms 睡眠一次，记录实际多睡了多久"""
+    interval = 0.001
+    while not stop.is_set():
+        begin = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - begin - interval) * 1000)
+
+
+async def customer_request() -> float:
+    """模拟一个轻量的客户请求 (几次短暂的 I/O 等待)"""
+    begin = time.perf_counter()
+    for _ in range(3):
+        await asyncio.sleep(0.0005)
+    return (time.perf_counter() - begin) * 1000
+
+
+async def run(label: str, hashed: str, logins: int, customers: int, offload: bool) -> None:
+    async def admin_login() -> None:
+        if offload:
+            assert await auth_service.verify_password_async(PASSWORD, hashed)
+        else:
+            assert auth_service.verify_password(PASSWORD, hashed)
+
+    async def customer_stream(stop: asyncio.Event, latencies: list[float]) -> None:
+        while not stop.is_set():
+            latencies.append(await customer_request())
+
+    stop = asyncio.Event()
+    lags: list[float] = []
+    latencies: list[float] = []
+    background = [
+        asyncio.create_task(probe_loop_lag(stop, lags)),
+        *(asyncio.create_task(customer_stream(stop, latencies)) for _ in range(customers)),
+    ]
+    # 先让客户请求和探针跑起来，再发起登录
+    await asyncio.sleep(0.05)
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(admin_login() for _ in range(logins)))
+    login_elapsed = time.perf_counter() - begin
+    stop.set()
+    await asyncio.gather(*background)
+    latencies.sort()
+
+    lags.sort()
+    print(
+        f"{label:<8} | 登录 {logins / login_elapsed:6.1f} 次/秒 | "
+        f"事件循环延迟 p50 {percentile(lags, 50):7.2f} ms  p99 {percentile(lags, 99):7.2f} ms  "
+        f"max {lags[-1]:7.2f} ms | 客户请求 p50 {percentile(latencies, 50):6.2f} ms  "
+        f"p99 {percentile(latencies, 99):7.2f} ms (共 {len(latencies)} 次)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="argon2 密码校验对事件循环的影响")
+    parser.add_argument("--logins", type=int, default=40, help="并发的管理员登录数")
+    parser.add_argument("--customers", type=int, default=20, help="并发的客户请求流数量 (每个流串行发起请求，直到登录全部完成)")
+    args = parser.parse_args()
+
+    hashed = auth_service.get_password_hash(PASSWORD)
+    print(f"线程池: {auth_service.password_executor.workers} 线程, 排队上限 {auth_service.password_executor.max_queue}\n")
+
+    await run("阻塞", hashed, args.logins, args.customers, offload=False)
+    await run("线程池", hashed, args.logins, args.customers, offload=True)
+    print(f"\n线程池统计: {auth_service.password_executor.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
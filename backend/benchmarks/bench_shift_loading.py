@@ -0,0 +1,143 @@
+# benchmarks/bench_shift_loading.py
+
+"""
+排班加载基准测试：旧版 joinedload(User.shifts) vs 按时间窗口加载 (load_shift_intervals)。
+
+随着排班表积累的历史数据从 1k 行增长到 1M 行，分别测量两种方式加载 "某地点某一天" 排班的耗时，
+以及每次实际从数据库取回的排班行数。
+
+用法 (在 backend 目录下，需要 .env 或等价的环境变量，以及 aiosqlite):
+    python -m benchmarks.bench_shift_loading
+    python -m benchmarks.bench_shift_loading --sizes 1000 10000 100000 1000000
+
+数据库默认使用临时目录下的 SQLite 文件；也可以通过 --db-url 指向一个 *空的* 本地 MySQL 库。
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from src.shared.models import Base, Location, Service, Shift, User, technician_service_link_table
+from src.modules.schedule.service import LOCAL_TIMEZONE, _day_bounds, load_shift_intervals
+
+N_TECHS = 30
+TARGET_DATE = date(2025, 10, 27)
+
+
+async def seed(db: AsyncSession, n_shifts: int, rng: random.Random) -> tuple[str, str]:
+    """生成 1 个服务、2 个地点、N_TECHS 个技师，以及 n_shifts 条向过去延伸的排班历史"""
+    service = Service(name="推拿", technician_operation_duration=60, room_operation_duration=60, buffer_time=15)
+    locations = [Location(name="地点A"), Location(name="地点B")]
+    techs = [User(nickname=f"技师{i}", role="technician") for i in range(N_TECHS)]
+    db.add_all([service, *locations, *techs])
+    await db.flush()
+
+    await db.execute(
+        insert(technician_service_link_table),
+        [{"user_id": tech.uid, "service_id": service.uid} for tech in techs],
+    )
+
+    # 每个技师每天一条排班，从 TARGET_DATE 往前排，直到凑够 n_shifts 条
+    rows = []
+    day_start = datetime.combine(TARGET_DATE, datetime.min.time(), tzinfo=LOCAL_TIMEZONE)
+    for i in range(n_shifts):
+        tech = techs[i % N_TECHS]
+        start = day_start - timedelta(days=i // N_TECHS) + timedelta(minutes=rng.choice(range(480, 660, 30)))
+        rows.append({
+            "technician_id": tech.uid,
+            "location_id": rng.choice(locations).uid,
+            "start_time": start,
+            "end_time": start + timedelta(hours=8),
+        })
+        if len(rows) == 10_000:
+            await db.execute(insert(Shift), rows)
+            rows = []
+    if rows:
+        await db.execute(insert(Shift), rows)
+
+    await db.commit()
+    return service.uid, locations[0].uid
+
+
+async def legacy_load(db: AsyncSession, service_uid: str, location_uid: str) -> int:
+    """旧版查询：先查能做服务的技师，再 joinedload 他们的 *全部* 排班，返回加载的排班行数"""
+    day_start, day_end = _day_bounds(TARGET_DATE)
+    capable = (await db.execute(
+        select(User).join(User.service).where(Service.uid == service_uid)
+    )).scalars().all()
+    techs = (await db.execute(
+        select(User)
+        .options(joinedload(User.shifts))
+        .where(
+            User.uid.in_([tech.uid for tech in capable]),
+            User.shifts.any(and_(
+                Shift.location_id == location_uid,
+                Shift.start_time < day_end,
+                Shift.end_time > day_start
+            ))
+        )
+        .execution_options(populate_existing=True)
+    )).scalars().unique().all()
+    return sum(len(tech.shifts) for tech in techs)
+
+
+async def bounded_load(db: AsyncSession, service_uid: str, location_uid: str) -> int:
+    """新版查询：只加载窗口内的排班，返回加载的排班行数"""
+    day_start, day_end = _day_bounds(TARGET_DATE)
+    shifts_by_tech = await load_shift_intervals(db, service_uid, location_uid, day_start, day_end)
+    return sum(len(shifts) for shifts in shifts_by_tech.values())
+
+
+async def measure(session_factory, fn, service_uid: str, location_uid: str, repeat: int) -> tuple[float, int]:
+    """返回 (平均耗时 ms, 加载行数)；每次使用新的 session，避免 identity map 的影响"""
+    rows = 0
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        async with session_factory() as db:
+            rows = await fn(db, service_uid, location_uid)
+    return (time.perf_counter() - begin) * 1000 / repeat, rows
+
+
+async def run_size(db_url: str, n_shifts: int, repeat: int, rng: random.Random) -> None:
+    engine = create_async_engine(db_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+    async with session_factory() as db:
+        service_uid, location_uid = await seed(db, n_shifts, rng)
+
+    legacy_ms, legacy_rows = await measure(session_factory, legacy_load, service_uid, location_uid, repeat)
+    bounded_ms, bounded_rows = await measure(session_factory, bounded_load, service_uid, location_uid, repeat)
+    print(
+        f"shifts={n_shifts:>9,} | joinedload {legacy_ms:9.2f} ms ({legacy_rows:>9,} rows) | "
+        f"bounded {bounded_ms:7.2f} ms ({bounded_rows:>3} rows)"
+    )
+    await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="排班加载基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db-url", help="默认使用临时 SQLite 文件")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        for n_shifts in args.sizes:
+            await run_size(db_url, n_shifts, args.repeat, rng)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+# benchmarks/bench_wechat_login.py
+
+"""
+微信 code 换 openid (exchange_code_for_session) 的延迟对比：
+    - 每次登录新建 httpx.AsyncClient (旧实现，每次都要重新建立连接)
+    - 全局共享客户端 (连接池 + keep-alive)
+对端是本地桩服务 (benchmarks/wechat_stub.py)，用 --handshake-ms 模拟到 api.weixin.qq.com 的握手开销。
+
+用法 (在 backend 目录下，需要 .env 或等价的环境变量):
+    python -m benchmarks.bench_wechat_login
+    python -m benchmarks.bench_wechat_login --logins 2000 --concurrency 100 --handshake-ms 60 --fail-rate 0.02
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from src.core.config import settings
+from src.core import http_client
+from src.modules.auth import service as auth_service
+
+from .bench_scheduling import percentile
+from .wechat_stub import WechatStub
+
+
+async def run(label: str, stub: WechatStub, logins: int, concurrency: int, shared: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    failures = 0
+
+    async def login(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            begin = time.perf_counter()
+            try:
+                if shared:
+                    await auth_service.exchange_code_for_session(f"code-{i}")
+                else:
+                    async with httpx.AsyncClient() as client:
+                        await auth_service.exchange_code_for_session(f"code-{i}", client=client)
+            except Exception:
+                failures += 1
+            latencies.append((time.perf_counter() - begin) * 1000)
+
+    connections_before = stub.connections
+    begin = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - begin
+
+    values = sorted(latencies)
+    print(
+        f"{label:<10} | p50 {percentile(values, 50):7.2f} ms | p95 {percentile(values, 95):7.2f} ms | "
+        f"p99 {percentile(values, 99):7.2f} ms | {logins / elapsed:7.1f} 次/秒 | "
+        f"新建连接 {stub.connections - connections_before:>5} | 失败 {failures}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="微信登录 HTTP 客户端基准测试")
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--handshake-ms", type=float, default=30)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="桩服务返回 503 的比例 (验证重试)")
+    args = parser.parse_args()
+
+    stub = WechatStub(args.handshake_ms, args.latency_ms, args.fail_rate)
+    settings.WECHAT_API_BASE = await stub.start()
+    print(f"桩服务: {settings.WECHAT_API_BASE} | 握手 {args.handshake_ms} ms | 处理 {args.latency_ms} ms\n")
+
+    await run("每次新建", stub, args.logins, args.concurrency, shared=False)
+    await run("共享连接池", stub, args.logins, args.concurrency, shared=True)
+
+    await http_client.close_http_client()
+    await stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
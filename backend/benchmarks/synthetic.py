@@ -0,0 +1,191 @@
+# benchmarks/synthetic.py
+
+"""
+调度核心的合成数据生成器 (供各个基准测试脚本使用)
+
+按给定规模生成 地点、房间、技师、技能、排班、客户、预约，数据形态尽量接近真实门店：
+    - 每个技师有一个常驻地点，偶尔 (SECOND_LOCATION_RATE) 去其他地点上班
+    - 每周休息约 1 天；大部分是 8~10 小时的整班，少数是中间休息 1 小时的两头班
+    - 预约按 --utilization (技师排班时间被预约占用的比例) 填充到排班中，
+      房间在同一地点内选择空闲的，保证数据本身没有重复预约
+    - 排班 / 预约从 start_date 往前延伸 history_days 天，模拟积累的历史数据
+
+所有数据用 Core insert 批量写入，生成百万级排班也只需要几十秒。
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+import ulid
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.shared.models import (
+    Appointment, AppointmentResourceLink, Location, Resource, Service, Shift, User,
+    technician_service_link_table
+)
+from src.shared.models.appointment_models import AppointmentTechnicianLink
+from src.modules.schedule.service import LOCAL_TIMEZONE
+
+BATCH_SIZE = 5_000
+SECOND_LOCATION_RATE = 0.15
+SPLIT_SHIFT_RATE = 0.2
+N_CUSTOMERS = 200
+
+# (技师操作时长, 房间操作时长, 缓冲时间) 分钟
+SERVICE_SHAPES = [(30, 30, 10), (45, 45, 15), (60, 60, 15), (60, 75, 15), (90, 90, 15), (30, 45, 10)]
+
+
+def _new_uid() -> str:
+    return str(ulid.new())
+
+
+async def _bulk_insert(db, model, rows: list[dict]) -> None:
+    for i in range(0, len(rows), BATCH_SIZE):
+        await db.execute(insert(model), rows[i:i + BATCH_SIZE])
+
+
+def _day_shifts(rng: random.Random, day_start: datetime) -> list[tuple[datetime, datetime]]:
+    """某个技师某一天的排班 (整班或两头班)"""
+    start = day_start + timedelta(minutes=rng.choice(range(8 * 60, 11 * 60 + 1, 30)))
+    if rng.random() < SPLIT_SHIFT_RATE:
+        first_end = start + timedelta(hours=rng.choice((3, 4)))
+        second_start = first_end + timedelta(hours=1)
+        return [(start, first_end), (second_start, second_start + timedelta(hours=rng.choice((4, 5))))]
+    return [(start, start + timedelta(hours=rng.choice((8, 9, 10))))]
+
+
+async def generate(
+    session_factory: async_sessionmaker,
+    rng: random.Random,
+    *,
+    locations: int = 3,
+    rooms: int = 6,
+    technicians: int = 30,
+    services: int = 6,
+    skills: int = 3,
+    start_date: date,
+    days: int = 14,
+    history_days: int = 60,
+    utilization: float = 0.5,
+) -> dict:
+    """
+    生成数据并写入数据库，返回基准测试需要的 UID：
+        {"locations": [...], "services": [...], "customers": [...],
+         "technicians": [...], "shifts": 排班数, "appointments": 预约数}
+
+    - rooms:       每个地点的房间数
+    - skills:      每个技师能做的服务数
+    - days:        start_date 起向后的排班天数 (即可以查询 / 预约的天数)
+    - history_days: start_date 之前的历史天数
+    - utilization: 排班时间中被预约占用的比例 (0~1)
+    """
+    async with session_factory() as db:
+        # 1. 地点、房间、服务
+        location_rows = [{"uid": _new_uid(), "name": f"门店{i}"} for i in range(locations)]
+        room_rows = [
+            {"uid": _new_uid(), "name": f"{i}号床", "location_id": location["uid"]}
+            for location in location_rows for i in range(rooms)
+        ]
+        service_rows = []
+        for i in range(services):
+            tech_minutes, room_minutes, buffer_minutes = SERVICE_SHAPES[i % len(SERVICE_SHAPES)]
+            service_rows.append({
+                "uid": _new_uid(),
+                "name": f"服务{i}",
+                "technician_operation_duration": tech_minutes,
+                "room_operation_duration": room_minutes,
+                "buffer_time": buffer_minutes,
+            })
+        await _bulk_insert(db, Location, location_rows)
+        await _bulk_insert(db, Resource, room_rows)
+        await _bulk_insert(db, Service, service_rows)
+
+        # 2. 技师 (含技能) 和客户
+        tech_rows = [{"uid": _new_uid(), "nickname": f"技师{i}", "role": "technician"} for i in range(technicians)]
+        customer_rows = [{"uid": _new_uid(), "nickname": f"客户{i}", "role": "customer"} for i in range(N_CUSTOMERS)]
+        await _bulk_insert(db, User, tech_rows + customer_rows)
+
+        tech_skills: dict[str, list[dict]] = {}
+        skill_rows = []
+        for tech in tech_rows:
+            tech_skills[tech["uid"]] = rng.sample(service_rows, min(skills, len(service_rows)))
+            skill_rows.extend({"user_id": tech["uid"], "service_id": service["uid"]} for service in tech_skills[tech["uid"]])
+        await db.execute(insert(technician_service_link_table), skill_rows)
+
+        # 3. 排班 + 预约 (逐个技师、逐天生成)
+        rooms_by_location: dict[str, list[str]] = {}
+        for room in room_rows:
+            rooms_by_location.setdefault(room["location_id"], []).append(room["uid"])
+        # 房间占用 {(房间UID, 日期): [(开始, 结束)]}，用于给预约挑选空闲房间
+        room_busy: dict[tuple[str, date], list[tuple[datetime, datetime]]] = {}
+
+        shift_rows, appointment_rows, tech_link_rows, room_link_rows = [], [], [], []
+        first_day = start_date - timedelta(days=history_days)
+        for tech in tech_rows:
+            home = rng.choice(location_rows)["uid"]
+            day_off = rng.randrange(7)
+            for offset in range(history_days + days):
+                day = first_day + timedelta(days=offset)
+                if day.weekday() == day_off:
+                    continue
+                location_uid = home
+                if len(location_rows) > 1 and rng.random() < SECOND_LOCATION_RATE:
+                    location_uid = rng.choice([l["uid"] for l in location_rows if l["uid"] != home])
+                day_start = datetime.combine(day, datetime.min.time(), tzinfo=LOCAL_TIMEZONE)
+
+                for shift_start, shift_end in _day_shifts(rng, day_start):
+                    shift_rows.append({
+                        "uid": _new_uid(), "technician_id": tech["uid"], "location_id": location_uid,
+                        "start_time": shift_start, "end_time": shift_end,
+                    })
+
+                    # 沿排班向后放预约，空档长度按 utilization 随机
+                    cursor = shift_start
+                    while True:
+                        service = rng.choice(tech_skills[tech["uid"]])
+                        tech_len = timedelta(minutes=service["technician_operation_duration"] + service["buffer_time"])
+                        room_len = timedelta(minutes=service["room_operation_duration"] + service["buffer_time"])
+                        gap = tech_len * (1 - utilization) / max(utilization, 0.01) * rng.uniform(0, 2)
+                        start = cursor + timedelta(minutes=int(gap / timedelta(minutes=10)) * 10)
+                        if start + tech_len > shift_end:
+                            break
+                        cursor = start + tech_len
+
+                        room_uid = next((
+                            uid for uid in rooms_by_location[location_uid]
+                            if not any(s < start + room_len and e > start for s, e in room_busy.get((uid, day), ()))
+                        ), None)
+                        if room_uid is None:
+                            continue
+                        room_busy.setdefault((room_uid, day), []).append((start, start + room_len))
+
+                        appointment_uid = _new_uid()
+                        appointment_rows.append({
+                            "uid": appointment_uid, "customer_id": rng.choice(customer_rows)["uid"],
+                            "service_id": service["uid"], "location_id": location_uid,
+                            "status": "completed" if day < start_date else "confirmed", "start_time": start,
+                        })
+                        tech_link_rows.append({
+                            "uid": _new_uid(), "appointment_id": appointment_uid, "technician_id": tech["uid"],
+                            "start_time": start, "end_time": start + tech_len,
+                        })
+                        room_link_rows.append({
+                            "uid": _new_uid(), "appointment_id": appointment_uid, "resource_id": room_uid,
+                            "start_time": start, "end_time": start + room_len,
+                        })
+
+        await _bulk_insert(db, Shift, shift_rows)
+        await _bulk_insert(db, Appointment, appointment_rows)
+        await _bulk_insert(db, AppointmentTechnicianLink, tech_link_rows)
+        await _bulk_insert(db, AppointmentResourceLink, room_link_rows)
+        await db.commit()
+
+    return {
+        "locations": [l["uid"] for l in location_rows],
+        "services": [s["uid"] for s in service_rows],
+        "customers": [c["uid"] for c in customer_rows],
+        "technicians": [t["uid"] for t in tech_rows],
+        "shifts": len(shift_rows),
+        "appointments": len(appointment_rows),
+    }
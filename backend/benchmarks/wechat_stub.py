@@ -0,0 +1,94 @@
+# benchmarks/wechat_stub.py
+
+"""
+本地微信 API 桩服务 (只实现 GET /sns/jscode2session)
+
+用于压测和调试登录流程，不需要真实的 AppID / 网络。
+为了模拟访问 api.weixin.qq.com 的开销：
+    --handshake-ms  每个 *新连接* 的额外延迟 (模拟 TCP + TLS 握手)，keep-alive 复用的连接没有这部分
+    --latency-ms    每个请求的处理延迟
+    --fail-rate     以一定比例返回 503，用于验证重试
+
+用法 (在 backend 目录下):
+    python -m benchmarks.wechat_stub --port 8900
+    WECHAT_API_BASE=http://127.0.0.1:8900 uvicorn src.main:app ...
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from urllib.parse import parse_qs, urlsplit
+
+
+class WechatStub:
+    """一个极简的 HTTP/1.1 keep-alive 服务"""
+    __slots__ = ("handshake", "latency", "fail_rate", "connections", "requests", "_server")
+
+    def __init__(self, handshake_ms: float = 30, latency_ms: float = 10, fail_rate: float = 0.0):
+        self.handshake = handshake_ms / 1000
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.connections = 0
+        self.requests = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """启动服务，返回 base url (port=0 时使用随机端口)"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.handshake)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line = head.split(b"\r\n", 1)[0].decode()
+                _, target, _ = request_line.split(" ", 2)
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+
+                url = urlsplit(target)
+                if random.random() < self.fail_rate:
+                    status, body = "503 Service Unavailable", {"errcode": -1, "errmsg": "system busy"}
+                elif url.path != "/sns/jscode2session":
+                    status, body = "404 Not Found", {"errcode": 404, "errmsg": "not found"}
+                else:
+                    code = parse_qs(url.query).get("js_code", [""])[0]
+                    status, body = "200 OK", {"openid": f"stub-{code}", "session_key": "stub-session-key"}
+
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="本地微信 API 桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--handshake-ms", type=float, default=30)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = WechatStub(args.handshake_ms, args.latency_ms, args.fail_rate)
+    print(f"微信桩服务运行在 {await stub.start(args.host, args.port)}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
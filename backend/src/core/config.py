@@ -1,7 +1,19 @@
 # qingyuan-new-life/backend/src/core/config.py
 import os
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import Literal, Optional
+
+# 各环境的数据库引擎参数
+#   pool_size / max_overflow: 常驻连接数 / 高峰时允许额外创建的连接数 (每个 worker 进程)
+#   pool_recycle:             连接最长使用时间，需小于 MySQL 的 wait_timeout
+#   pool_timeout:             连接池耗尽时等待空闲连接的最长时间，超时抛出异常
+#   echo:                     打印每条 SQL (同步写日志，只在开发环境开启)
+#   query_cache_size:         SQLAlchemy 编译后语句的缓存条数
+DB_ENGINE_PROFILES = {
+    "dev":  {"pool_size": 5,  "max_overflow": 5,  "pool_recycle": 3600, "pool_timeout": 30, "echo": True,  "query_cache_size": 500},
+    "test": {"pool_size": 5,  "max_overflow": 10, "pool_recycle": 1800, "pool_timeout": 10, "echo": False, "query_cache_size": 500},
+    "prod": {"pool_size": 20, "max_overflow": 10, "pool_recycle": 1800, "pool_timeout": 5,  "echo": False, "query_cache_size": 1200},
+}
 
 class Settings(BaseSettings):
     """
@@ -26,6 +38,21 @@ class Settings(BaseSettings):
     MYSQL_PORT: int
     DB_NAME: str = "qy_dev"
 
+    # 只读副本 (可选)：设置 MYSQL_REPLICA_HOST 后，get_read_db 会把只读请求路由到副本
+    # 副本延迟超过 DB_REPLICA_MAX_LAG_SECONDS 或不可达时自动退回主库 (每 DB_REPLICA_CHECK_INTERVAL_SECONDS 检查一次)
+    MYSQL_REPLICA_HOST: Optional[str] = None
+    MYSQL_REPLICA_PORT: Optional[int] = None
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5.0
+
+    # 数据库连接池 / 引擎参数，默认按 ENVIRONMENT 取 DB_ENGINE_PROFILES 中的值，这里设置后覆盖
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_RECYCLE_SECONDS: Optional[int] = None
+    DB_POOL_TIMEOUT_SECONDS: Optional[float] = None
+    DB_ECHO: Optional[bool] = None
+    DB_STATEMENT_CACHE_SIZE: Optional[int] = None
+
     # --- redis 配置 ---
     REDIS_PASSWORD: str
 
@@ -37,6 +64,31 @@ class Settings(BaseSettings):
             f"{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.DB_NAME}"
         )
 
+    @property
+    def REPLICA_DATABASE_URI(self) -> Optional[str]:
+        """计算属性：只读副本的连接 URI (账号、库名与主库相同)；未配置副本时为 None"""
+        if not self.MYSQL_REPLICA_HOST:
+            return None
+        return (
+            f"mysql+asyncmy://{self.MYSQL_USERNAME}:{self.MYSQL_PASSWORD}@"
+            f"{self.MYSQL_REPLICA_HOST}:{self.MYSQL_REPLICA_PORT or self.MYSQL_PORT}/{self.DB_NAME}"
+        )
+
+    @property
+    def DB_ENGINE_OPTIONS(self) -> dict:
+        """计算属性：当前环境的 create_async_engine 参数 (环境默认值 + DB_* 覆盖)"""
+        options = dict(DB_ENGINE_PROFILES[self.ENVIRONMENT])
+        overrides = {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_recycle": self.DB_POOL_RECYCLE_SECONDS,
+            "pool_timeout": self.DB_POOL_TIMEOUT_SECONDS,
+            "echo": self.DB_ECHO,
+            "query_cache_size": self.DB_STATEMENT_CACHE_SIZE,
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return options
+
     # --- 腾讯云与 COS 配置 ---
     COS_BUCKET: str
     TENCENT_SECRET_ID: str
@@ -55,6 +107,9 @@ class Settings(BaseSettings):
     XHS_APP_ID: str
     XHS_APP_SECRET: str
 
+    # 微信 API 地址 (压测时可以指向本地桩服务，见 benchmarks/wechat_stub.py)
+    WECHAT_API_BASE: str = "https://api.weixin.qq.com"
+
     # --- 微信公众号配置 ---
     WECHAT_MP_APP_ID: str
     WECHAT_MP_APP_SECRET: str
@@ -65,6 +120,56 @@ class Settings(BaseSettings):
 
     #REDIS_URL: str = property(lambda self: f"redis://:{self.REDIS_PASSWORD}@{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', 6379)}/0")
     REDIS_URL: str = "redis://localhost:6379"
+
+    # --- 预约调度配置 ---
+    # 可用时间槽 Redis 缓存 (预约 / 排班变更时会精确失效，TTL 只是兜底)
+    AVAILABILITY_CACHE_ENABLED: bool = True
+    AVAILABILITY_CACHE_TTL_SECONDS: int = 300
+    # 预约保留 (POST /schedule/holds)；关闭后不再读取 Redis 中的保留
+    SLOT_HOLDS_ENABLED: bool = True
+    SLOT_HOLD_TTL_SECONDS: int = 300
+    # 进程内缓存的 DaySchedule 快照 (地点 × 日期) 数量上限，0 表示不缓存
+    DAY_SCHEDULE_CACHE_SIZE: int = 256
+    # 创建预约 / 保留时的技师、房间分配策略 (见 schedule/assignment.py):
+    # "first" (按 UID), "best_fit" (留下的碎片最少), "least_loaded" (当天占用最少)
+    APPOINTMENT_ASSIGNMENT_STRATEGY: Literal["first", "best_fit", "least_loaded"] = "best_fit"
+
+    # --- 登录用户缓存 (get_current_user) ---
+    # L1 为进程内缓存 (其 TTL 即跨进程失效的最大延迟)，L2 为 Redis
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: int = 300
+    USER_CACHE_LOCAL_TTL_SECONDS: int = 10
+    USER_CACHE_LOCAL_SIZE: int = 4096
+
+    # --- 按请求的 SQL 统计 (见 src/core/metrics.py) ---
+    # 响应头 X-SQL-*：默认只在非生产环境开启
+    SQL_STATS_HEADERS: Optional[bool] = None
+    # 同一形状的 SQL 在一个请求内执行超过此次数时视为 N+1，打印警告
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10
+    # 请求中最慢的一条 SQL 超过此时间 (毫秒) 时打印警告
+    SQL_SLOW_STATEMENT_MS: float = 200
+
+    # 事件循环延迟的采样间隔 (秒)，见 GET /metrics 中的 event_loop_lag_seconds
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+
+    # --- 应用启动 ---
+    # 启动时预先建立的数据库连接数 (不应超过连接池大小)
+    DB_POOL_WARM_CONNECTIONS: int = 5
+
+    # --- 外部 HTTP 调用 (共享连接池，见 src/core/http_client.py) ---
+    HTTP_TIMEOUT_SECONDS: float = 5.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    # 请求发出前失败 (连接失败 / 连接超时 / 连接池排队超时) 时的重试次数和首次退避时间 (之后每次翻倍)
+    HTTP_RETRIES: int = 2
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.2
+
+    # --- 密码哈希线程池 (argon2，见 src/core/executors.py) ---
+    PASSWORD_HASH_WORKERS: int = 2
+    # 排队中的 hash / verify 超过此数量时直接返回 503
+    PASSWORD_HASH_MAX_QUEUE: int = 64
     
     class Config:
         case_sensitive = True
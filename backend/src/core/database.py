@@ -1,19 +1,136 @@
 # src/core/database.py
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import asyncio
+import threading
+import time
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.exc import DBAPIError, ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from typing import AsyncGenerator
 
 # 从您的 config.py 导入 settings 实例
 from src.core.config import settings
 
+# 0. 连接池指标
+class PoolStats:
+    """
+    一个连接池的累计指标 (进程内)：取连接次数、等待时间、超时次数、溢出连接的使用情况、新建连接数。
+    当前的连接占用情况 (已借出 / 空闲 / 溢出) 直接从连接池读取，见 pool_status()。
+    """
+    __slots__ = (
+        "_lock", "checkouts", "timeouts", "wait_total", "wait_max",
+        "overflow_checkouts", "overflow_max", "connects",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0           # 等待超过 pool_timeout 而失败的次数
+        self.wait_total = 0.0       # 秒
+        self.wait_max = 0.0
+        self.overflow_checkouts = 0 # 取到连接时连接池已处于溢出状态 (超出 pool_size) 的次数
+        self.overflow_max = 0
+        self.connects = 0           # 新建的数据库连接数
+
+    def record_wait(self, wait: float, timed_out: bool) -> None:
+        with self._lock:
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_checkout(self, overflow: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.overflow_max = max(self.overflow_max, overflow)
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / attempts * 1000, 3) if attempts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "overflow_checkouts": self.overflow_checkouts,
+                "overflow_max": self.overflow_max,
+                "connects": self.connects,
+            }
+
+
+# 按连接池名称 (create_async_engine 的 pool_logging_name) 区分主库 / 只读副本
+pool_stats = {"primary": PoolStats(), "replica": PoolStats()}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    记录每次取连接的等待时间 (包括连接池耗尽时排队等待、新建连接和 pre-ping 的时间)，
+    以及等待超过 pool_timeout 的次数。计时包在公开的 Pool.connect() 外面。
+    """
+
+    def connect(self):
+        stats = pool_stats[self.logging_name]
+        begin = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            stats.record_wait(time.perf_counter() - begin, timed_out=True)
+            raise
+        stats.record_wait(time.perf_counter() - begin, timed_out=False)
+        return connection
+
+
+def _instrument_pool(engine: AsyncEngine, stats: PoolStats) -> None:
+    """通过连接池事件记录取连接次数、溢出情况和新建连接数 (engine.dispose() 重建连接池后仍然生效)"""
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+        stats.record_checkout(engine.pool.overflow())
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        stats.record_connect()
+
+
+def _pool_status(engine: AsyncEngine, stats: PoolStats) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_ENGINE_OPTIONS["max_overflow"],
+        **stats.snapshot(),
+    }
+
+
 # 1. 创建异步引擎
-#    我们直接使用您在 config.py 中定义的 DATABASE_URI
+#    连接池大小、echo 等参数按 ENVIRONMENT 取值 (见 config.py 中的 DB_ENGINE_PROFILES)
 engine = create_async_engine(
     settings.DATABASE_URI,
-    echo=True,  # 在开发环境中打印 SQL 语句，方便调试
-    pool_pre_ping=True
+    poolclass=TimedQueuePool,
+    pool_logging_name="primary",
+    pool_pre_ping=True,
+    **settings.DB_ENGINE_OPTIONS
 )
+_instrument_pool(engine, pool_stats["primary"])
+
+
+def pool_status() -> dict:
+    """主库连接池当前状态 + 累计指标；配置了只读副本时，副本的同样指标在 "replica" 中"""
+    return {
+        **_pool_status(engine, pool_stats["primary"]),
+        "replica": _pool_status(replica_engine, pool_stats["replica"]) if replica_engine is not None else None,
+    }
 
 # 2. 创建异步会话工厂
 AsyncSessionLocal = async_sessionmaker(
@@ -43,4 +160,105 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+# 5. 只读副本 (可选)
+#    设置了 MYSQL_REPLICA_HOST 时创建；副本会话带有 info["replica"] = True，
+#    service 层据此判断读到的数据可能比主库落后 (最多 DB_REPLICA_MAX_LAG_SECONDS)
+replica_engine = (
+    create_async_engine(
+        settings.REPLICA_DATABASE_URI,
+        poolclass=TimedQueuePool,
+        pool_logging_name="replica",
+        pool_pre_ping=True,
+        **settings.DB_ENGINE_OPTIONS
+    )
+    if settings.REPLICA_DATABASE_URI else None
+)
+if replica_engine is not None:
+    _instrument_pool(replica_engine, pool_stats["replica"])
+
+ReplicaSessionLocal = async_sessionmaker(
+    bind=replica_engine,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    info={"replica": True},
+) if replica_engine is not None else None
+
+
+class ReplicaHealth:
+    """副本的最近一次检查结果 (进程内，每 DB_REPLICA_CHECK_INTERVAL_SECONDS 最多检查一次)"""
+    __slots__ = ("healthy", "lag", "checked_at", "_lock")
+
+    def __init__(self):
+        self.healthy = False
+        self.lag: float | None = None
+        self.checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> None:
+        """查询副本的复制延迟；查询失败 (不可达 / 没有权限) 或复制已停止时视为不可用"""
+        try:
+            async with replica_engine.connect() as conn:
+                try:
+                    row = (await conn.execute(text("SHOW REPLICA STATUS"))).mappings().first()
+                    lag_column = "Seconds_Behind_Source"
+                except ProgrammingError:  # MySQL 8.0.22 之前的版本
+                    row = (await conn.execute(text("SHOW SLAVE STATUS"))).mappings().first()
+                    lag_column = "Seconds_Behind_Master"
+            self.lag = row.get(lag_column) if row else None
+        except Exception as e:
+            print(f"检查只读副本失败: {e}")
+            self.lag = None
+
+        was_healthy = self.healthy
+        self.healthy = self.lag is not None and self.lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        self.checked_at = time.monotonic()
+        if was_healthy and not self.healthy:
+            print(f"只读副本不可用 (延迟: {self.lag})，只读请求退回主库")
+
+    async def available(self) -> bool:
+        """副本当前是否可用 (检查结果过期时重新检查，并发请求只检查一次)"""
+        if replica_engine is None:
+            return False
+        if time.monotonic() - self.checked_at > settings.DB_REPLICA_CHECK_INTERVAL_SECONDS:
+            async with self._lock:
+                if time.monotonic() - self.checked_at > settings.DB_REPLICA_CHECK_INTERVAL_SECONDS:
+                    await self.check()
+        return self.healthy
+
+    def mark_down(self) -> None:
+        """请求中发现副本连接断开：立即标记为不可用，下次检查前都使用主库"""
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth()
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI 依赖项，用于只读接口：副本可用时返回副本会话，否则返回主库会话。
+    副本的数据可能落后主库最多 DB_REPLICA_MAX_LAG_SECONDS 秒，
+    需要 "读到自己刚写入的数据" 或会写入的接口必须使用 get_db。
+    """
+    session_factory = ReplicaSessionLocal if await replica_health.available() else AsyncSessionLocal
+    async with session_factory() as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            if e.connection_invalidated and is_replica_session(session):
+                replica_health.mark_down()
+            await session.rollback()
+            raise
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+
+def is_replica_session(db: AsyncSession) -> bool:
+    """该会话是否连接到只读副本"""
+    return db.info.get("replica", False)
@@ -0,0 +1,79 @@
+# src/core/executors.py
+
+"""
+有界线程池：把会阻塞事件循环的 CPU 密集型同步调用 (例如 argon2 密码哈希) 放到独立线程中执行。
+
+与 asyncio 默认的 to_thread 线程池不同：
+    - 线程数固定 (workers)，不会和其他 to_thread 调用互相抢占
+    - 排队任务数有上限 (max_queue)，超过时立即拒绝，而不是让请求无限等待
+    - 提供排队 / 执行中 / 已完成 / 已拒绝的计数，用于监控
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class ExecutorBusy(Exception):
+    """排队任务数已达上限"""
+
+
+class BoundedExecutor:
+    __slots__ = ("name", "workers", "max_queue", "_executor", "_lock", "queued", "running", "completed", "rejected")
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.queued = 0     # 已提交、还没有开始执行
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """在线程池中执行 func(*args)；排队数达到 max_queue 时抛出 ExecutorBusy"""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy(f"{self.name} 线程池繁忙 (排队 {self.queued})")
+            self.queued += 1
+        future = self._executor.submit(self._call, func, args)
+        future.add_done_callback(self._on_done)
+        # 等待的协程被取消 (客户端断开、超时) 时，wrap_future 会一并取消还在排队的任务
+        return await asyncio.wrap_future(future)
+
+    def _call(self, func: Callable[..., T], args: tuple) -> T:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _on_done(self, future: Future) -> None:
+        # 只有还没开始执行的任务才能被取消，_call 不会再运行，排队数在这里扣除
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
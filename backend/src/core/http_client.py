@@ -0,0 +1,82 @@
+# src/core/http_client.py
+
+"""
+全局共享的异步 HTTP 客户端 (调用微信等外部 API)
+
+每次请求都新建 httpx.AsyncClient 会让每次调用都重新做一次 TCP + TLS 握手。
+这里在整个应用生命周期内复用同一个客户端 (连接池 + keep-alive)，
+由 src/core/lifespan.py 在应用退出时关闭；在脚本 / 测试中首次使用时自动创建。
+"""
+
+import asyncio
+import random
+
+import httpx
+
+from src.core.config import settings
+
+_client: httpx.AsyncClient | None = None
+
+# 这些错误发生在请求发出之前 (连接失败 / 连接超时 / 连接池排队超时)，对方一定没有收到，重试是安全的。
+# 其他错误 (读超时、连接中途断开等) 时对方可能已经处理了请求，不重试 (例如微信的 code 只能使用一次)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取全局 HTTP 客户端。
+    既可以在 service 层直接调用，也可以作为 FastAPI 依赖项使用。
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """关闭全局客户端并释放连接池 (应用退出时调用)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    retry_server_errors: bool = False,
+    **kwargs
+) -> httpx.Response:
+    """
+    发送请求，遇到 RETRYABLE_ERRORS 时按指数退避 (带随机抖动) 重试 HTTP_RETRIES 次。
+    5xx 时对方可能已经处理了请求，默认直接返回；只有幂等的请求才应传入 retry_server_errors=True 重试。
+    最后一次仍然失败时抛出原始异常 / 返回最后一次的响应。
+    """
+    for attempt in range(settings.HTTP_RETRIES + 1):
+        last_attempt = attempt == settings.HTTP_RETRIES
+        try:
+            response = await client.request(method, url, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if last_attempt:
+                raise
+            print(f"请求 {url} 失败 ({type(e).__name__})，第 {attempt + 1} 次重试")
+        else:
+            if response.status_code < 500 or not retry_server_errors or last_attempt:
+                return response
+            print(f"请求 {url} 返回 {response.status_code}，第 {attempt + 1} 次重试")
+
+        delay = settings.HTTP_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
@@ -0,0 +1,101 @@
+# src/core/lifespan.py
+
+"""
+应用生命周期：启动时创建并预热所有共享资源，退出时按相反顺序释放。
+
+    资源              依赖项 / 访问方式
+    数据库连接池      src.core.database.get_db
+    只读副本连接池    src.core.database.get_read_db      (可选，未配置副本时使用主库)
+    Redis 客户端      src.core.redis.get_redis
+    arq 连接池        src.shared.deps.arq.get_arq_pool   (app.state.arq_pool，未安装 arq 时为 None)
+    HTTP 客户端       src.core.http_client.get_http_client
+    密码哈希线程池    src.modules.auth.service.password_executor
+
+预热的目的是让部署后的第一批请求不再承担冷启动开销：
+建立数据库连接 (含 TCP / 认证)、初始化 ORM 映射、建立 Redis 连接。
+预热失败 (例如数据库暂时不可达) 只打印警告，不阻止应用启动，之后的请求会按需重新连接。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from src.core.config import settings
+from src.core.database import engine, replica_engine
+from src.core.http_client import close_http_client, get_http_client
+from src.core.metrics import monitor_event_loop_lag
+from src.core.redis import get_redis
+from src.modules.auth.service import password_executor
+
+try:
+    from arq import create_pool
+    from arq.connections import RedisSettings
+except ImportError:  # pragma: no cover - 未安装 arq (可选依赖) 时不创建任务队列连接池
+    create_pool = None
+
+
+async def _warm_database() -> None:
+    """同时打开 DB_POOL_WARM_CONNECTIONS 个连接 (不超过 pool_size) 并执行一次 SELECT 1，用完归还到连接池"""
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.gather(*(ping() for _ in range(min(settings.DB_POOL_WARM_CONNECTIONS, engine.pool.size()))))
+    except Exception as e:
+        print(f"预热数据库连接池失败: {e}")
+
+
+async def _warm_redis() -> None:
+    try:
+        await get_redis().ping()
+    except Exception as e:
+        print(f"预热 Redis 连接失败: {e}")
+
+
+async def _open_arq_pool():
+    if create_pool is None:
+        return None
+    redis_settings = RedisSettings.from_dsn(settings.REDIS_URL)
+    redis_settings.conn_retries = 0 # Redis 不可用时不阻塞启动 (arq 默认会重试 5 次、每次等待 1 秒)
+    try:
+        return await create_pool(redis_settings)
+    except Exception as e:
+        print(f"创建 arq 连接池失败: {e}")
+        return None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期：启动时创建共享资源，退出时释放。
+    """
+    # 1. 启动：初始化 ORM 映射 (否则会在第一次查询时才执行)
+    configure_mappers()
+
+    # 2. 启动：并行预热数据库、Redis，创建 arq 连接池
+    _, _, arq_pool = await asyncio.gather(_warm_database(), _warm_redis(), _open_arq_pool())
+
+    app.state.engine = engine
+    app.state.redis = get_redis()
+    app.state.arq_pool = arq_pool
+    app.state.http_client = get_http_client()
+
+    # 3. 启动：事件循环延迟监控 (GET /metrics)
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+    yield
+
+    # 4. 退出：先停止后台任务和外部调用，再关闭各个连接池
+    lag_monitor.cancel()
+    await close_http_client()
+    if arq_pool is not None:
+        await arq_pool.aclose()
+    await get_redis().aclose()
+    password_executor.shutdown()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
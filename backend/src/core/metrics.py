@@ -0,0 +1,380 @@
+# src/core/metrics.py
+
+"""
+应用指标 (进程内，不依赖外部服务)
+
+一、按请求统计 SQL：条数、数据库总耗时、最慢的一条，以及 N+1 检测。
+
+实现：
+    - SqlStatsMiddleware 为每个 HTTP 请求创建一个 RequestSqlStats，放在 ContextVar 中
+    - 所有引擎 (主库 / 副本) 的 before_cursor_execute / after_cursor_execute 事件把每条 SQL 记到当前请求上
+    - 同一个 "语句形状" (参数已经是占位符，IN 列表折叠为一个) 在一个请求内执行超过
+      SQL_N_PLUS_ONE_THRESHOLD 次时，视为 N+1，打印警告
+
+输出：
+    - 非生产环境 (或 SQL_STATS_HEADERS=true)：响应头 X-SQL-Count / X-SQL-Time-ms / X-SQL-Slowest-ms / X-SQL-N-Plus-One
+    - 所有环境：按接口 (方法 + 路由模板) 累计到 endpoint_sql_stats，GET /test/sql-stats 查看
+
+二、HTTP 指标 (HttpMetricsMiddleware) 和事件循环延迟 (monitor_event_loop_lag)，
+    与 SQL、连接池指标一起以 Prometheus 文本格式在 GET /metrics 输出：
+    - http_request_duration_seconds   按路由的延迟直方图 (p99: histogram_quantile(0.99, ...))
+    - http_requests_total             按路由 + 状态码的请求数
+    - http_requests_in_flight         按路由的进行中请求数
+    - event_loop_lag_seconds          事件循环延迟直方图 (定时器实际唤醒时间比预期晚了多少)
+    指标保存在各个 worker 进程内，多 worker 部署时需要分别抓取 (或在前面汇总)。
+"""
+
+import asyncio
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.core.config import settings
+
+# IN (%s, %s, %s) / IN (?, ?) 折叠为 IN (?)，使不同长度的 IN 列表属于同一个形状
+_IN_LIST = re.compile(r"\((?:\s*(?:%s|\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:%s|\?|%\(\w+\)s|:\w+)\s*\)")
+_SLOWEST_STATEMENT_CHARS = 300
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(?)", " ".join(statement.split()))
+
+
+class RequestSqlStats:
+    """一个请求内的 SQL 统计"""
+    __slots__ = ("count", "total_time", "slowest_time", "slowest_statement", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = ""
+        self.shapes: dict[str, int] = {}
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated_shapes(self) -> dict[str, int]:
+        """执行次数超过 SQL_N_PLUS_ONE_THRESHOLD 的语句形状 (疑似 N+1)"""
+        return {
+            shape: count for shape, count in self.shapes.items()
+            if count > settings.SQL_N_PLUS_ONE_THRESHOLD
+        }
+
+
+_current: ContextVar[RequestSqlStats | None] = ContextVar("request_sql_stats", default=None)
+
+
+def current_sql_stats() -> RequestSqlStats | None:
+    """当前请求的 SQL 统计 (不在请求中时为 None)"""
+    return _current.get()
+
+
+# --- SQLAlchemy 事件 (对所有引擎生效) ---
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("sql_stats_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    starts = conn.info.get("sql_stats_start")
+    if stats is None or not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+# --- 按接口累计 ---
+
+class EndpointSqlStats:
+    __slots__ = ("requests", "queries", "db_time", "max_queries", "n_plus_one")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.max_queries = 0
+        self.n_plus_one = 0     # 检测到 N+1 的请求数
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "avg_queries": round(self.queries / self.requests, 2) if self.requests else 0.0,
+            "max_queries": self.max_queries,
+            "avg_db_time_ms": round(self.db_time / self.requests * 1000, 3) if self.requests else 0.0,
+            "n_plus_one_requests": self.n_plus_one,
+        }
+
+
+endpoint_sql_stats: dict[str, EndpointSqlStats] = {}
+_endpoint_lock = threading.Lock()
+
+
+def _record_endpoint(endpoint: str, stats: RequestSqlStats, repeated: dict[str, int]) -> None:
+    with _endpoint_lock:
+        entry = endpoint_sql_stats.get(endpoint)
+        if entry is None:
+            entry = endpoint_sql_stats[endpoint] = EndpointSqlStats()
+        entry.requests += 1
+        entry.queries += stats.count
+        entry.db_time += stats.total_time
+        entry.max_queries = max(entry.max_queries, stats.count)
+        if repeated:
+            entry.n_plus_one += 1
+
+
+def endpoint_sql_snapshot() -> dict[str, dict]:
+    with _endpoint_lock:
+        return {endpoint: entry.snapshot() for endpoint, entry in sorted(endpoint_sql_stats.items())}
+
+
+def _route_template(scope: dict) -> str | None:
+    """
+    请求路径对应的路由模板 (匹配到的路由的 path_format)，例如 /admin/services/abc -> /admin/services/{service_uid}；
+    未匹配到路由时返回 None。
+    新版 FastAPI 延迟展开 include_router：scope["route"] 是子路由器中不带前缀的原始路由，
+    带前缀的完整模板在 scope["fastapi"]["effective_route_context"] 中，有则优先使用。
+    """
+    route = scope.get("route")
+    if route is None:
+        return None
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(effective, "path_format", None) or getattr(route, "path_format", None)
+
+
+def _endpoint_name(scope: dict) -> str:
+    """
+    方法 + 路由模板 (例如 "GET /schedule/availability")。
+    未匹配到路由 (404、扫描器) 时统一记为 "unmatched"，不使用原始路径，否则统计表和指标会无限增长。
+    """
+    return f"{scope['method']} {_route_template(scope) or 'unmatched'}"
+
+
+# --- ASGI 中间件 ---
+
+class SqlStatsMiddleware:
+    """为每个请求统计 SQL；非生产环境在响应头中返回统计结果"""
+
+    def __init__(self, app):
+        self.app = app
+        headers = settings.SQL_STATS_HEADERS
+        self.add_headers = settings.ENVIRONMENT != "prod" if headers is None else headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats()
+        token = _current.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and self.add_headers:
+                repeated = stats.repeated_shapes()
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-sql-count", str(stats.count).encode()),
+                    (b"x-sql-time-ms", f"{stats.total_time * 1000:.2f}".encode()),
+                    (b"x-sql-slowest-ms", f"{stats.slowest_time * 1000:.2f}".encode()),
+                    (b"x-sql-n-plus-one", str(max(repeated.values(), default=0)).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+            endpoint = _endpoint_name(scope)
+            repeated = stats.repeated_shapes()
+            _record_endpoint(endpoint, stats, repeated)
+            for shape, count in repeated.items():
+                print(f"[N+1] {endpoint} 执行了 {count} 次相同形状的 SQL: {shape[:_SLOWEST_STATEMENT_CHARS]}")
+            if stats.slowest_time * 1000 >= settings.SQL_SLOW_STATEMENT_MS:
+                print(
+                    f"[慢 SQL] {endpoint} {stats.slowest_time * 1000:.1f} ms: "
+                    f"{' '.join(stats.slowest_statement.split())[:_SLOWEST_STATEMENT_CHARS]}"
+                )
+
+
+# --- Prometheus 文本格式 ---
+
+# 延迟直方图的桶 (秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Histogram:
+    """累积直方图 (与 Prometheus histogram 相同：每个桶记录 <= 上界的次数)"""
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个是 +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def expose(self, name: str, labels: dict) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {self.total}")
+        lines.append(f"{name}_count{_labels(**labels)} {self.count}")
+        return lines
+
+
+def _route_key(scope: dict) -> tuple[str, str]:
+    """
+    (方法, 路由模板)，例如 ("GET", "/schedule/availability")。
+    路由模板由路由器匹配后写入 scope["route"]；未匹配任何路由 (404) 或尚未完成匹配时统一记为 "unmatched"，
+    避免把原始路径 (含 uid 等参数) 作为标签导致指标无限增长。
+    """
+    return scope["method"], _route_template(scope) or "unmatched"
+
+
+class HttpMetrics:
+    """按 (方法, 路由模板) 的延迟直方图、按状态码的计数、进行中的请求数"""
+    __slots__ = ("latency", "responses", "active", "loop_lag", "loop_lag_max")
+
+    def __init__(self):
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.responses: dict[tuple[str, str, int], int] = {}
+        # 进行中的请求 (id(scope) -> scope)：路由在中间件之后才匹配，所以在抓取时再按路由分组
+        self.active: dict[int, dict] = {}
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self.loop_lag_max = 0.0  # 上次抓取 /metrics 以来的最大值
+
+    def started(self, scope: dict) -> None:
+        self.active[id(scope)] = scope
+
+    def in_flight(self) -> dict[tuple[str, str], int]:
+        counts: dict[tuple[str, str], int] = {}
+        for scope in list(self.active.values()):
+            key = _route_key(scope)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def finished(self, scope: dict, status: int, elapsed: float) -> None:
+        self.active.pop(id(scope), None)
+        key = _route_key(scope)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(elapsed)
+        status_key = (*key, status)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+
+http_metrics = HttpMetrics()
+
+
+class HttpMetricsMiddleware:
+    """记录每个请求的延迟、状态码和进行中的请求数"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # 应用抛出异常、没有发送响应时记为 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_metrics.started(scope)
+        begin = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_metrics.finished(scope, status, time.perf_counter() - begin)
+
+
+async def monitor_event_loop_lag() -> None:
+    """
+    每 EVENT_LOOP_LAG_INTERVAL_SECONDS 睡眠一次，记录实际唤醒时间比预期晚了多少。
+    由 lifespan 作为后台任务启动，退出时取消。
+    """
+    interval = settings.EVENT_LOOP_LAG_INTERVAL_SECONDS
+    while True:
+        begin = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - begin - interval)
+        http_metrics.loop_lag.observe(lag)
+        http_metrics.loop_lag_max = max(http_metrics.loop_lag_max, lag)
+
+
+def render_metrics(extra: list[str] = ()) -> str:
+    """以 Prometheus 文本格式 (version 0.0.4) 输出所有指标；extra 为调用方追加的行"""
+    lines = [
+        "# HELP http_request_duration_seconds HTTP 请求延迟",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), histogram in sorted(http_metrics.latency.items()):
+        lines.extend(histogram.expose("http_request_duration_seconds", {"method": method, "route": route}))
+
+    lines += ["# HELP http_requests_total HTTP 请求数", "# TYPE http_requests_total counter"]
+    for (method, route, status), count in sorted(http_metrics.responses.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += ["# HELP http_requests_in_flight 进行中的 HTTP 请求数", "# TYPE http_requests_in_flight gauge"]
+    for (method, route), count in sorted(http_metrics.in_flight().items()):
+        lines.append(f"http_requests_in_flight{_labels(method=method, route=route)} {count}")
+
+    lines += ["# HELP event_loop_lag_seconds 事件循环延迟", "# TYPE event_loop_lag_seconds histogram"]
+    lines.extend(http_metrics.loop_lag.expose("event_loop_lag_seconds", {}))
+    lines += [
+        "# HELP event_loop_lag_max_seconds 上次抓取以来的最大事件循环延迟",
+        "# TYPE event_loop_lag_max_seconds gauge",
+        f"event_loop_lag_max_seconds {http_metrics.loop_lag_max}",
+    ]
+    http_metrics.loop_lag_max = 0.0
+
+    with _endpoint_lock:
+        sql_entries = sorted(
+            (endpoint, entry.queries, entry.db_time, entry.n_plus_one)
+            for endpoint, entry in endpoint_sql_stats.items()
+        )
+    for index, (name, kind, help_text) in enumerate((
+        ("sql_queries_total", "counter", "按接口的 SQL 条数"),
+        ("sql_duration_seconds_total", "counter", "按接口的数据库耗时"),
+        ("sql_n_plus_one_requests_total", "counter", "疑似 N+1 的请求数"),
+    ), start=1):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{_labels(endpoint=entry[0])} {entry[index]}" for entry in sql_entries]
+
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
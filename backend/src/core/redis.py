@@ -0,0 +1,15 @@
+# src/core/redis.py
+
+from redis.asyncio import Redis, from_url
+
+from src.core.config import settings
+
+# 全局共享的异步 Redis 客户端 (内部自带连接池，首次使用时才会真正建立连接)
+redis_client: Redis = from_url(settings.REDIS_URL, decode_responses=True)
+
+def get_redis() -> Redis:
+    """
+    获取全局 Redis 客户端。
+    既可以在 service 层直接调用，也可以作为 FastAPI 依赖项使用。
+    """
+    return redis_client
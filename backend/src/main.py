@@ -1,10 +1,14 @@
 # qingyuan-new-life/backend/src/main.py
 from fastapi import FastAPI
-#from core.lifespan import lifespan
+from fastapi.responses import PlainTextResponse
+from src.core.lifespan import lifespan
 
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.core.config import settings
+from src.core.database import pool_status
+from src.core.metrics import HttpMetricsMiddleware, SqlStatsMiddleware, render_metrics
+from src.modules.auth.service import password_executor
 from src.modules.auth.router import router as auth_router
 from src.modules.test.router import router as test_router
 from src.modules.admin.router import router as admin_router
@@ -24,7 +28,7 @@ app = FastAPI(
     title="青元新生 后端服务",
     description="青元新生项目的后端服务，提供API接口支持。",
     version="0.0.1",
-    #lifespan=lifespan,
+    lifespan=lifespan,
     root_path=api_root_path,
     # 仅在非生产环境下启用文档
     docs_url="/docs" if settings.ENVIRONMENT != "production" else None,
@@ -39,6 +43,11 @@ origins = [
     "https://qyxs.online",
 ]
 
+# 按请求统计 SQL (条数、耗时、N+1)，非生产环境在响应头中返回
+app.add_middleware(SqlStatsMiddleware)
+# 按路由的延迟直方图、状态码、进行中的请求数 (GET /metrics)
+app.add_middleware(HttpMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -62,6 +71,34 @@ async def read_root():
     }
     return status
 
+@app.get("/metrics", summary="Prometheus 指标", tags=["Default"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus 文本格式的指标：按路由的延迟直方图 / 状态码 / 进行中请求数、事件循环延迟、
+    按接口的 SQL 统计、数据库连接池、密码哈希线程池 (均为当前 worker 进程内的值)
+    """
+    pools = {"primary": pool_status()}
+    replica = pools["primary"].pop("replica")
+    if replica is not None:
+        pools["replica"] = replica
+    executor = password_executor.stats()
+    extra = []
+    for name, kind, read in [
+        ("db_pool_checked_out", "gauge", lambda pool: pool["checked_out"]),
+        ("db_pool_overflow", "gauge", lambda pool: pool["overflow"]),
+        ("db_pool_checkouts_total", "counter", lambda pool: pool["checkouts"]),
+        ("db_pool_timeouts_total", "counter", lambda pool: pool["timeouts"]),
+        ("db_pool_connects_total", "counter", lambda pool: pool["connects"]),
+        ("db_pool_wait_max_seconds", "gauge", lambda pool: pool["wait_max_ms"] / 1000),
+    ]:
+        extra.append(f"# TYPE {name} {kind}")
+        extra += [f'{name}{{pool="{pool_name}"}} {read(pool)}' for pool_name, pool in pools.items()]
+    extra += [
+        "# TYPE password_hash_queued gauge", f"password_hash_queued {executor['queued']}",
+        "# TYPE password_hash_rejected_total counter", f"password_hash_rejected_total {executor['rejected']}",
+    ]
+    return PlainTextResponse(render_metrics(extra), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 app.include_router(auth_router, prefix="/auth") # 用户认证相关路由
 app.include_router(test_router, prefix="/test") # 测试相关路由
 app.include_router(admin_router, prefix="/admin") # 管理后台相关路由
@@ -7,12 +7,15 @@ from sqlalchemy import and_, or_
 from typing import List, Optional
 from datetime import date
 
-from src.core.database import get_db
+from src.core.database import get_db, get_read_db
 from src.shared.models.resource_models import Location, Service, Resource
 from src.shared.models.schedule_models import Shift
 from sqlalchemy.orm import joinedload
-from src.modules.auth.security import get_current_admin_user # 2. 导入管理员依赖
+from src.modules.auth.security import get_current_admin_claims # 2. 导入管理员依赖 (只凭 Token 声明，不查询用户表)
+from src.modules.auth.schemas import TokenPayload
 from src.shared.models.user_models import User # 3. 导入 User (用于类型注解)
+from src.modules.schedule import service as schedule_service
+from src.modules.schedule import cache as availability_cache
 from . import schemas # 4. 导入我们刚创建的 schemas
 
 # 我们创建一个专门用于管理后台的 'admin' 路由
@@ -35,7 +38,7 @@ router = APIRouter(
 async def create_location(
     location_data: schemas.LocationCreate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 关键：保护此接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 关键：保护此接口
 ):
     """
     (Admin Only) 创建一个新的工作地点。
@@ -51,7 +54,8 @@ async def create_location(
         
     new_location = Location(
         name=location_data.name,
-        address=location_data.address
+        address=location_data.address,
+        slot_interval_minutes=location_data.slot_interval_minutes
     )
     db.add(new_location)
     await db.commit()
@@ -65,8 +69,8 @@ async def create_location(
     summary="获取所有地点列表"
 )
 async def get_all_locations(
-    db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 关键：保护此接口
+    db: AsyncSession = Depends(get_read_db),
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 关键：保护此接口
 ):
     """
     (Admin Only) 获取所有工作地点的列表。
@@ -88,10 +92,10 @@ async def update_location(
     location_uid: str,
     location_data: schemas.LocationUpdate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 关键：保护此接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 关键：保护此接口
 ):
     """
-    (Admin Only) 更新一个已存在地点的名称或地址。
+    (Admin Only) 更新一个已存在地点的名称、地址或可预约时间的步长。
     """
     query = select(Location).where(Location.uid == location_uid)
     result = await db.execute(query)
@@ -106,6 +110,12 @@ async def update_location(
     # 使用 Pydantic 的 .model_dump() 来安全地更新字段
     # exclude_unset=True 意味着只更新客户端传入的字段
     update_data = location_data.model_dump(exclude_unset=True)
+
+    # 时间步长变化会影响该地点所有日期的可用时间
+    interval_changed = (
+        "slot_interval_minutes" in update_data
+        and update_data["slot_interval_minutes"] != db_location.slot_interval_minutes
+    )
     
     for key, value in update_data.items():
         setattr(db_location, key, value)
@@ -113,6 +123,9 @@ async def update_location(
     db.add(db_location)
     await db.commit()
     await db.refresh(db_location)
+
+    if interval_changed:
+        await availability_cache.invalidate_all()
     
     return db_location
 
@@ -125,7 +138,7 @@ async def update_location(
 async def create_service(
     service_data: schemas.ServiceCreate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 创建一个新的服务项目 (如 推拿, 针灸)。
@@ -143,7 +156,8 @@ async def create_service(
         name=service_data.name,
         technician_operation_duration=service_data.technician_operation_duration,
         room_operation_duration=service_data.room_operation_duration,
-        buffer_time=service_data.buffer_time
+        buffer_time=service_data.buffer_time,
+        slot_interval_minutes=service_data.slot_interval_minutes
     )
     db.add(new_service)
     await db.commit()
@@ -157,8 +171,8 @@ async def create_service(
     summary="获取所有服务项目列表"
 )
 async def get_all_services(
-    db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    db: AsyncSession = Depends(get_read_db),
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 获取所有服务项目的列表。
@@ -178,7 +192,7 @@ async def update_service(
     service_uid: str,
     service_data: schemas.ServiceUpdate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 更新一个服务项目的时长或名称。
@@ -194,13 +208,33 @@ async def update_service(
         )
     
     update_data = service_data.model_dump(exclude_unset=True)
+
+    # 时长、缓冲时间或时间步长变化会影响所有地点、所有日期的可用时间
+    duration_changed = any(
+        key in update_data and update_data[key] != getattr(db_service, key)
+        for key in ("technician_operation_duration", "room_operation_duration", "buffer_time", "slot_interval_minutes")
+    )
     
     for key, value in update_data.items():
         setattr(db_service, key, value)
+
+    try:
+        schemas.check_service_durations(
+            db_service.technician_operation_duration,
+            db_service.room_operation_duration,
+            db_service.buffer_time
+        )
+        schemas.check_slot_interval(db_service.slot_interval_minutes)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
     db.add(db_service)
     await db.commit()
     await db.refresh(db_service)
+
+    if duration_changed:
+        await availability_cache.invalidate_all()
     
     return db_service
 
@@ -213,7 +247,7 @@ async def update_service(
 async def create_resource(
     resource_data: schemas.ResourceCreate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 创建一个新的物理资源 (如 1号床)，并将其分配给一个地点。
@@ -237,6 +271,7 @@ async def create_resource(
     db.add(new_resource)
     await db.commit()
     await db.refresh(new_resource)
+    await availability_cache.invalidate_all() # 地点的房间数量变化，可用时间随之变化
     
     # 3. 返回。因为 location 关系是在 session 中被赋的，
     # Pydantic (with from_attributes=True) 可以正确地嵌套 LocationPublic
@@ -249,8 +284,8 @@ async def create_resource(
 )
 async def get_resources_for_location(
     location_uid: str,
-    db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    db: AsyncSession = Depends(get_read_db),
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 获取特定地点下的所有物理资源 (床位/房间) 列表。
@@ -277,7 +312,7 @@ async def update_resource(
     resource_uid: str,
     resource_data: schemas.ResourceUpdate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 更新一个物理资源的名称或其所属的地点。
@@ -319,6 +354,7 @@ async def update_resource(
     db.add(db_resource)
     await db.commit()
     await db.refresh(db_resource, ["location"]) # 确保 location 关系被刷新
+    await availability_cache.invalidate_all() # 房间可能被移动到了其他地点
     
     return db_resource
 
@@ -328,8 +364,8 @@ async def update_resource(
     summary="获取所有技师及其技能列表"
 )
 async def get_all_technicians(
-    db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    db: AsyncSession = Depends(get_read_db),
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 获取所有角色为 'technician' 的用户列表，
@@ -357,7 +393,7 @@ async def assign_service_to_technician(
     user_uid: str,
     skill_data: schemas.TechnicianSkillAssign,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 为指定技师添加一项他能提供的服务。
@@ -401,6 +437,7 @@ async def assign_service_to_technician(
     db.add(db_technician)
     await db.commit()
     await db.refresh(db_technician, ["service"]) # 刷新关系
+    await availability_cache.invalidate_all() # 能做该服务的技师变了
     
     return db_technician
 
@@ -413,7 +450,7 @@ async def remove_service_from_technician(
     user_uid: str,
     service_uid: str,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 移除技师的一项服务技能。
@@ -457,6 +494,7 @@ async def remove_service_from_technician(
     db.add(db_technician)
     await db.commit()
     await db.refresh(db_technician, ["service"])
+    await availability_cache.invalidate_all() # 能做该服务的技师变了
     
     return db_technician
 
@@ -469,7 +507,7 @@ async def remove_service_from_technician(
 async def create_shift(
     shift_data: schemas.ShiftCreate,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 为技师在指定地点创建排班。
@@ -495,7 +533,8 @@ async def create_shift(
     overlap_query = select(Shift).where(
         Shift.technician_id == shift_data.technician_uid,
         Shift.start_time < shift_data.end_time, # 已有排班的开始 < 新排班的结束
-        Shift.end_time > shift_data.start_time   # 已有排班的结束 > 新排班的开始
+        Shift.end_time > shift_data.start_time,  # 已有排班的结束 > 新排班的开始
+        Shift.start_time > shift_data.start_time - schedule_service.MAX_INTERVAL_DURATION # 索引范围下界
     )
     existing_shift = (await db.execute(overlap_query)).scalars().first()
     
@@ -519,6 +558,11 @@ async def create_shift(
     await db.commit()
     # refresh 不是必须的，因为我们已经手动关联了
     # await db.refresh(new_shift, ["technician", "location"]) 
+
+    # 5. 使该地点、排班覆盖到的日期的可用时间缓存失效
+    await schedule_service.invalidate_cached_availability(
+        shift_data.location_uid, shift_data.start_time, shift_data.end_time
+    )
     
     return new_shift
 
@@ -532,8 +576,8 @@ async def get_shifts(
     technician_uid: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    db: AsyncSession = Depends(get_read_db),
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 查询排班表，可按地点、技师、日期范围过滤。
@@ -571,7 +615,7 @@ async def get_shifts(
 async def delete_shift(
     shift_uid: str,
     db: AsyncSession = Depends(get_db),
-    admin_user: User = Depends(get_current_admin_user) # <-- 保护接口
+    admin_user: TokenPayload = Depends(get_current_admin_claims) # <-- 保护接口
 ):
     """
     (Admin Only) 删除一个排班记录。
@@ -586,7 +630,12 @@ async def delete_shift(
             detail="排班记录不存在"
         )
         
+    # 删除前记下排班的地点和时间，用于缓存失效
+    location_uid, start_time, end_time = db_shift.location_id, db_shift.start_time, db_shift.end_time
+        
     await db.delete(db_shift)
     await db.commit()
+
+    await schedule_service.invalidate_cached_availability(location_uid, start_time, end_time)
     
     return None # 204 状态码不应返回任何内容
\ No newline at end of file
@@ -1,8 +1,20 @@
 # src/modules/admin/schemas.py
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# 单个排班 / 单次服务占用的最长时长 (分钟)
+# 与 schedule/service.py 中的 MAX_INTERVAL_DURATION 保持一致，时间重叠查询依赖这个上限走索引
+MAX_INTERVAL_MINUTES = 24 * 60
+
+# 可预约开始时间的步长 (分钟) 的可选值：都能整除 60，保证时间落在整点 / 整刻
+SLOT_INTERVAL_CHOICES = (5, 10, 15, 20, 30, 60)
+
+def check_slot_interval(slot_interval_minutes: Optional[int]) -> None:
+    """步长为空 (使用默认) 或 SLOT_INTERVAL_CHOICES 之一"""
+    if slot_interval_minutes is not None and slot_interval_minutes not in SLOT_INTERVAL_CHOICES:
+        raise ValueError(f"时间步长必须是 {SLOT_INTERVAL_CHOICES} 之一 (分钟)")
 
 # --- Location Schemas ---
 
@@ -12,6 +24,13 @@ class LocationBase(BaseModel):
     """
     name: str
     address: Optional[str] = None
+    slot_interval_minutes: Optional[int] = None # 可预约时间的步长，为空时使用系统默认 (10 分钟)
+
+    @field_validator('slot_interval_minutes')
+    @classmethod
+    def check_slot_interval(cls, value: Optional[int]) -> Optional[int]:
+        check_slot_interval(value)
+        return value
 
 class LocationCreate(LocationBase):
     """
@@ -26,6 +45,7 @@ class LocationUpdate(LocationBase):
     """
     name: Optional[str] = None # 在更新时，所有字段都应是可选的
     address: Optional[str] = None
+    slot_interval_minutes: Optional[int] = None
 
 class LocationPublic(LocationBase):
     """
@@ -34,8 +54,14 @@ class LocationPublic(LocationBase):
     uid: str
     name: str
     address: Optional[str] = None
+    slot_interval_minutes: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
+def check_service_durations(technician_duration: int, room_duration: int, buffer_time: int) -> None:
+    """技师 / 房间的总占用时长 (操作时长 + 缓冲) 不能超过 MAX_INTERVAL_MINUTES"""
+    if max(technician_duration, room_duration) + buffer_time > MAX_INTERVAL_MINUTES:
+        raise ValueError(f"服务的总占用时长 (含缓冲时间) 不能超过 {MAX_INTERVAL_MINUTES} 分钟")
+
 class ServiceBase(BaseModel):
     """
     服务项目的基础模型
@@ -44,12 +70,19 @@ class ServiceBase(BaseModel):
     technician_operation_duration: int
     room_operation_duration: int
     buffer_time: int = 15 # 根据我们 V2 设计，默认 15 分钟
+    slot_interval_minutes: Optional[int] = None # 可预约时间的步长，为空时使用地点的设置
 
 class ServiceCreate(ServiceBase):
     """
     用于 '创建服务' 接口
     """
-    pass
+    @model_validator(mode='after')
+    def check_durations(self) -> 'ServiceCreate':
+        check_service_durations(
+            self.technician_operation_duration, self.room_operation_duration, self.buffer_time
+        )
+        check_slot_interval(self.slot_interval_minutes)
+        return self
 
 class ServiceUpdate(BaseModel):
     """
@@ -59,6 +92,7 @@ class ServiceUpdate(BaseModel):
     technician_operation_duration: Optional[int] = None
     room_operation_duration: Optional[int] = None
     buffer_time: Optional[int] = None
+    slot_interval_minutes: Optional[int] = None
 
 class ServicePublic(ServiceBase):
     """
@@ -69,6 +103,7 @@ class ServicePublic(ServiceBase):
     technician_operation_duration: int
     room_operation_duration: int
     buffer_time: int
+    slot_interval_minutes: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
     
 class ResourceBase(BaseModel):
@@ -133,11 +168,12 @@ class ShiftCreate(BaseModel):
     end_time: datetime   # 例如: "2025-10-27T12:00:00+08:00"
 
     # Pydantic v2 验证器: 确保结束时间晚于开始时间
-    from pydantic import model_validator
     @model_validator(mode='after')
     def check_times(self) -> 'ShiftCreate':
         if self.start_time and self.end_time and self.start_time >= self.end_time:
             raise ValueError("排班结束时间 (end_time) 必须晚于开始时间 (start_time)")
+        if self.end_time - self.start_time > timedelta(minutes=MAX_INTERVAL_MINUTES):
+            raise ValueError(f"单个排班不能超过 {MAX_INTERVAL_MINUTES // 60} 小时")
         return self
 
 class ShiftPublic(BaseModel):
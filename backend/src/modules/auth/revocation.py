@@ -0,0 +1,116 @@
+# src/modules/auth/revocation.py
+
+"""
+JWT 吊销 (Redis)
+
+Token 中带有 role 和 iat (签发时间)，get_current_claims 只凭 Token 就能完成角色检查，不查询数据库。
+为了让角色变更 / 停用立即生效，每个用户在 Redis 中有一个 "在此之前签发的 Token 全部作废" 的时间点：
+    auth:revoked:{user_uid} -> Unix 时间 (秒，精确到微秒；TTL = Token 有效期，过期后旧 Token 自然也过期了)
+每次请求只需要一次 GET；绝大多数用户没有这个 key。
+Token 的 iat 同样精确到微秒，iat 严格早于这个时间点的 Token 作废，变更之后重新登录签发的 Token 不受影响。
+
+修改 role / is_active (或删除用户) 的事务提交后，ORM 事件在后台调用 revoke_tokens，失败时只记录日志。
+兜底上限是 Token 有效期：吊销失败 (Redis 不可用) 时，旧 Token 最多在 ACCESS_TOKEN_EXPIRE_MINUTES
+(默认 7 天) 后自然过期，在此之前 get_current_claims 仍按旧角色放行；
+get_current_user 不受影响，它读取的是用户本身 (缓存随提交失效)。
+需要 "吊销成功才算完成" 的接口应在提交后直接 await revoke_tokens (失败时抛出异常)。
+"""
+
+import asyncio
+import time
+
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.redis import get_redis
+from src.shared.models.user_models import User
+
+KEY_PREFIX = "auth:revoked"
+
+# 修改这些列会使该用户已签发的 Token 失效
+_REVOKING_COLUMNS = ("role", "is_active")
+
+_pending_tasks: set[asyncio.Task] = set()
+
+
+def _key(user_uid: str) -> str:
+    return f"{KEY_PREFIX}:{user_uid}"
+
+
+async def revoke_tokens(*user_uids: str) -> None:
+    """吊销这些用户当前已签发的所有 Token；Redis 写入失败时抛出异常"""
+    if not user_uids:
+        return
+    revoked_before = time.time()
+    ttl = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for user_uid in user_uids:
+                pipe.set(_key(user_uid), revoked_before, ex=ttl)
+            await pipe.execute()
+    except RedisError as e:
+        raise Exception(f"吊销 Token 失败: {e}") from e
+
+
+async def is_revoked(user_uid: str, issued_at: float) -> bool | None:
+    """
+    Token 是否已被吊销。
+    Redis 不可用时返回 None，调用方应退回到查询数据库 (精确判断)。
+    """
+    try:
+        revoked_before = await get_redis().get(_key(user_uid))
+    except RedisError as e:
+        print(f"读取 Token 吊销状态失败: {e}")
+        return None
+    return revoked_before is not None and issued_at < float(revoked_before)
+
+
+# --- ORM 事件：角色 / 停用状态变更后自动吊销 ---
+
+_SESSION_INFO_KEY = "auth_revoke_uids"
+
+
+@event.listens_for(User, "after_update")
+def _mark_revoked(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if not any(state.attrs[column].history.has_changes() for column in _REVOKING_COLUMNS):
+        return
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).add(target.uid)
+
+
+@event.listens_for(User, "after_delete")
+def _mark_deleted(mapper, connection, target: User) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).add(target.uid)
+
+
+async def _revoke_in_background(*user_uids: str) -> None:
+    try:
+        await revoke_tokens(*user_uids)
+    except Exception as e:
+        print(f"{e} (用户 {', '.join(sorted(user_uids))} 的旧 Token 在过期前仍然有效)")
+
+
+@event.listens_for(Session, "after_commit")
+def _revoke_after_commit(session: Session) -> None:
+    """事务提交后在后台吊销；失败时旧 Token 在过期前仍然有效 (见模块说明)"""
+    user_uids = session.info.pop(_SESSION_INFO_KEY, None)
+    if not user_uids:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return # 不在事件循环中 (例如同步脚本)，需要手动调用 revoke_tokens
+    task = loop.create_task(_revoke_in_background(*user_uids))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
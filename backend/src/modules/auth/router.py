@@ -1,11 +1,13 @@
 # src/modules/auth/router.py
 
+import httpx
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.modules.auth.security import get_current_user
+from src.modules.auth.security import get_current_user_readonly
 from src.shared.models.user_models import User
 from src.core.database import get_db
+from src.core.http_client import get_http_client
 from . import service as auth_service
 from .schemas import WxLoginRequest, TokenResponse, AdminLoginRequest, UserInfoResponse
 
@@ -21,7 +23,8 @@ router = APIRouter(
 )
 async def wx_login(
     request_data: WxLoginRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     V3:
@@ -33,7 +36,7 @@ async def wx_login(
     
     # 1. 用 code 换取 session
     try:
-        wechat_session = await auth_service.exchange_code_for_session(request_data.code)
+        wechat_session = await auth_service.exchange_code_for_session(request_data.code, client=http_client)
     except HTTPException as e:
         raise e 
         
@@ -58,8 +61,10 @@ async def wx_login(
             detail="无法获取或创建用户"
         )
 
-    # 3. 创建 Access Token (保持不变)
-    access_token = auth_service.create_access_token(subject=user.uid)
+    # 3. 创建 Access Token (带角色声明，见 get_current_claims)
+    access_token = auth_service.create_access_token(
+        subject=user.uid, role=user.role, active=user.is_active is not False
+    )
     
     return TokenResponse(access_token=access_token)
 
@@ -86,7 +91,9 @@ async def admin_login(
         )
     
     # 登录成功，创建 Token
-    access_token = auth_service.create_access_token(subject=user.uid)
+    access_token = auth_service.create_access_token(
+        subject=user.uid, role=user.role, active=user.is_active is not False
+    )
     
     return TokenResponse(access_token=access_token)
 
@@ -96,7 +103,7 @@ async def admin_login(
     summary="获取当前登录用户信息 (V7)"
 )
 async def read_users_me(
-    current_user: User = Depends(get_current_user) # <-- 核心：自动验证 Token
+    current_user: User = Depends(get_current_user_readonly) # <-- 核心：自动验证 Token (只读，优先使用副本)
 ):
     """
     (Customer, Technician, Admin)
@@ -21,6 +21,9 @@ class TokenPayload(BaseModel):
     JWT Token 中存储的数据
     """
     sub: str  # subject, 存储 user_uid
+    role: Optional[str] = None  # 签发时的角色 (旧 Token 没有此字段)
+    active: Optional[bool] = None  # 签发时的 is_active
+    iat: Optional[float] = None # 签发时间 (Unix 秒，精确到微秒)，用于吊销检查
 
 class AdminLoginRequest(BaseModel):
     """
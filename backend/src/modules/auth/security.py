@@ -4,12 +4,14 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import make_transient_to_detached
 from jose import jwt, JWTError
 
 from src.core.config import settings
-from src.core.database import get_db
+from src.core.database import AsyncSessionLocal, get_db, get_read_db, is_replica_session
 from src.shared.models.user_models import User
 from src.modules.auth.schemas import TokenPayload
+from src.modules.auth import revocation, user_cache
 
 # 这是 FastAPI 用来从 Header 中提取 "Authorization: Bearer <token>" 的标准工具
 # tokenUrl="auth/login" 只是一个形式，它告诉文档这个 token 从哪里来
@@ -32,16 +34,8 @@ FORBIDDEN_EXCEPTION = HTTPException(
     detail="您没有足够的权限执行此操作",
 )
 
-# --- 依赖项 1：获取当前登录的用户（无论角色） ---
-
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), 
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """
-    解码 JWT Token，获取用户。
-    如果 Token 无效或用户不存在，则抛出 401 异常。
-    """
+def _decode_token(token: str) -> TokenPayload:
+    """解码并校验 JWT Token，无效时抛出 401"""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[ALGORITHM])
         user_uid: str | None = payload.get("sub")
@@ -49,21 +43,58 @@ async def get_current_user(
         if user_uid is None:
             raise CREDENTIALS_EXCEPTION
             
-        token_data = TokenPayload(sub=user_uid)
+        return TokenPayload(**payload)
         
     except JWTError:
         raise CREDENTIALS_EXCEPTION
+
+# --- 依赖项 1：获取当前登录的用户（无论角色） ---
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), 
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """
+    解码 JWT Token，获取用户。
+    如果 Token 无效或用户不存在，则抛出 401 异常。
+    """
+    token_data = _decode_token(token)
     
-    # 从数据库中获取用户
-    query = select(User).where(User.uid == token_data.sub)
-    result = await db.execute(query)
-    user = result.scalars().first()
+    # 先查缓存 (进程内 / Redis)，命中时直接把缓存的列值挂到当前 session 上，不查询数据库
+    fields, version = await user_cache.get_user_fields(token_data.sub)
+    if fields is not None:
+        user = User(**fields)
+        make_transient_to_detached(user)
+        user = await db.merge(user, load=False)
+    else:
+        # 从数据库中获取用户
+        query = select(User).where(User.uid == token_data.sub)
+        result = await db.execute(query)
+        user = result.scalars().first()
+        if user is not None:
+            await user_cache.store_user(user, version)
     
-    if user is None:
+    if user is None or user.is_active is False:
         raise CREDENTIALS_EXCEPTION
         
     return user
 
+async def get_current_user_readonly(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_db)
+) -> User:
+    """
+    get_current_user 的只读版本 (优先使用只读副本)，用于不修改用户的接口，例如 /auth/me。
+    副本上找不到用户时 (例如刚注册、副本还没有同步) 退回主库再查一次。
+    """
+    try:
+        return await get_current_user(token, db)
+    except HTTPException:
+        if not is_replica_session(db):
+            raise
+    async with AsyncSessionLocal() as primary:
+        return await get_current_user(token, primary)
+
 # --- 依赖项 2：获取当前管理员用户 (我们即将使用的) ---
 
 async def get_current_admin_user(
@@ -78,4 +109,39 @@ async def get_current_admin_user(
         raise FORBIDDEN_EXCEPTION
         
     # 如果角色是 'admin'，则安全返回用户信息
-    return current_user
\ No newline at end of file
+    return current_user
+
+# --- 依赖项 3：只凭 Token 声明鉴权 (不查询数据库) ---
+
+async def get_current_claims(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> TokenPayload:
+    """
+    返回 Token 中的声明 (sub / role / active / iat)，适用于只需要知道 "是谁、什么角色" 的接口。
+    正常情况下只有一次 Redis GET (吊销检查)，不查询数据库。
+    以下情况退回到 get_current_user (查询缓存 / 数据库) 做精确判断：
+        - 旧 Token 没有 role / iat 声明
+        - Redis 不可用，无法确认 Token 是否已被吊销
+    """
+    token_data = _decode_token(token)
+
+    if token_data.role is not None and token_data.iat is not None:
+        revoked = await revocation.is_revoked(token_data.sub, token_data.iat)
+        if revoked is False:
+            if token_data.active is False:
+                raise CREDENTIALS_EXCEPTION
+            return token_data
+        if revoked:
+            raise CREDENTIALS_EXCEPTION
+
+    user = await get_current_user(token, db)
+    return TokenPayload(sub=user.uid, role=user.role, active=user.is_active, iat=token_data.iat)
+
+async def get_current_admin_claims(
+    claims: TokenPayload = Depends(get_current_claims)
+) -> TokenPayload:
+    """get_current_admin_user 的无数据库版本：只检查 Token 中的角色是否为 'admin'"""
+    if claims.role != "admin":
+        raise FORBIDDEN_EXCEPTION
+    return claims
@@ -1,33 +1,48 @@
 # src/modules/auth/service.py
 
 import httpx
+import ulid
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload # <-- 1. 导入 joinedload
-from sqlalchemy.exc import IntegrityError # <-- 2. 导入 IntegrityError
 from jose import jwt, JWTError
 
 from passlib.context import CryptContext
 
 from src.core.config import settings
+from src.core.executors import BoundedExecutor, ExecutorBusy
+from src.core.http_client import get_http_client, request_with_retry
 # 3. 导入两个模型
 from src.shared.models.user_models import User, SocialAccount 
 from .schemas import TokenPayload, AdminLoginRequest
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
-# --- 微信 API (exchange_code_for_session 函数保持不变) ---
-WECHAT_SESSION_API = "https://api.weixin.qq.com/sns/jscode2session"
+# argon2 每次 hash / verify 要占用几十毫秒 CPU，放到专用的有界线程池中执行，避免阻塞事件循环
+password_executor = BoundedExecutor(
+    "password-hash", settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE
+)
+PASSWORD_BUSY_ERROR = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="登录请求过多，请稍后重试"
+)
+
+# MySQL 重复键错误码 (ER_DUP_ENTRY)
+MYSQL_DUPLICATE_ENTRY = 1062
+
+# --- 微信 API ---
+WECHAT_SESSION_PATH = "/sns/jscode2session"
 WX_LOGIN_ERROR = HTTPException(
     status_code=status.HTTP_400_BAD_REQUEST,
     detail="微信登录失败，请重试"
 )
 
-async def exchange_code_for_session(code: str) -> dict:
+async def exchange_code_for_session(code: str, client: httpx.AsyncClient | None = None) -> dict:
     """
     使用 code 换取微信 openid 和 session_key
+    client 默认使用全局共享的 HTTP 客户端 (连接池复用，避免每次登录都重新握手)
     """
     params = {
         "appid": settings.WECHAT_APP_ID,
@@ -36,14 +51,16 @@ async def exchange_code_for_session(code: str) -> dict:
         "grant_type": "authorization_code"
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(WECHAT_SESSION_API, params=params)
-            response.raise_for_status() 
-            data = response.json()
-        except (httpx.RequestError, httpx.HTTPStatusError) as e:
-            print(f"请求微信 API 失败: {e}")
-            raise WX_LOGIN_ERROR
+    client = client or get_http_client()
+    try:
+        response = await request_with_retry(
+            client, "GET", settings.WECHAT_API_BASE + WECHAT_SESSION_PATH, params=params
+        )
+        response.raise_for_status() 
+        data = response.json()
+    except (httpx.RequestError, httpx.HTTPStatusError) as e:
+        print(f"请求微信 API 失败: {e}")
+        raise WX_LOGIN_ERROR
 
     if data.get("errcode", 0) != 0:
         print(f"微信 API 返回错误: {data}")
@@ -56,6 +73,18 @@ async def exchange_code_for_session(code: str) -> dict:
 
 # --- 4. 替换为新的 V3 核心逻辑 ---
 
+def _is_duplicate_social_account(error: IntegrityError) -> bool:
+    """
+    是否为 (provider, provider_id) 唯一约束上的重复键错误。
+    只有这个错误表示 "另一个请求已经创建了该社交账号"；外键、NOT NULL、其他唯一键等错误照常抛出。
+    """
+    message = str(error.orig)
+    args = getattr(error.orig, "args", ())
+    if args and args[0] == MYSQL_DUPLICATE_ENTRY:
+        return "uq_provider_provider_id" in message
+    # SQLite (基准测试)
+    return "UNIQUE constraint failed: social_accounts.provider, social_accounts.provider_id" in message
+
 async def get_or_create_user_by_social(
     db: AsyncSession, 
     provider: str, 
@@ -63,50 +92,60 @@ async def get_or_create_user_by_social(
 ) -> User:
     """
     V3: 根据社交账号查找或创建用户
+
+    - 老用户：1 次查询
+    - 新用户：再加 INSERT users、INSERT social_accounts、COMMIT (同一次 flush 发出，不需要 refresh)
+      这已是最少的往返：两张表无法用一条语句插入；先 SELECT 是为了让占绝大多数的老用户只需 1 次查询
+    - 同一个 openid 并发首次登录：(provider, provider_id) 重复键表示竞争失败，
+      回滚自己创建的 User，返回胜出者创建的用户
     """
     
-    # 1. 尝试查找 SocialAccount，并同时加载 (eager load) 关联的 User
+    # 1. 直接按社交账号查找 User (一次 JOIN 查询)
     query = (
-        select(SocialAccount)
+        select(User)
+        .join(User.social_accounts)
         .where(
             SocialAccount.provider == provider,
             SocialAccount.provider_id == provider_id
         )
-        .options(joinedload(SocialAccount.user)) # 关键优化：避免 N+1 查询
     )
     result = await db.execute(query)
-    social_account = result.scalars().first()
+    user = result.scalars().first()
     
-    if social_account:
-        return social_account.user  # 老用户，直接返回
+    if user:
+        return user  # 老用户，直接返回
 
-    # 2. 新用户：在事务中创建 User 和 SocialAccount
+    # 2. 新用户：在同一个事务中创建 User 和 SocialAccount
     try:
-        # 创建 User (此时 nickname="微信用户", phone=None)
-        new_user = User()
-        db.add(new_user)
-        await db.flush()  # 立即执行插入，以便获取 new_user.uid
-
-        # 创建 SocialAccount 并关联
-        new_social = SocialAccount(
-            user_id=new_user.uid,
-            provider=provider,
-            provider_id=provider_id
+        # 所有列都在本地赋值 (包括时间)，提交后不需要再 refresh；
+        # 提交时的 flush 按外键顺序依次 INSERT users、social_accounts
+        now = datetime.now(timezone.utc)
+        new_user = User(
+            uid=str(ulid.new()), nickname="微信用户", role="customer", level=1, is_active=True,
+            created_at=now, updated_at=now
         )
-        db.add(new_social)
-        
-        await db.commit()
-        await db.refresh(new_user) # 刷新 new_user 以获取所有数据
-        
-        return new_user
+        db.add_all([
+            new_user,
+            SocialAccount(
+                uid=str(ulid.new()), user_id=new_user.uid,
+                provider=provider, provider_id=provider_id, created_at=now
+            ),
+        ])
+        try:
+            await db.commit()
+            return new_user
+        except IntegrityError as e:
+            if not _is_duplicate_social_account(e):
+                raise
 
-    except IntegrityError:
-        # 极小概率下，两个请求同时尝试创建同一个(provider, provider_id)
+        # 3. 竞争失败：另一个请求已经为该 openid 创建了用户，丢弃自己创建的 User
         await db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="创建用户时发生并发冲突，请重试"
-        )
+        result = await db.execute(query)
+        user = result.scalars().first()
+        if user is None:
+            raise Exception(f"社交账号 {provider}:{provider_id} 已存在，但未找到关联用户")
+        return user
+
     except Exception as e:
         await db.rollback()
         print(f"创建用户和社交账号失败: {e}")
@@ -121,11 +160,19 @@ JWT_SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-def create_access_token(subject: str) -> str:
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+def create_access_token(subject: str, role: str, active: bool = True) -> str:
+    """
+    签发 Token。role、active 和 iat 让 get_current_claims 不查询数据库就能完成角色检查；
+    角色 / 停用状态变更后，旧 Token 通过 revocation 模块吊销。
+    """
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {
         "exp": expire,
+        "iat": now.timestamp(), # 精确到微秒 (NumericDate 可以不是整数)，见 revocation.is_revoked
         "sub": str(subject), 
+        "role": role,
+        "active": active,
     }
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -138,6 +185,20 @@ def get_password_hash(password: str) -> str:
     """生成密码的哈希值"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password 的异步版本 (在 password_executor 中执行)，线程池繁忙时抛出 503"""
+    try:
+        return await password_executor.run(verify_password, plain_password, hashed_password)
+    except ExecutorBusy:
+        raise PASSWORD_BUSY_ERROR
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash 的异步版本 (在 password_executor 中执行)，线程池繁忙时抛出 503"""
+    try:
+        return await password_executor.run(get_password_hash, password)
+    except ExecutorBusy:
+        raise PASSWORD_BUSY_ERROR
+
 async def authenticate_admin_user(
     db: AsyncSession, 
     login_data: AdminLoginRequest
@@ -154,8 +215,8 @@ async def authenticate_admin_user(
     if not user or user.role not in ('admin', 'technician'):
         return None # 用户不存在，或只是个普通客户
 
-    # 3. 检查密码是否正确
-    if not user.password_hash or not verify_password(login_data.password, user.password_hash):
+    # 3. 检查密码是否正确 (在线程池中执行，不阻塞事件循环)
+    if not user.password_hash or not await verify_password_async(login_data.password, user.password_hash):
         return None # 密码错误
         
     return user
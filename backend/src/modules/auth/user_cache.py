@@ -0,0 +1,222 @@
+# src/modules/auth/user_cache.py
+
+"""
+已登录用户的两级缓存 (get_current_user 使用)
+
+几乎每个接口都依赖 get_current_user，原来每次请求都要 select(User) 一次。现在：
+    L1: 进程内 TTL LRU (USER_CACHE_LOCAL_TTL_SECONDS，默认 10 秒)
+    L2: Redis  user:{uid} -> JSON (USER_CACHE_TTL_SECONDS，默认 300 秒)
+两级都未命中时才查询数据库，并回填两级缓存。
+
+回填的版本检查：
+    查询数据库和回填之间，另一个请求可能已经修改了用户并完成失效，直接回填会把旧数据写回缓存。
+    因此每个用户在 Redis 中还有一个失效版本号 user:{uid}:gen (每次失效 INCR)，
+    get_user_fields 未命中时顺带读出版本号 (同一次 MGET)，store_user 用 Lua 脚本比较，
+    版本号变化时不写入；进程内 L1 同样记录一个失效计数，回填前比较。
+
+只缓存 users 表的列 (不含 password_hash，也不含任何关联关系)。
+
+失效：
+    通过 ORM 事件监听 User 的更新 / 删除 (角色、is_active、昵称、手机号等任何列)，
+    在事务提交后清除本进程的 L1，并删除 Redis 中的 L2。
+    其他进程的 L1 最多在 USER_CACHE_LOCAL_TTL_SECONDS 后过期，这是跨进程的最大延迟。
+    注意：绕过 ORM 的 Core update(User) 语句不会触发失效，需要手动调用 invalidate_user。
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from redis.exceptions import RedisError
+from sqlalchemy import DateTime, event
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.core.redis import get_redis
+from src.shared.models.user_models import User
+
+KEY_PREFIX = "user"
+
+# 不放进缓存的列
+_EXCLUDED_COLUMNS = {"password_hash"}
+_CACHED_COLUMNS = [
+    attr.key for attr in User.__mapper__.column_attrs if attr.key not in _EXCLUDED_COLUMNS
+]
+_DATETIME_COLUMNS = {
+    attr.key for attr in User.__mapper__.column_attrs
+    if isinstance(attr.columns[0].type, DateTime)
+}
+
+# L1: {uid: (过期时间 (monotonic), 列值)}
+_local: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+# 本进程的失效计数：任何用户失效都递增，回填 L1 前比较 (只会让并发加载的其他用户少回填一次)
+_local_epoch = 0
+# 事务提交后异步删除 Redis 的任务 (保留引用，防止任务被垃圾回收)
+_pending_tasks: set[asyncio.Task] = set()
+
+
+# 版本号不变时才写入 L2 (KEYS = [缓存, 版本号]，ARGV = [读到的版本号 (不存在时为空串), JSON, TTL])
+_STORE_SCRIPT = """
+local gen = redis.call('GET', KEYS[2]) or ''
+if gen ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class FillVersion:
+    """get_user_fields 未命中时读到的版本号，传给 store_user 做回填检查"""
+    __slots__ = ("local_epoch", "gen")
+
+    def __init__(self, local_epoch: int, gen: str | None):
+        self.local_epoch = local_epoch
+        self.gen = gen  # Redis 中的版本号 (不存在时为空串)；Redis 不可用时为 None，不回填 L2
+
+
+def _key(user_uid: str) -> str:
+    return f"{KEY_PREFIX}:{user_uid}"
+
+
+def _gen_key(user_uid: str) -> str:
+    return f"{_key(user_uid)}:gen"
+
+
+def _dump(fields: dict) -> str:
+    return json.dumps({
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in fields.items()
+    })
+
+
+def _load(raw: str) -> dict:
+    fields = json.loads(raw)
+    for key in _DATETIME_COLUMNS:
+        if fields.get(key) is not None:
+            fields[key] = datetime.fromisoformat(fields[key])
+    return fields
+
+
+def _remember_local(user_uid: str, fields: dict) -> None:
+    if settings.USER_CACHE_LOCAL_SIZE <= 0:
+        return
+    _local[user_uid] = (time.monotonic() + settings.USER_CACHE_LOCAL_TTL_SECONDS, fields)
+    _local.move_to_end(user_uid)
+    while len(_local) > settings.USER_CACHE_LOCAL_SIZE:
+        _local.popitem(last=False)
+
+
+async def get_user_fields(user_uid: str) -> tuple[dict | None, FillVersion | None]:
+    """
+    依次查询 L1、L2，返回 (用户的列值 (用于构造 User), None)；
+    都未命中时返回 (None, 回填版本号)，查询数据库后连同版本号一起传给 store_user。
+    """
+    if not settings.USER_CACHE_ENABLED:
+        return None, None
+
+    # 1. L1
+    entry = _local.get(user_uid)
+    if entry is not None:
+        expires_at, fields = entry
+        if expires_at > time.monotonic():
+            _local.move_to_end(user_uid)
+            return fields, None
+        del _local[user_uid]
+
+    # 2. L2 (未命中时同一次请求读出版本号)
+    local_epoch = _local_epoch
+    try:
+        raw, gen = await get_redis().mget(_key(user_uid), _gen_key(user_uid))
+    except RedisError as e:
+        print(f"读取用户缓存失败: {e}")
+        return None, FillVersion(local_epoch, None)
+    if raw is None:
+        return None, FillVersion(local_epoch, gen or "")
+
+    fields = _load(raw)
+    if local_epoch == _local_epoch: # 等待 Redis 期间有失效时，读到的可能是旧值，不放进 L1
+        _remember_local(user_uid, fields)
+    return fields, None
+
+
+async def store_user(user: User, version: FillVersion | None) -> None:
+    """从数据库加载用户之后回填两级缓存；get_user_fields 之后发生过失效时不回填"""
+    if not settings.USER_CACHE_ENABLED or version is None:
+        return
+
+    fields = {key: getattr(user, key) for key in _CACHED_COLUMNS}
+    if version.local_epoch == _local_epoch:
+        _remember_local(user.uid, fields)
+    if version.gen is None:
+        return
+    try:
+        await get_redis().eval(
+            _STORE_SCRIPT, 2, _key(user.uid), _gen_key(user.uid),
+            version.gen, _dump(fields), settings.USER_CACHE_TTL_SECONDS,
+        )
+    except RedisError as e:
+        print(f"写入用户缓存失败: {e}")
+
+
+def _forget_local(user_uids) -> None:
+    global _local_epoch
+    _local_epoch += 1
+    for user_uid in user_uids:
+        _local.pop(user_uid, None)
+
+
+async def invalidate_user(*user_uids: str) -> None:
+    """使用户缓存失效 (本进程 L1 + Redis L2)，并递增版本号，让进行中的回填放弃写入"""
+    _forget_local(user_uids)
+    if not settings.USER_CACHE_ENABLED or not user_uids:
+        return
+
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for user_uid in user_uids:
+                pipe.incr(_gen_key(user_uid))
+                # 版本号只需要比一次 "读版本号 -> 查询数据库 -> 回填" 活得久，与缓存同一有效期即可
+                pipe.expire(_gen_key(user_uid), settings.USER_CACHE_TTL_SECONDS)
+                pipe.delete(_key(user_uid))
+            await pipe.execute()
+    except RedisError as e:
+        print(f"用户缓存失效失败: {e}")
+
+
+# --- ORM 事件：用户被修改 / 删除后自动失效 ---
+
+_SESSION_INFO_KEY = "user_cache_dirty"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_dirty(mapper, connection, target: User) -> None:
+    """flush 时记录被修改的用户 (此时事务尚未提交，先不失效)"""
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).add(target.uid)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    """事务提交后失效：先同步清除 L1，再在事件循环中异步删除 Redis"""
+    user_uids = session.info.pop(_SESSION_INFO_KEY, None)
+    if not user_uids:
+        return
+
+    _forget_local(user_uids)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return # 不在事件循环中 (例如同步脚本)，L2 依靠 TTL 过期
+    task = loop.create_task(invalidate_user(*user_uids))
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
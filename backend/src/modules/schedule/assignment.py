@@ -0,0 +1,120 @@
+# src/modules/schedule/assignment.py
+
+"""
+预约的技师 / 房间分配策略 (纯内存，不访问数据库)
+
+同一个时间往往有多个空闲的技师和房间，选哪一个不影响这次预约，但会影响当天之后还能接多少预约：
+把 60 分钟的预约放进一个 70 分钟的空档，剩下的 10 分钟谁也用不上；
+放进一段完整的空闲时间中间，则可能把它切成两段都放不下一个服务的碎片。
+
+策略只负责给候选排序 (越靠前越优先)，真正的占用仍由 _lock_first_free (行锁) 和
+slot_holds.create_hold (Redis) 按这个顺序尝试，所以换策略不会影响并发安全。
+
+    first         按 UID 排序 (原有行为)
+    best_fit      优先选择 "放进去之后留下的碎片最少" 的技师 / 房间：
+                  前后剩余的空闲时间中，短于最短服务时长的部分视为浪费，浪费最少者优先，
+                  其次是所在空档最小者 (最贴合的空档)
+    least_loaded  优先选择当天已占用时间最少的技师 / 房间，其次按 best_fit
+
+由 settings.APPOINTMENT_ASSIGNMENT_STRATEGY 选择；没有当天的快照 (Redis 不可用) 时退回 first。
+benchmarks/bench_assignment.py 用模拟的一天预约请求对比各策略实际能接的预约数。
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Sequence
+
+from .engine import Interval
+from .snapshot import DaySchedule
+
+ZERO = timedelta(0)
+
+
+class Placement:
+    """一个资源 (技师或房间) 在某个时间段被占用时的上下文"""
+    __slots__ = ("busy", "frame_start", "frame_end", "start", "end", "min_duration")
+
+    def __init__(
+        self,
+        busy: Sequence[Interval],
+        frame_start: datetime,
+        frame_end: datetime,
+        start: datetime,
+        end: datetime,
+        min_duration: timedelta
+    ):
+        self.busy = busy                # 该资源当天已占用的区间
+        self.frame_start = frame_start  # 可用时间的边界：技师为所在排班，房间为当天营业时间 (最早排班开始 ~ 最晚排班结束)
+        self.frame_end = frame_end
+        self.start = start
+        self.end = end
+        self.min_duration = min_duration  # 最短的服务占用时长，更短的空闲时间无法再接预约
+
+    def gaps(self) -> tuple[timedelta, timedelta]:
+        """占用之后，紧挨在前面 / 后面剩下的空闲时间"""
+        previous_end = max((e for s, e in self.busy if e <= self.start), default=self.frame_start)
+        next_start = min((s for s, e in self.busy if s >= self.end), default=self.frame_end)
+        before = self.start - max(previous_end, self.frame_start)
+        after = min(next_start, self.frame_end) - self.end
+        return max(before, ZERO), max(after, ZERO)
+
+    def booked(self) -> timedelta:
+        return sum((e - s for s, e in self.busy), ZERO)
+
+
+def _first(placement: Placement) -> tuple:
+    return ()
+
+
+def _best_fit(placement: Placement) -> tuple:
+    before, after = placement.gaps()
+    wasted = sum((gap for gap in (before, after) if ZERO < gap < placement.min_duration), ZERO)
+    return wasted, before + after
+
+
+def _least_loaded(placement: Placement) -> tuple:
+    return placement.booked(), *_best_fit(placement)
+
+
+STRATEGIES: dict[str, Callable[[Placement], tuple]] = {
+    "first": _first,
+    "best_fit": _best_fit,
+    "least_loaded": _least_loaded,
+}
+
+
+def rank_candidates(
+    strategy: str,
+    schedule: DaySchedule | None,
+    tech_uids: list[str],
+    room_uids: list[str],
+    start: datetime,
+    tech_end: datetime,
+    room_end: datetime
+) -> tuple[list[str], list[str]]:
+    """按策略给空闲的技师 / 房间排序，返回 (技师UID列表, 房间UID列表)，第一个是首选"""
+    if schedule is None or strategy == "first":
+        return sorted(tech_uids), sorted(room_uids)
+    score = STRATEGIES[strategy]
+
+    tech_min = min((tech for tech, _ in schedule.services.values()), default=ZERO)
+    room_min = min((room for _, room in schedule.services.values()), default=ZERO)
+    all_shifts = [interval for shifts in schedule.shifts.values() for interval in shifts]
+    open_start = min((s for s, _ in all_shifts), default=start)
+    open_end = max((e for _, e in all_shifts), default=room_end)
+
+    def tech_placement(tech_uid: str) -> Placement:
+        shift_start, shift_end = next(
+            ((s, e) for s, e in schedule.shifts.get(tech_uid, ()) if s <= start and e >= tech_end),
+            (start, tech_end)
+        )
+        return Placement(schedule.tech_bookings.get(tech_uid, ()), shift_start, shift_end, start, tech_end, tech_min)
+
+    def room_placement(room_uid: str) -> Placement:
+        return Placement(
+            schedule.room_bookings.get(room_uid, ()), open_start, max(open_end, room_end), start, room_end, room_min
+        )
+
+    return (
+        sorted(tech_uids, key=lambda uid: (score(tech_placement(uid)), uid)),
+        sorted(room_uids, key=lambda uid: (score(room_placement(uid)), uid)),
+    )
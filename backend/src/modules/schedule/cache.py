@@ -0,0 +1,376 @@
+# src/modules/schedule/cache.py
+
+"""
+可用时间槽的 Redis 缓存
+
+存储结构：
+    availability:{location_uid}:{YYYY-MM-DD}   (Hash，AVAILABILITY_CACHE_TTL_SECONDS 后过期)
+        __ts           -> 最近一次失效的时间 (Unix 秒)
+        {service_uid}  -> JSON: {"g": 全局版本号, "slots": ["08:30", ...], "exp": 有效期 (可选)}
+        first:{service_uid}
+                       -> JSON: {"g": 全局版本号, "first": "08:30" 或 null, "exp": 有效期 (可选)}
+                          当天第一个可用时间的摘要 (用于跨地点的最早可约查询)，与完整列表同时失效
+    availability:{location_uid}:{YYYY-MM-DD}:gen   (String，_gen_ttl() 秒后过期)
+        该 (地点, 日期) 的版本号，每次失效 +1 并重新设置过期时间。
+        不能和缓存值放在同一个 Hash 里：Hash 每次写入都会续期，而且过期后版本号会回到 0，
+        持有旧版本号的 CAS 写入和 DaySchedule 快照就会把已失效的结果当作有效。
+        版本号只需要比持有它的一方活得久：CAS 写入 (一次计算的时间)、
+        快照 (最多 AVAILABILITY_CACHE_TTL_SECONDS 秒) 和从副本读取的数据 (再加 DB_REPLICA_MAX_LAG_SECONDS)，
+        过期时间取两倍缓存 TTL 加副本延迟；之后回到 0 也不会再被误认，key 的数量不会无限增长
+    availability:gen                           (String)
+        全局版本号。服务时长、技师技能、房间等影响所有地点 / 日期的变更，直接 +1
+    availability:gen_ts                        (String)
+        最近一次全局失效的时间 (Unix 秒)
+
+失效时间用于只读副本：副本的数据最多落后 DB_REPLICA_MAX_LAG_SECONDS，
+在最近一次变更之后的这段时间内，从副本计算的结果只能短暂缓存 (见 service._cache_valid_until)。
+
+精确失效：
+    读取缓存时同时拿到两个版本号；缓存未命中时，先记下版本号再查数据库计算，
+    写回时用 Lua 脚本校验版本号没有变化 (CAS)。
+    这样即使 "计算" 和 "预约提交" 并发，也不会把过期的结果写进缓存。
+
+Redis 不可用时所有操作都静默降级为直接查询数据库。
+"""
+
+import json
+import math
+import time
+from datetime import date
+
+from redis.exceptions import RedisError
+
+from src.core.config import settings
+from src.core.redis import get_redis
+
+KEY_PREFIX = "availability"
+GLOBAL_GEN_KEY = f"{KEY_PREFIX}:gen"
+GLOBAL_TS_KEY = f"{KEY_PREFIX}:gen_ts"
+TS_FIELD = "__ts"
+FIRST_FIELD_PREFIX = "first:"
+
+# KEYS[1] = 日期 Hash, KEYS[2] = 全局版本号, KEYS[3] = 日期版本号
+# ARGV = [字段 (服务UID 或 first:服务UID), value, 期望的日期版本号, 期望的全局版本号, ttl]
+_STORE_SCRIPT = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[3] then
+    return 0
+end
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[4] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+return 1
+"""
+
+# KEYS = 需要失效的 [日期 Hash, 日期版本号, 日期 Hash, 日期版本号, ...], ARGV = [ttl, now, 版本号 ttl]
+# 删除所有缓存值，递增版本号 (版本号在持有方的有效期内必须单调递增，CAS 才可靠，见模块说明)
+_INVALIDATE_SCRIPT = """
+for i = 1, #KEYS, 2 do
+    redis.call('INCR', KEYS[i + 1])
+    redis.call('EXPIRE', KEYS[i + 1], tonumber(ARGV[3]))
+    redis.call('DEL', KEYS[i])
+    redis.call('HSET', KEYS[i], '__ts', ARGV[2])
+    redis.call('EXPIRE', KEYS[i], tonumber(ARGV[1]))
+end
+return #KEYS / 2
+"""
+
+
+def _day_key(location_uid: str, target_date: date) -> str:
+    return f"{KEY_PREFIX}:{location_uid}:{target_date.isoformat()}"
+
+
+def _gen_key(location_uid: str, target_date: date) -> str:
+    return f"{_day_key(location_uid, target_date)}:gen"
+
+
+def _gen_ttl() -> int:
+    """日期版本号的过期时间 (秒)：比快照、CAS 写入和副本延迟可能持有旧版本号的时间都长"""
+    return 2 * settings.AVAILABILITY_CACHE_TTL_SECONDS + math.ceil(settings.DB_REPLICA_MAX_LAG_SECONDS)
+
+
+def _first_field(service_uid: str) -> str:
+    return f"{FIRST_FIELD_PREFIX}{service_uid}"
+
+
+def _parse(value: str | None, global_gen: str, now: float) -> dict | None:
+    """解析一个缓存值，全局版本号不一致或已过期时返回 None"""
+    if value is None:
+        return None
+    cached = json.loads(value)
+    if cached.get("g") != global_gen:
+        return None
+    if "exp" in cached and cached["exp"] <= now:
+        return None # 计算时包含的预约保留已过期
+    return cached
+
+
+class CacheLookup:
+    """
+    一次缓存读取的结果。
+    hits 中是命中的日期；未命中的日期需要计算，并带着这里记录的版本号调用 store_slots。
+    """
+    __slots__ = ("hits", "day_gens", "global_gen", "day_changed_at", "global_changed_at")
+
+    def __init__(self):
+        self.hits: dict[date, list[str]] = {}
+        self.day_gens: dict[date, str] = {}
+        self.global_gen: str | None = None
+        self.day_changed_at: dict[date, float] = {}
+        self.global_changed_at = 0.0
+
+    def last_change(self, target_date: date) -> float:
+        """某一天的数据最近一次变更 (失效) 的时间，Unix 秒；未知时为 0"""
+        return max(self.global_changed_at, self.day_changed_at.get(target_date, 0.0))
+
+    def version(self, target_date: date) -> str | None:
+        """某一天数据的版本号 (全局版本号 + 日期版本号)，用作 DaySchedule 快照的版本；读取失败时为 None"""
+        if self.global_gen is None or target_date not in self.day_gens:
+            return None
+        return f"{self.global_gen}:{self.day_gens[target_date]}"
+
+
+async def lookup_slots(location_uid: str, service_uid: str, dates: list[date]) -> CacheLookup:
+    """批量读取多个日期的缓存 (一次网络往返)"""
+    lookup = CacheLookup()
+    if not settings.AVAILABILITY_CACHE_ENABLED or not dates:
+        return lookup
+
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.get(GLOBAL_GEN_KEY)
+            pipe.get(GLOBAL_TS_KEY)
+            for target_date in dates:
+                pipe.hmget(_day_key(location_uid, target_date), service_uid, TS_FIELD)
+                pipe.get(_gen_key(location_uid, target_date))
+            results = await pipe.execute()
+    except RedisError as e:
+        print(f"读取可用时间缓存失败: {e}")
+        return lookup
+
+    lookup.global_gen = results[0] or "0"
+    lookup.global_changed_at = float(results[1] or 0)
+    now = time.time()
+    for target_date, (value, changed_at), day_gen in zip(dates, results[2::2], results[3::2]):
+        lookup.day_gens[target_date] = day_gen or "0"
+        lookup.day_changed_at[target_date] = float(changed_at or 0)
+        cached = _parse(value, lookup.global_gen, now)
+        if cached is not None:
+            lookup.hits[target_date] = cached["slots"]
+    return lookup
+
+
+async def lookup_first_slots(
+    service_uid: str,
+    keys: list[tuple[str, date]]
+) -> tuple[dict[str, CacheLookup], dict[tuple[str, date], str | None]]:
+    """
+    批量读取多个 (地点, 日期) 的 "第一个可用时间" (一次网络往返)。
+    返回 ({地点UID: 版本号}, {(地点UID, 日期): "08:30" 或 None (当天没有可用时间)})，未命中的不在结果中。
+    完整的可用时间列表已缓存时，直接取它的第一个。未命中的计算后使用 store_first_slots 写回。
+    """
+    lookups = {location_uid: CacheLookup() for location_uid, _ in keys}
+    if not settings.AVAILABILITY_CACHE_ENABLED or not keys:
+        return lookups, {}
+
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.get(GLOBAL_GEN_KEY)
+            pipe.get(GLOBAL_TS_KEY)
+            for location_uid, target_date in keys:
+                pipe.hmget(_day_key(location_uid, target_date), service_uid, _first_field(service_uid), TS_FIELD)
+                pipe.get(_gen_key(location_uid, target_date))
+            results = await pipe.execute()
+    except RedisError as e:
+        print(f"读取可用时间缓存失败: {e}")
+        return lookups, {}
+
+    global_gen = results[0] or "0"
+    global_changed_at = float(results[1] or 0)
+    for lookup in lookups.values():
+        lookup.global_gen = global_gen
+        lookup.global_changed_at = global_changed_at
+
+    hits: dict[tuple[str, date], str | None] = {}
+    now = time.time()
+    for (location_uid, target_date), (slots_value, first_value, changed_at), day_gen in zip(
+        keys, results[2::2], results[3::2]
+    ):
+        lookup = lookups[location_uid]
+        lookup.day_gens[target_date] = day_gen or "0"
+        lookup.day_changed_at[target_date] = float(changed_at or 0)
+        cached = _parse(slots_value, global_gen, now)
+        if cached is not None:
+            hits[(location_uid, target_date)] = cached["slots"][0] if cached["slots"] else None
+            continue
+        cached = _parse(first_value, global_gen, now)
+        if cached is not None:
+            hits[(location_uid, target_date)] = cached["first"]
+    return lookups, hits
+
+
+async def lookup_location_day(location_uid: str, target_date: date) -> tuple[CacheLookup, dict[str, list[str]]]:
+    """
+    读取某地点某一天所有服务的缓存 (一次网络往返)，返回 (版本号, {服务UID: 可用时间})。
+    用于按地点查询：只有未命中的服务需要计算，写回时使用 store_services。
+    """
+    lookup = CacheLookup()
+    if not settings.AVAILABILITY_CACHE_ENABLED:
+        return lookup, {}
+
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.get(GLOBAL_GEN_KEY)
+            pipe.get(GLOBAL_TS_KEY)
+            pipe.hgetall(_day_key(location_uid, target_date))
+            pipe.get(_gen_key(location_uid, target_date))
+            global_gen, global_ts, fields, day_gen = await pipe.execute()
+    except RedisError as e:
+        print(f"读取可用时间缓存失败: {e}")
+        return lookup, {}
+
+    lookup.global_gen = global_gen or "0"
+    lookup.global_changed_at = float(global_ts or 0)
+    lookup.day_gens[target_date] = day_gen or "0"
+    lookup.day_changed_at[target_date] = float(fields.pop(TS_FIELD, None) or 0)
+
+    hits: dict[str, list[str]] = {}
+    now = time.time()
+    for field, value in fields.items():
+        if field.startswith(FIRST_FIELD_PREFIX):
+            continue
+        cached = _parse(value, lookup.global_gen, now)
+        if cached is not None:
+            hits[field] = cached["slots"]
+    return lookup, hits
+
+
+async def day_version(location_uid: str, target_date: date) -> str | None:
+    """单独读取某一天数据的版本号 (格式与 CacheLookup.version 相同)"""
+    if not settings.AVAILABILITY_CACHE_ENABLED:
+        return None
+
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.get(GLOBAL_GEN_KEY)
+            pipe.get(_gen_key(location_uid, target_date))
+            global_gen, day_gen = await pipe.execute()
+    except RedisError as e:
+        print(f"读取可用时间缓存失败: {e}")
+        return None
+    return f"{global_gen or '0'}:{day_gen or '0'}"
+
+
+async def store_slots(
+    location_uid: str,
+    service_uid: str,
+    lookup: CacheLookup,
+    days: dict[date, list[str]],
+    valid_until: dict[date, float] | None = None
+) -> None:
+    """
+    把计算结果写回缓存；如果读取之后版本号已变化 (期间有预约或排班变更)，则放弃写入。
+    valid_until 中的日期只在给定的 Unix 时间之前有效 (用于包含预约保留的结果)。
+    """
+    valid_until = valid_until or {}
+    await _store(location_uid, lookup, [
+        (target_date, service_uid, {"slots": slots}, valid_until.get(target_date))
+        for target_date, slots in days.items()
+    ])
+
+
+async def store_services(
+    location_uid: str,
+    target_date: date,
+    lookup: CacheLookup,
+    services: dict[str, list[str]],
+    valid_until: float | None = None
+) -> None:
+    """把某一天多个服务的计算结果写回缓存 (lookup_location_day 的对应写入)，规则与 store_slots 相同"""
+    await _store(location_uid, lookup, [
+        (target_date, service_uid, {"slots": slots}, valid_until)
+        for service_uid, slots in services.items()
+    ])
+
+
+async def store_first_slots(
+    location_uid: str,
+    service_uid: str,
+    lookup: CacheLookup,
+    days: dict[date, str | None],
+    valid_until: dict[date, float] | None = None
+) -> None:
+    """写回 lookup_first_slots 未命中的 "第一个可用时间"，规则与 store_slots 相同"""
+    valid_until = valid_until or {}
+    await _store(location_uid, lookup, [
+        (target_date, _first_field(service_uid), {"first": first}, valid_until.get(target_date))
+        for target_date, first in days.items()
+    ])
+
+
+async def _store(
+    location_uid: str,
+    lookup: CacheLookup,
+    entries: list[tuple[date, str, dict, float | None]]
+) -> None:
+    """在一个 pipeline 中写入 (日期, 字段, 缓存内容, 有效期) 列表，每一项都用 Lua 脚本校验版本号"""
+    if lookup.global_gen is None or not entries:
+        return
+
+    redis = get_redis()
+    store = redis.register_script(_STORE_SCRIPT)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for target_date, field, payload, expires_at in entries:
+                cached = {"g": lookup.global_gen, **payload}
+                if expires_at is not None:
+                    cached["exp"] = expires_at
+                value = json.dumps(cached)
+                await store(
+                    keys=[_day_key(location_uid, target_date), GLOBAL_GEN_KEY, _gen_key(location_uid, target_date)],
+                    args=[
+                        field,
+                        value,
+                        lookup.day_gens.get(target_date, "0"),
+                        lookup.global_gen,
+                        settings.AVAILABILITY_CACHE_TTL_SECONDS,
+                    ],
+                    client=pipe,
+                )
+            await pipe.execute()
+    except RedisError as e:
+        print(f"写入可用时间缓存失败: {e}")
+
+
+async def invalidate_days(location_uid: str, dates: list[date]) -> None:
+    """使某个地点若干天的缓存失效 (所有服务)"""
+    if not settings.AVAILABILITY_CACHE_ENABLED or not dates:
+        return
+
+    redis = get_redis()
+    try:
+        await redis.register_script(_INVALIDATE_SCRIPT)(
+            keys=[
+                key
+                for target_date in dates
+                for key in (_day_key(location_uid, target_date), _gen_key(location_uid, target_date))
+            ],
+            args=[settings.AVAILABILITY_CACHE_TTL_SECONDS, time.time(), _gen_ttl()],
+        )
+    except RedisError as e:
+        print(f"可用时间缓存失效失败: {e}")
+
+
+async def invalidate_all() -> None:
+    """使所有地点、所有日期的缓存失效 (用于服务时长、技师技能、房间等全局性变更)"""
+    if not settings.AVAILABILITY_CACHE_ENABLED:
+        return
+
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.incr(GLOBAL_GEN_KEY)
+            pipe.set(GLOBAL_TS_KEY, time.time())
+            await pipe.execute()
+    except RedisError as e:
+        print(f"可用时间缓存失效失败: {e}")
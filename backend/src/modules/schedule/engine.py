@@ -0,0 +1,376 @@
+# src/modules/schedule/engine.py
+
+"""
+可用时间计算引擎 (纯内存，不访问数据库)
+
+service 层负责把排班 / 预约从数据库中取出来，整理成按技师、按房间分组的时间区间，
+然后交给这里计算。
+
+核心思路 (扫描线)：
+    一个开始时间 s 对某个技师可行，当且仅当
+        1. 存在一个排班 [ss, se]，使 ss <= s 且 s + d <= se  ->  s ∈ [ss, se - d]
+        2. 对该技师的每个预约 [bs, be)，都不满足 bs < s + d 且 be > s
+                                                          ->  s ∉ (bs - d, be)
+    也就是说，我们直接在 "开始时间" 这个维度上做区间运算：
+    每个排班给出一个闭区间，每个预约挖掉一个开区间，剩下的就是该技师可以开始服务的时间段。
+    所有技师的结果取并集，所有房间的结果取并集，两者再取交集，最后只在交集里枚举网格点。
+
+    复杂度只与区间数量 (排班 + 预约) 有关，与时间网格的大小无关。
+"""
+
+from datetime import datetime, timedelta
+from typing import Iterable, Mapping, Sequence
+
+# 一个时间区间 (start, end)
+Interval = tuple[datetime, datetime]
+
+
+# --- 区间运算 ---
+
+def merge_closed(ranges: Iterable[Interval]) -> list[Interval]:
+    """合并闭区间 [lo, hi]，返回按开始时间排序、互不相交的列表"""
+    merged: list[list[datetime]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            if hi > merged[-1][1]:
+                merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+    return [(lo, hi) for lo, hi in merged]
+
+
+def merge_open(ranges: Iterable[Interval]) -> list[Interval]:
+    """
+    合并开区间 (lo, hi)。
+    注意：(a, b) 和 (b, c) 不能合并，因为 b 这个点本身是可用的。
+    """
+    merged: list[list[datetime]] = []
+    for lo, hi in sorted(ranges):
+        if lo >= hi:
+            continue  # 空区间
+        if merged and lo < merged[-1][1]:
+            if hi > merged[-1][1]:
+                merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+    return [(lo, hi) for lo, hi in merged]
+
+
+def subtract_open(lo: datetime, hi: datetime, holes: Sequence[Interval]) -> list[Interval]:
+    """从闭区间 [lo, hi] 中挖掉一组 (已合并、已排序的) 开区间"""
+    result: list[Interval] = []
+    cursor = lo
+    for h_lo, h_hi in holes:
+        if h_hi <= cursor:
+            continue
+        if h_lo >= hi:
+            break
+        if h_lo >= cursor:
+            result.append((cursor, h_lo))
+        cursor = h_hi
+        if cursor > hi:
+            return result
+    if cursor <= hi:
+        result.append((cursor, hi))
+    return result
+
+
+def intersect_closed(a: Sequence[Interval], b: Sequence[Interval]) -> list[Interval]:
+    """两组已合并、已排序的闭区间求交集 (双指针)"""
+    result: list[Interval] = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        lo = max(a[i][0], b[j][0])
+        hi = min(a[i][1], b[j][1])
+        if lo <= hi:
+            result.append((lo, hi))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+# --- 技师 / 房间 的可开始时间 ---
+
+def booking_holes(bookings: Iterable[Interval], duration: timedelta) -> list[Interval]:
+    """把预约 [bs, be) 转换成 "开始时间" 维度上需要挖掉的开区间 (bs - d, be)"""
+    return merge_open((bs - duration, be) for bs, be in bookings)
+
+
+def tech_start_ranges(
+    shifts: Iterable[Interval],
+    bookings: Iterable[Interval],
+    duration: timedelta,
+) -> list[Interval]:
+    """单个技师：所有排班内、且不与其预约冲突的可开始时间段"""
+    holes = booking_holes(bookings, duration)
+    ranges: list[Interval] = []
+    for shift_start, shift_end in shifts:
+        latest = shift_end - duration
+        if latest < shift_start:
+            continue  # 排班太短，放不下这个服务
+        ranges.extend(subtract_open(shift_start, latest, holes))
+    return ranges
+
+
+def room_start_ranges(
+    bookings: Iterable[Interval],
+    duration: timedelta,
+    window_start: datetime,
+    window_end: datetime,
+) -> list[Interval]:
+    """单个房间：房间没有排班的概念，在 [window_start, window_end] 内挖掉预约即可"""
+    return subtract_open(window_start, window_end, booking_holes(bookings, duration))
+
+
+# --- 网格 ---
+
+def grid_points(
+    ranges: Sequence[Interval],
+    origin: datetime,
+    end: datetime,
+    step: timedelta,
+) -> list[datetime]:
+    """
+    枚举落在 ranges 内的网格点 origin + k * step (且 < end)。
+    只在区间内部枚举，区间之间的空白直接跳过。
+    """
+    points: list[datetime] = []
+    for lo, hi in ranges:
+        if lo < origin:
+            lo = origin
+        # 向上取整到下一个网格点
+        k = -((origin - lo) // step)
+        t = origin + k * step
+        while t <= hi and t < end:
+            points.append(t)
+            t += step
+    return points
+
+
+def first_grid_point(
+    ranges: Sequence[Interval],
+    origin: datetime,
+    end: datetime,
+    step: timedelta,
+    not_before: datetime | None = None,
+) -> datetime | None:
+    """grid_points 中第一个不早于 not_before 的点 (找到即返回，不枚举后面的点)"""
+    floor = origin if not_before is None else max(origin, not_before)
+    for lo, hi in ranges:
+        if hi < floor:
+            continue
+        t = origin + -((origin - max(lo, floor)) // step) * step # 向上取整到网格点
+        if t <= hi and t < end:
+            return t
+        if t >= end:
+            return None
+    return None
+
+
+def search_bounds(
+    shifts: Iterable[Interval],
+    day_start: datetime,
+    day_end: datetime,
+) -> Interval | None:
+    """
+    当天的搜索范围：所有与当天重叠的排班中，最早的开始到最晚的结束 (并裁剪到当天)。
+    没有任何排班时返回 None。
+    """
+    today = [(s, e) for s, e in shifts if s < day_end and e > day_start]
+    if not today:
+        return None
+    return (
+        max(day_start, min(s for s, _ in today)),
+        min(day_end, max(e for _, e in today)),
+    )
+
+
+# --- 入口 ---
+
+def sweep_available_starts(
+    tech_shifts: Mapping[str, Sequence[Interval]],
+    tech_bookings: Mapping[str, Sequence[Interval]],
+    room_uids: Sequence[str],
+    room_bookings: Mapping[str, Sequence[Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    search_start: datetime,
+    search_end: datetime,
+    step: timedelta,
+) -> list[datetime]:
+    """
+    扫描线引擎：返回所有 "至少有一个技师空闲 且 至少有一个房间空闲" 的网格开始时间。
+
+    - tech_shifts:   {技师UID: [排班区间]}
+    - tech_bookings: {技师UID: [已占用区间]}
+    - room_uids:     该地点的所有房间
+    - room_bookings: {房间UID: [已占用区间]}
+    """
+    ranges = available_ranges(
+        tech_shifts, tech_bookings, room_uids, room_bookings,
+        tech_duration, room_duration, search_start, search_end,
+    )
+    return grid_points(ranges, search_start, search_end, step)
+
+
+def sweep_first_start(
+    tech_shifts: Mapping[str, Sequence[Interval]],
+    tech_bookings: Mapping[str, Sequence[Interval]],
+    room_uids: Sequence[str],
+    room_bookings: Mapping[str, Sequence[Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    search_start: datetime,
+    search_end: datetime,
+    step: timedelta,
+    not_before: datetime | None = None,
+) -> datetime | None:
+    """
+    sweep_available_starts 结果中第一个不早于 not_before 的时间 (没有时为 None)。
+    只求出可开始时间段，然后取第一个落在其中的网格点，不枚举整天的网格。
+    """
+    ranges = available_ranges(
+        tech_shifts, tech_bookings, room_uids, room_bookings,
+        tech_duration, room_duration, search_start, search_end,
+    )
+    return first_grid_point(ranges, search_start, search_end, step, not_before)
+
+
+def available_ranges(
+    tech_shifts: Mapping[str, Sequence[Interval]],
+    tech_bookings: Mapping[str, Sequence[Interval]],
+    room_uids: Sequence[str],
+    room_bookings: Mapping[str, Sequence[Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    search_start: datetime,
+    search_end: datetime,
+) -> list[Interval]:
+    """至少有一个技师空闲 且 至少有一个房间空闲 的可开始时间段 (已合并、已排序的闭区间)"""
+    if not tech_shifts or not room_uids:
+        return []
+
+    # 1. 所有技师可开始时间的并集
+    tech_ranges: list[Interval] = []
+    for tech_uid, shifts in tech_shifts.items():
+        tech_ranges.extend(
+            tech_start_ranges(shifts, tech_bookings.get(tech_uid, ()), tech_duration)
+        )
+    tech_ranges = merge_closed(tech_ranges)
+    if not tech_ranges:
+        return []
+
+    # 2. 所有房间可开始时间的并集 (只需要覆盖搜索范围)
+    room_ranges: list[Interval] = []
+    for room_uid in room_uids:
+        room_ranges.extend(
+            room_start_ranges(room_bookings.get(room_uid, ()), room_duration, search_start, search_end)
+        )
+    room_ranges = merge_closed(room_ranges)
+
+    # 3. 交集
+    return intersect_closed(tech_ranges, room_ranges)
+
+
+def sweep_slot_capacity(
+    tech_shifts: Mapping[str, Sequence[Interval]],
+    tech_bookings: Mapping[str, Sequence[Interval]],
+    room_uids: Sequence[str],
+    room_bookings: Mapping[str, Sequence[Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    search_start: datetime,
+    search_end: datetime,
+    step: timedelta,
+) -> list[tuple[datetime, int]]:
+    """
+    容量版扫描线引擎：参数与 sweep_available_starts 相同，返回 [(网格开始时间, 还能同时接的预约数), ...]，
+    只包含容量 > 0 的时间 (与 sweep_available_starts 返回的时间完全一致)。
+
+    同一时间的 k 个预约需要 k 个不同的空闲技师和 k 个不同的空闲房间，即空闲技师与空闲房间的最大匹配。
+    房间不区分类型，任何合格技师都能配任何空闲房间 (完全二分图)，所以最大匹配 = min(空闲技师数, 空闲房间数)。
+
+    计数是增量的：每个技师 / 房间的可开始时间段 (与 sweep_available_starts 相同) 在网格上记为
+    "起点 +1、终点之后 -1" 两个事件，按事件顺序累加，两个事件之间的计数不变，
+    只在容量 > 0 的段内枚举网格点。
+    复杂度为 区间数 + 有容量的网格点数：没有空闲容量的时间段不会被逐点检查，步长变小也只影响输出的点数。
+    """
+    if not tech_shifts or not room_uids or search_end <= search_start:
+        return []
+
+    n_points = -((search_start - search_end) // step) # 网格点 search_start + k * step < search_end 的个数
+    # {网格下标: [空闲技师数变化, 空闲房间数变化]}
+    events: dict[int, list[int]] = {}
+
+    def add_ranges(ranges: Sequence[Interval], column: int) -> None:
+        for lo, hi in ranges:
+            first = max(0, -((search_start - lo) // step)) # 向上取整
+            last = min(n_points - 1, (hi - search_start) // step) # 向下取整
+            if first <= last:
+                events.setdefault(first, [0, 0])[column] += 1
+                events.setdefault(last + 1, [0, 0])[column] -= 1
+
+    # 1. 每个技师的可开始时间段 (同一技师的区间先合并，避免重复计数)
+    for tech_uid, shifts in tech_shifts.items():
+        add_ranges(merge_closed(
+            tech_start_ranges(shifts, tech_bookings.get(tech_uid, ()), tech_duration)
+        ), 0)
+
+    # 2. 每个房间的可开始时间段
+    for room_uid in room_uids:
+        add_ranges(room_start_ranges(
+            room_bookings.get(room_uid, ()), room_duration, search_start, search_end
+        ), 1)
+
+    # 3. 按事件顺序累加，容量 = min(空闲技师数, 空闲房间数)
+    result: list[tuple[datetime, int]] = []
+    free_techs = free_rooms = 0
+    indexes = sorted(events)
+    for index, next_index in zip(indexes, indexes[1:]):
+        free_techs += events[index][0]
+        free_rooms += events[index][1]
+        capacity = min(free_techs, free_rooms)
+        if capacity > 0:
+            result.extend((search_start + k * step, capacity) for k in range(index, next_index))
+    return result
+
+
+def scan_slot_grid(
+    tech_shifts: Mapping[str, Sequence[Interval]],
+    tech_bookings: Mapping[str, Sequence[Interval]],
+    room_uids: Sequence[str],
+    room_bookings: Mapping[str, Sequence[Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    search_start: datetime,
+    search_end: datetime,
+    step: timedelta,
+) -> list[datetime]:
+    """
+    旧版算法 (逐个时间槽 × 逐个技师 × 逐个排班/预约 的三重循环)。
+    参数与 sweep_available_starts 相同，仅保留用于基准测试和结果对比。
+    """
+    available: list[datetime] = []
+    current = search_start
+    while current < search_end:
+        tech_end = current + tech_duration
+        room_end = current + room_duration
+
+        found_tech = False
+        for tech_uid, shifts in tech_shifts.items():
+            if not any(s <= current and e >= tech_end for s, e in shifts):
+                continue
+            if not any(bs < tech_end and be > current for bs, be in tech_bookings.get(tech_uid, ())):
+                found_tech = True
+                break
+
+        if found_tech:
+            for room_uid in room_uids:
+                if not any(bs < room_end and be > current for bs, be in room_bookings.get(room_uid, ())):
+                    available.append(current)
+                    break
+
+        current += step
+    return available
@@ -0,0 +1,195 @@
+# src/modules/schedule/holds.py
+
+"""
+预约时间的短期保留 (Redis)
+
+客户在小程序里选好时间、进入确认 / 支付页面时，先为其保留一个具体的技师和房间 N 秒，
+之后 create_appointment 直接使用保留的技师和房间，不再重新搜索候选。
+"选一个空闲的技师 + 房间并占住" 这一步由 Lua 脚本在 Redis 中原子完成，
+高峰期的争抢不会落到 MySQL 事务里。
+
+存储结构：
+    holds:{location_uid}   (Sorted Set)
+        member = "{hold_uid}|{技师UID}|{房间UID}|{开始}|{技师结束}|{房间结束}|{客户UID}" (时间为 Unix 秒)
+        score  = 过期时间 (Unix 秒)，读取 / 写入时先清掉已过期的成员
+    hold:{hold_uid}        (Hash, 带 TTL)
+        customer / service / location / member
+
+保留只是 "准入" 层：数据库中的预约记录和 create_appointment 的行锁仍然是最终的判断依据。
+"""
+
+import time
+from datetime import datetime, timezone
+
+import ulid
+from redis.exceptions import RedisError
+
+from src.core.config import settings
+from src.core.redis import get_redis
+
+KEY_PREFIX = "holds"
+
+# KEYS[1] = 地点 Sorted Set, KEYS[2] = 保留 Hash
+# ARGV = [now, expires_at, ttl, hold_uid, start, tech_end, room_end, customer, service, location,
+#         技师候选数 n, 技师候选 * n, 房间候选 ...]
+# 返回新保留的 member；没有空闲的技师 / 房间时分别返回 {0} / {-1}
+_HOLD_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+
+local start = tonumber(ARGV[5])
+local tech_end = tonumber(ARGV[6])
+local room_end = tonumber(ARGV[7])
+local busy_techs, busy_rooms = {}, {}
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local _, tech, room, s, te, re = string.match(member, '([^|]+)|([^|]+)|([^|]+)|([^|]+)|([^|]+)|([^|]+)')
+    s, te, re = tonumber(s), tonumber(te), tonumber(re)
+    if s < tech_end and te > start then busy_techs[tech] = true end
+    if s < room_end and re > start then busy_rooms[room] = true end
+end
+
+local n_techs = tonumber(ARGV[11])
+local tech, room
+for i = 12, 11 + n_techs do
+    if not busy_techs[ARGV[i]] then tech = ARGV[i]; break end
+end
+if not tech then return {0} end
+for i = 12 + n_techs, #ARGV do
+    if not busy_rooms[ARGV[i]] then room = ARGV[i]; break end
+end
+if not room then return {-1} end
+
+local member = table.concat({ARGV[4], tech, room, ARGV[5], ARGV[6], ARGV[7], ARGV[8]}, '|')
+redis.call('ZADD', KEYS[1], ARGV[2], member)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+redis.call('HSET', KEYS[2], 'customer', ARGV[8], 'service', ARGV[9], 'location', ARGV[10], 'member', member)
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[3]))
+return {member}
+"""
+
+
+def _location_key(location_uid: str) -> str:
+    return f"{KEY_PREFIX}:{location_uid}"
+
+
+def _hold_key(hold_uid: str) -> str:
+    return f"hold:{hold_uid}"
+
+
+def _from_ts(value: str) -> datetime:
+    return datetime.fromtimestamp(float(value), tz=timezone.utc)
+
+
+class SlotHold:
+    """一个有效的保留 (客户、技师、房间、时间段)"""
+    __slots__ = (
+        "uid", "customer_id", "technician_id", "resource_id",
+        "start_time", "tech_end_time", "room_end_time", "expires_at"
+    )
+
+    def __init__(self, member: str, expires_at: float):
+        # 升级前创建的 member 没有客户UID (最多存在 SLOT_HOLD_TTL_SECONDS 秒)
+        uid, tech, room, start, tech_end, room_end, *customer = member.split("|")
+        self.uid = uid
+        self.customer_id = customer[0] if customer else None
+        self.technician_id = tech
+        self.resource_id = room
+        self.start_time = _from_ts(start)
+        self.tech_end_time = _from_ts(tech_end)
+        self.room_end_time = _from_ts(room_end)
+        self.expires_at = expires_at
+
+
+async def create_hold(
+    customer_uid: str,
+    service_uid: str,
+    location_uid: str,
+    start: datetime,
+    tech_end: datetime,
+    room_end: datetime,
+    tech_candidates: list[str],
+    room_candidates: list[str]
+) -> SlotHold:
+    """
+    在候选中原子地选出第一个没有被其他保留占用的技师和房间，保留 SLOT_HOLD_TTL_SECONDS 秒。
+    候选应当已经排除了数据库中已被预约的技师 / 房间。
+    """
+    if not settings.SLOT_HOLDS_ENABLED:
+        raise Exception("预约保留功能未开启，请直接提交预约")
+
+    hold_uid = str(ulid.new())
+    now = time.time()
+    expires_at = now + settings.SLOT_HOLD_TTL_SECONDS
+
+    redis = get_redis()
+    try:
+        result = await redis.register_script(_HOLD_SCRIPT)(
+            keys=[_location_key(location_uid), _hold_key(hold_uid)],
+            args=[
+                now, expires_at, settings.SLOT_HOLD_TTL_SECONDS, hold_uid,
+                start.timestamp(), tech_end.timestamp(), room_end.timestamp(),
+                customer_uid, service_uid, location_uid,
+                len(tech_candidates), *tech_candidates, *room_candidates,
+            ],
+        )
+    except RedisError as e:
+        print(f"创建预约保留失败: {e}")
+        raise Exception("预约保留服务暂不可用，请直接提交预约")
+
+    if result == [0]:
+        raise Exception("该时间段的技师已被预约或保留，请选择其他时间")
+    if result == [-1]:
+        raise Exception("该时间段的房间已被预约或保留，请选择其他时间")
+
+    return SlotHold(result[0], expires_at)
+
+
+async def get_hold(hold_uid: str) -> tuple[dict, SlotHold] | None:
+    """读取一个仍然有效的保留，返回 (元数据, SlotHold)；不存在或已过期时返回 None"""
+    if not settings.SLOT_HOLDS_ENABLED:
+        return None
+
+    try:
+        info = await get_redis().hgetall(_hold_key(hold_uid))
+        if not info:
+            return None
+        expires_at = await get_redis().zscore(_location_key(info["location"]), info["member"])
+    except RedisError as e:
+        print(f"读取预约保留失败: {e}")
+        return None
+
+    if expires_at is None or expires_at <= time.time():
+        return None
+    return info, SlotHold(info["member"], expires_at)
+
+
+async def release_hold(hold_uid: str) -> dict | None:
+    """释放一个保留 (预约成功后、或客户放弃时)，返回被释放保留的元数据"""
+    redis = get_redis()
+    try:
+        info = await redis.hgetall(_hold_key(hold_uid))
+        if not info:
+            return None
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(_location_key(info["location"]), info["member"])
+            pipe.delete(_hold_key(hold_uid))
+            await pipe.execute()
+    except RedisError as e:
+        print(f"释放预约保留失败: {e}")
+        return None
+    return info
+
+
+async def active_holds(location_uid: str) -> list[SlotHold]:
+    """某地点当前所有有效的保留 (Redis 不可用时视为没有保留)"""
+    if not settings.SLOT_HOLDS_ENABLED:
+        return []
+
+    try:
+        members = await get_redis().zrangebyscore(
+            _location_key(location_uid), time.time(), "+inf", withscores=True
+        )
+    except RedisError as e:
+        print(f"读取预约保留失败: {e}")
+        return []
+    return [SlotHold(member, expires_at) for member, expires_at in members]
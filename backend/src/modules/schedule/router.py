@@ -3,10 +3,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from datetime import date
+from datetime import date, datetime, timezone
 
-from src.core.database import get_db
-from src.modules.auth.security import get_current_user # 1. 导入 get_current_user (普通用户即可)
+from src.core.database import get_db, get_read_db
+from src.modules.auth.security import get_current_user, get_current_claims # 1. 导入 get_current_user (普通用户即可)
+from src.modules.auth.schemas import TokenPayload
 from src.shared.models.user_models import User
 from . import schemas
 from . import service as schedule_service
@@ -25,9 +26,10 @@ async def get_availability(
     location_uid: str = Query(..., description="地点UID"),
     service_uid: str = Query(..., description="服务UID"),
     target_date: date = Query(..., description="查询日期 (YYYY-MM-DD)"),
-    db: AsyncSession = Depends(get_db),
-    # 2. 保护此接口，必须是登录用户才能查询
-    current_user: User = Depends(get_current_user) 
+    with_capacity: bool = Query(False, description="同时返回每个时间还能同时接的预约数 (团体预约 / 前台)"),
+    db: AsyncSession = Depends(get_read_db),
+    # 2. 保护此接口，必须是登录用户才能查询 (只校验 Token，不查询用户表)
+    claims: TokenPayload = Depends(get_current_claims)
 ):
     """
     (Customer Facing) 实时查询可预约的时间。
@@ -35,6 +37,15 @@ async def get_availability(
     这是系统的核心调度接口，基于 V6 架构 (排班表) 运行。
     """
     try:
+        if with_capacity:
+            capacity = await schedule_service.get_slot_capacity(
+                db=db,
+                location_uid=location_uid,
+                service_uid=service_uid,
+                target_date=target_date
+            )
+            return schemas.AvailabilityResponse(available_slots=list(capacity), capacity=capacity)
+
         slots = await schedule_service.get_available_slots(
             db=db,
             location_uid=location_uid,
@@ -52,6 +63,170 @@ async def get_availability(
             detail=str(e) or "查询可用时间失败"
         )
     
+@router.get(
+    "/availability/range",
+    response_model=schemas.AvailabilityRangeResponse,
+    summary="查询多天的可用预约时间槽 (日历)"
+)
+async def get_availability_range(
+    location_uid: str = Query(..., description="地点UID"),
+    service_uid: str = Query(..., description="服务UID"),
+    start_date: date = Query(..., description="开始日期 (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="结束日期 (YYYY-MM-DD，包含当天)"),
+    db: AsyncSession = Depends(get_read_db),
+    claims: TokenPayload = Depends(get_current_claims)
+):
+    """
+    (Customer Facing) 一次性查询日期范围内每一天的可用时间。
+
+    结果与逐天调用 `/availability` 相同，但整个范围只查询一次数据库。
+    """
+    try:
+        days = await schedule_service.get_available_slots_range(
+            db=db,
+            location_uid=location_uid,
+            service_uid=service_uid,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+        return schemas.AvailabilityRangeResponse(days=days)
+
+    except Exception as e:
+        print(f"Error in get_availability_range: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e) or "查询可用时间失败"
+        )
+
+@router.get(
+    "/availability/by-location",
+    response_model=schemas.LocationAvailabilityResponse,
+    summary="查询某地点所有服务的可用预约时间槽"
+)
+async def get_availability_by_location(
+    location_uid: str = Query(..., description="地点UID"),
+    target_date: date = Query(..., description="查询日期 (YYYY-MM-DD)"),
+    db: AsyncSession = Depends(get_read_db),
+    claims: TokenPayload = Depends(get_current_claims)
+):
+    """
+    (Customer Facing) 一次性查询某地点当天每个服务的可用时间。
+
+    结果与逐个服务调用 `/availability` 相同，但所有服务共用一次数据加载，查询次数与服务数量无关。
+    """
+    try:
+        services = await schedule_service.get_available_slots_by_location(
+            db=db,
+            location_uid=location_uid,
+            target_date=target_date
+        )
+
+        return schemas.LocationAvailabilityResponse(services=services)
+
+    except Exception as e:
+        print(f"Error in get_availability_by_location: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e) or "查询可用时间失败"
+        )
+
+@router.get(
+    "/availability/earliest",
+    response_model=schemas.EarliestSlotsResponse,
+    summary="查询某服务在所有地点最早的可约时间"
+)
+async def get_earliest_availability(
+    service_uid: str = Query(..., description="服务UID"),
+    start_date: date = Query(..., description="开始日期 (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="结束日期 (YYYY-MM-DD，包含当天)"),
+    limit: int = Query(5, description="返回数量"),
+    db: AsyncSession = Depends(get_read_db),
+    claims: TokenPayload = Depends(get_current_claims)
+):
+    """
+    (Customer Facing) "哪里最快能约上"：返回日期范围内、所有地点中最早的若干个可约时间。
+
+    找够数量后立即停止，不会计算每个地点每一天的完整可用时间。
+    """
+    try:
+        slots = await schedule_service.find_earliest_slots(
+            db=db,
+            service_uid=service_uid,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit
+        )
+
+        return schemas.EarliestSlotsResponse(slots=[
+            schemas.EarliestSlot(location_uid=location_uid, start_time=start_time)
+            for start_time, location_uid in slots
+        ])
+
+    except Exception as e:
+        print(f"Error in get_earliest_availability: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e) or "查询可用时间失败"
+        )
+
+@router.post(
+    "/holds",
+    response_model=schemas.SlotHoldPublic,
+    status_code=status.HTTP_201_CREATED,
+    summary="保留预约时间 (确认页面)"
+)
+async def create_hold(
+    hold_data: schemas.SlotHoldCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    (Customer Facing) 为客户保留一个技师和房间若干秒。
+    
+    保留期间该容量对其他客户不可见；带着返回的 hold_uid 调用 `/appointments` 即可完成预约。
+    """
+    try:
+        hold = await schedule_service.create_slot_hold(
+            db=db,
+            customer=current_user,
+            hold_data=hold_data
+        )
+
+        return schemas.SlotHoldPublic(
+            hold_uid=hold.uid,
+            start_time=hold.start_time,
+            expires_at=datetime.fromtimestamp(hold.expires_at, tz=timezone.utc)
+        )
+
+    except Exception as e:
+        print(f"Error in create_hold: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e) or "保留失败，该时间段可能刚被预订"
+        )
+
+@router.delete(
+    "/holds/{hold_uid}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="释放预约保留"
+)
+async def delete_hold(
+    hold_uid: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    (Customer Facing) 客户放弃预约时释放保留 (不释放也会在到期后自动失效)。
+    """
+    try:
+        await schedule_service.release_slot_hold(current_user, hold_uid)
+    except Exception as e:
+        print(f"Error in delete_hold: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e)
+        )
+
 @router.post(
     "/appointments",
     response_model=schemas.AppointmentPublic,
@@ -1,7 +1,7 @@
 # src/modules/schedule/schemas.py
 
 from pydantic import BaseModel, ConfigDict
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import date, datetime, time
 
 class AvailabilityResponse(BaseModel):
@@ -12,6 +12,37 @@ class AvailabilityResponse(BaseModel):
     # 这样前端可以更灵活地展示（例如 "9:00 (持续60分钟)")
     # 但为简单起见，V1 我们先只返回一个时间列表
     available_slots: List[str] # V1: ["08:30", "09:00"]
+    # (可选) with_capacity=true 时返回：每个可用时间还能同时接的预约数 (空闲技师与空闲房间的最大匹配)
+    capacity: Optional[Dict[str, int]] = None # {"08:30": 2, "09:00": 1}
+
+class AvailabilityRangeResponse(BaseModel):
+    """
+    用于 '多天可用时间' 接口 (小程序日历)
+    """
+    # 键是日期 "YYYY-MM-DD"，值与 AvailabilityResponse.available_slots 相同
+    # 范围内的每一天都会出现，没有可用时间的日期为空列表
+    days: Dict[str, List[str]] # {"2025-10-27": ["08:30", "09:00"], "2025-10-28": []}
+
+class LocationAvailabilityResponse(BaseModel):
+    """
+    用于 '某地点所有服务的可用时间' 接口 (小程序地点页面)
+    """
+    # 键是服务 UID，值与 AvailabilityResponse.available_slots 相同
+    # 每个服务都会出现，当天没有可用时间的服务为空列表
+    services: Dict[str, List[str]] # {"01J...": ["08:30", "09:00"], "01K...": []}
+
+class EarliestSlot(BaseModel):
+    """
+    跨地点最早可约时间中的一项
+    """
+    location_uid: str
+    start_time: datetime # 带时区，可直接用于创建预约 / 保留
+
+class EarliestSlotsResponse(BaseModel):
+    """
+    用于 '最早可约时间 (所有地点)' 接口
+    """
+    slots: List[EarliestSlot] # 按开始时间排序，找不到足够的时间时少于请求的数量
 
 class AppointmentCreate(BaseModel):
     """
@@ -22,6 +53,24 @@ class AppointmentCreate(BaseModel):
     # 客户将提交一个带时区的完整 ISO 格式时间字符串
     # 例如: "2025-10-24T09:00:00+08:00"
     start_time: datetime 
+    # (可选) POST /holds 返回的保留 UID，提交后直接使用保留的技师和房间
+    hold_uid: Optional[str] = None
+
+class SlotHoldCreate(BaseModel):
+    """
+    用于 '保留预约时间' 接口 (客户进入确认页面时调用)
+    """
+    service_uid: str
+    location_uid: str
+    start_time: datetime
+
+class SlotHoldPublic(BaseModel):
+    """
+    用于 '返回预约保留' 接口
+    """
+    hold_uid: str
+    start_time: datetime
+    expires_at: datetime # 过期前需要带着 hold_uid 提交预约
 
 class AppointmentPublic(BaseModel):
     """
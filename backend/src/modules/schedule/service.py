@@ -1,43 +1,398 @@
 # src/modules/schedule/service.py
 
+import heapq
 from datetime import date, datetime, time, timedelta, timezone
+from typing import Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from sqlalchemy import and_, or_
 
-from src.shared.models.resource_models import Service, Resource
-from src.shared.models.user_models import User
+from src.shared.models.resource_models import Location, Service, Resource
+from src.shared.models.user_models import User, technician_service_link_table
 from src.shared.models.schedule_models import Shift
 from src.shared.models.appointment_models import AppointmentTechnicianLink, AppointmentResourceLink, Appointment
 
-from .schemas import AppointmentCreate
+from src.core.config import settings
+from src.core.database import is_replica_session
+
+from .schemas import AppointmentCreate, SlotHoldCreate
+from . import assignment, engine
+from . import cache as availability_cache
+from . import holds as slot_holds
+from . import snapshot as day_snapshot
+from .snapshot import DaySchedule
 
 # 定义时间槽的步长（例如每 10 分钟检查一次）
+# 默认值：服务 / 地点可以各自设置 slot_interval_minutes (服务优先)，都没有设置时使用这里的值
 SLOT_INTERVAL_MINUTES = 10
 # 定义时区 (您服务器或业务所在时区，例如东八区)
 # 确保与数据库中存储的 timezone=True 匹配
 # 这是一个示例，请根据您的服务器配置调整
 LOCAL_TIMEZONE = timezone(timedelta(hours=8), 'Asia/Shanghai') 
 
+# 单个排班 / 单次预约占用的最长时长 (由 admin/schemas.py 在创建排班、服务时校验)。
+# 时间重叠查询会额外加上 start_time > 窗口开始 - MAX_INTERVAL_DURATION，
+# 让 (资源, start_time, end_time) 复合索引上的范围扫描两端都有界，不会扫过全部历史数据。
+MAX_INTERVAL_DURATION = timedelta(hours=24)
+
+# 多天查询接口一次最多查询的天数
+MAX_AVAILABILITY_RANGE_DAYS = 31
+
+# 跨地点 "最早可约" 查询一次最多返回的时间数
+MAX_EARLIEST_SLOTS = 20
+
 # --- 辅助函数：时间范围重叠 ---
 def is_overlap(range1_start, range1_end, range2_start, range2_end):
     """检查两个时间范围 [start, end) 是否重叠"""
     # 确保比较的是同类型（例如都是 aware datetime）
     return range1_start < range2_end and range1_end > range2_start
 
-# --- 核心调度算法 ---
+def _as_local(value: datetime) -> datetime:
+    """
+    数据库驱动 (MySQL DATETIME / SQLite) 读回的时间不带时区，
+    这里把它们视为业务本地时间，以便与带时区的时间比较。
+    (要求数据库会话时区与 LOCAL_TIMEZONE 一致)
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=LOCAL_TIMEZONE)
+    return value
 
-async def get_available_slots(
-    db: AsyncSession, 
-    location_uid: str, 
-    service_uid: str, 
-    target_date: date
+def _local_date(value: datetime) -> date:
+    """取时间在业务本地时区的日期 (不带时区的时间视为本地时间)"""
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(LOCAL_TIMEZONE).date()
+
+def _day_bounds(target_date: date) -> tuple[datetime, datetime]:
+    """将 date 转换为当天的 datetime 范围 (从当天 00:00 到 23:59:59，业务本地时区)"""
+    return (
+        datetime.combine(target_date, time.min, tzinfo=LOCAL_TIMEZONE),
+        datetime.combine(target_date, time.max, tzinfo=LOCAL_TIMEZONE),
+    )
+
+def _compute_day_slots(
+    target_date: date,
+    shifts_by_tech: dict[str, list[engine.Interval]],
+    tech_bookings: dict[str, list[engine.Interval]],
+    room_uids: list[str],
+    room_bookings: dict[str, list[engine.Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    holds: Sequence[slot_holds.SlotHold] = (),
+    step: timedelta | None = None,
 ) -> list[str]:
-    
-    # ----------------------------------------------------
-    # 步骤 1 & 2: 获取服务详情并计算总占用
-    # ----------------------------------------------------
+    """
+    基于已加载到内存中的数据，计算某一天的可用时间槽 (不访问数据库)。
+    shifts_by_tech 是 load_shift_intervals 的结果 (已按地点过滤)，预约按技师 / 房间分组 (见 _group_intervals)；
+    传入的排班 / 预约可以覆盖多天，这里只挑出与 target_date 相关的部分 (不会修改传入的列表)。
+    holds 是该地点有效的预约保留，被保留的技师 / 房间视为已占用。
+    step 是服务 / 地点设置的可预约开始时间步长 (见 _slot_step)，未设置时为 None。
+    """
+    inputs = _day_engine_inputs(
+        target_date, shifts_by_tech, tech_bookings, room_uids, room_bookings, tech_duration, room_duration, holds, step
+    )
+    if inputs is None:
+        return []
+
+    # 交给 engine 计算
+    starts = engine.sweep_available_starts(**inputs)
+
+    # 格式化时间 (例如 "09:00")
+    return [slot.strftime('%H:%M') for slot in starts]
+
+def _compute_day_capacity(
+    target_date: date,
+    shifts_by_tech: dict[str, list[engine.Interval]],
+    tech_bookings: dict[str, list[engine.Interval]],
+    room_uids: list[str],
+    room_bookings: dict[str, list[engine.Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    holds: Sequence[slot_holds.SlotHold] = (),
+    step: timedelta | None = None,
+) -> dict[str, int]:
+    """
+    与 _compute_day_slots 相同，但返回每个可用时间还能同时接的预约数 {"09:00": 2, ...}
+    (engine.sweep_slot_capacity，键与 _compute_day_slots 的结果相同)。
+    """
+    inputs = _day_engine_inputs(
+        target_date, shifts_by_tech, tech_bookings, room_uids, room_bookings, tech_duration, room_duration, holds, step
+    )
+    if inputs is None:
+        return {}
+    return {slot.strftime('%H:%M'): capacity for slot, capacity in engine.sweep_slot_capacity(**inputs)}
+
+def _day_engine_inputs(
+    target_date: date,
+    shifts_by_tech: dict[str, list[engine.Interval]],
+    tech_bookings: dict[str, list[engine.Interval]],
+    room_uids: list[str],
+    room_bookings: dict[str, list[engine.Interval]],
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    holds: Sequence[slot_holds.SlotHold],
+    step: timedelta | None,
+) -> dict | None:
+    """挑出与 target_date 相关的排班 / 预约 / 保留，整理成 engine 的参数；当天不可能有可用时间时返回 None"""
+    day_start, day_end = _day_bounds(target_date)
+
+    # a. 当天在该地点有排班的技师，才是合格技师
+    tech_shifts = {
+        tech_uid: shifts
+        for tech_uid, shifts in shifts_by_tech.items()
+        if any(is_overlap(start, end, day_start, day_end) for start, end in shifts)
+    }
+    if not tech_shifts or not room_uids:
+        return None
+
+    # b. 我们只在技师的最早排班时间和最晚排班时间之间搜索
+    bounds = engine.search_bounds(
+        (interval for shifts in tech_shifts.values() for interval in shifts),
+        day_start,
+        day_end,
+    )
+    if bounds is None:
+        return None # 虽然查到了技师，但他们的排班可能不在今天 (逻辑冗余，以防万一)
+    search_start, search_end = bounds
+    if step is None:
+        # 未设置步长：每 SLOT_INTERVAL_MINUTES 分钟一个，从最早的排班开始算起 (原有行为)
+        step = timedelta(minutes=SLOT_INTERVAL_MINUTES)
+    else:
+        # 设置了步长：网格从当天 00:00 起按步长对齐 (例如步长 30 分钟时只给出 :00 / :30)，
+        # 最早的排班开始不一定在网格上
+        search_start = day_start + (search_start - day_start) // step * step
+
+    # c. 按技师 / 按房间整理当天的预约
+    tech_busy: dict[str, list[engine.Interval]] = {
+        tech_uid: [(start, end) for start, end in intervals if is_overlap(start, end, day_start, day_end)]
+        for tech_uid, intervals in tech_bookings.items()
+        if tech_uid in tech_shifts
+    }
+    room_busy: dict[str, list[engine.Interval]] = {
+        room_uid: [(start, end) for start, end in intervals if is_overlap(start, end, day_start, day_end)]
+        for room_uid, intervals in room_bookings.items()
+    }
+
+    for hold in holds:
+        if hold.technician_id in tech_shifts and is_overlap(hold.start_time, hold.tech_end_time, day_start, day_end):
+            tech_busy.setdefault(hold.technician_id, []).append((hold.start_time, hold.tech_end_time))
+        if is_overlap(hold.start_time, hold.room_end_time, day_start, day_end):
+            room_busy.setdefault(hold.resource_id, []).append((hold.start_time, hold.room_end_time))
+
+    return dict(
+        tech_shifts=tech_shifts,
+        tech_bookings=tech_busy,
+        room_uids=room_uids,
+        room_bookings=room_busy,
+        tech_duration=tech_duration,
+        room_duration=room_duration,
+        search_start=search_start,
+        search_end=search_end,
+        step=step,
+    )
+
+# --- 数据加载 ---
+
+def shift_intervals_query(
+    service_uid: str,
+    location_uid: str,
+    window_start: datetime,
+    window_end: datetime
+):
+    """load_shift_intervals 使用的查询 (单独拆出，便于基准测试脚本查看执行计划)"""
+    return (
+        select(Shift.technician_id, Shift.start_time, Shift.end_time)
+        .join(
+            technician_service_link_table,
+            technician_service_link_table.c.user_id == Shift.technician_id
+        )
+        .where(
+            technician_service_link_table.c.service_id == service_uid,
+            Shift.location_id == location_uid,
+            Shift.start_time < window_end, # 排班开始 < 窗口结束
+            Shift.end_time > window_start,  # 排班结束 > 窗口开始
+            Shift.start_time > window_start - MAX_INTERVAL_DURATION # 索引范围下界
+        )
+        .order_by(Shift.technician_id, Shift.start_time)
+    )
+
+async def load_shift_intervals(
+    db: AsyncSession,
+    service_uid: str,
+    location_uid: str,
+    window_start: datetime,
+    window_end: datetime
+) -> dict[str, list[engine.Interval]]:
+    """
+    加载 能做该服务 的技师在该地点、与 [window_start, window_end] 重叠的排班，
+    按技师分组为 {技师UID: [(开始, 结束), ...]}。
+
+    只查询时间窗口内的排班列 (不加载 User / Shift ORM 对象)，
+    因此无论排班表积累了多少历史数据，返回的数据量只与窗口内的排班数有关。
+    只使用该地点的排班 (与 create_appointment 的校验一致)：
+    技师在其他地点的排班不能用来接这个地点的预约。
+    """
+    query = shift_intervals_query(service_uid, location_uid, window_start, window_end)
+
+    shifts_by_tech: dict[str, list[engine.Interval]] = {}
+    for tech_uid, start_time, end_time in (await db.execute(query)).all():
+        shifts_by_tech.setdefault(tech_uid, []).append((_as_local(start_time), _as_local(end_time)))
+    return shifts_by_tech
+
+def _group_intervals(rows) -> dict[str, list[engine.Interval]]:
+    """把 (技师/房间UID, 开始, 结束) 的查询结果按 UID 分组为 {UID: [(开始, 结束), ...]}"""
+    grouped: dict[str, list[engine.Interval]] = {}
+    for owner_uid, start_time, end_time in rows:
+        grouped.setdefault(owner_uid, []).append((_as_local(start_time), _as_local(end_time)))
+    return grouped
+
+async def _load_bookings(
+    db: AsyncSession,
+    tech_uids: list[str],
+    room_uids: list[str],
+    window_start: datetime,
+    window_end: datetime
+) -> tuple[dict[str, list[engine.Interval]], dict[str, list[engine.Interval]]]:
+    """加载技师 / 房间在时间窗口内的预约，按技师 / 房间分组"""
+    # a. 技师的预约
+    tech_bookings = _group_intervals((await db.execute(
+        select(
+            AppointmentTechnicianLink.technician_id,
+            AppointmentTechnicianLink.start_time,
+            AppointmentTechnicianLink.end_time
+        ).where(
+            AppointmentTechnicianLink.technician_id.in_(tech_uids),
+            AppointmentTechnicianLink.start_time < window_end,
+            AppointmentTechnicianLink.end_time > window_start,
+            AppointmentTechnicianLink.start_time > window_start - MAX_INTERVAL_DURATION # 索引范围下界
+        ).order_by(AppointmentTechnicianLink.start_time)
+    )).all())
+
+    # b. 房间的预约
+    room_bookings = _group_intervals((await db.execute(
+        select(
+            AppointmentResourceLink.resource_id,
+            AppointmentResourceLink.start_time,
+            AppointmentResourceLink.end_time
+        ).where(
+            AppointmentResourceLink.resource_id.in_(room_uids),
+            AppointmentResourceLink.start_time < window_end,
+            AppointmentResourceLink.end_time > window_start,
+            AppointmentResourceLink.start_time > window_start - MAX_INTERVAL_DURATION # 索引范围下界
+        ).order_by(AppointmentResourceLink.start_time)
+    )).all())
+
+    return tech_bookings, room_bookings
+
+async def load_day_schedule(
+    db: AsyncSession,
+    location_uid: str,
+    target_date: date,
+    version: str | None
+) -> DaySchedule:
+    """
+    从数据库加载某地点某一天的完整快照 (固定 6 次查询，与服务无关)：
+    服务时长、当天在该地点的排班、这些技师的技能、房间 (及地点的时间步长)、技师预约、房间预约。
+    """
+    day_start, day_end = _day_bounds(target_date)
+
+    # 1. 服务时长和时间步长 (服务表很小，全部加载)
+    services: dict[str, tuple[timedelta, timedelta]] = {}
+    slot_intervals: dict[str, int] = {}
+    for service_uid, tech_minutes, room_minutes, buffer_minutes, interval_minutes in (await db.execute(
+        select(
+            Service.uid,
+            Service.technician_operation_duration,
+            Service.room_operation_duration,
+            Service.buffer_time,
+            Service.slot_interval_minutes
+        )
+    )).all():
+        services[service_uid] = (
+            timedelta(minutes=tech_minutes + buffer_minutes),
+            timedelta(minutes=room_minutes + buffer_minutes),
+        )
+        if interval_minutes:
+            slot_intervals[service_uid] = interval_minutes
+
+    # 2. 当天在该地点的排班 (所有技师)
+    shifts = _group_intervals((await db.execute(
+        select(Shift.technician_id, Shift.start_time, Shift.end_time)
+        .where(
+            Shift.location_id == location_uid,
+            Shift.start_time < day_end,
+            Shift.end_time > day_start,
+            Shift.start_time > day_start - MAX_INTERVAL_DURATION # 索引范围下界
+        )
+        .order_by(Shift.technician_id, Shift.start_time)
+    )).all())
+    tech_uids = list(shifts)
+
+    # 3. 这些技师能做的服务
+    tech_services: dict[str, set[str]] = {}
+    if tech_uids:
+        for tech_uid, service_uid in (await db.execute(
+            select(technician_service_link_table.c.user_id, technician_service_link_table.c.service_id)
+            .where(technician_service_link_table.c.user_id.in_(tech_uids))
+        )).all():
+            tech_services.setdefault(tech_uid, set()).add(service_uid)
+
+    # 4. 房间和地点的时间步长 (同一次查询)
+    location_rows = (await db.execute(
+        select(Location.slot_interval_minutes, Resource.uid)
+        .outerjoin(Resource, Resource.location_id == Location.uid)
+        .where(Location.uid == location_uid)
+    )).all()
+    room_uids = [room_uid for _, room_uid in location_rows if room_uid is not None]
+    location_slot_interval = location_rows[0][0] if location_rows else None
+
+    # 5. 当天的预约
+    tech_bookings, room_bookings = await _load_bookings(db, tech_uids, room_uids, day_start, day_end)
+
+    return DaySchedule(
+        location_uid=location_uid,
+        target_date=target_date,
+        version=version,
+        services=services,
+        tech_services={tech_uid: frozenset(uids) for tech_uid, uids in tech_services.items()},
+        shifts=shifts,
+        room_uids=room_uids,
+        tech_bookings=tech_bookings,
+        room_bookings=room_bookings,
+        slot_intervals=slot_intervals,
+        location_slot_interval=location_slot_interval,
+    )
+
+async def get_day_schedule(
+    db: AsyncSession,
+    location_uid: str,
+    target_date: date,
+    version: str | None
+) -> DaySchedule:
+    """
+    优先复用进程内版本号一致的快照，否则从数据库加载。
+    version 为 None (Redis 不可用 / 缓存关闭) 时无法判断快照是否过期，每次都重新加载且不保存。
+    """
+    schedule = day_snapshot.get_snapshot(location_uid, target_date, version)
+    if schedule is None:
+        schedule = await load_day_schedule(db, location_uid, target_date, version)
+        if version is not None:
+            day_snapshot.put_snapshot(schedule)
+    return schedule
+
+async def _service_durations(
+    db: AsyncSession,
+    service_uid: str,
+    schedule: DaySchedule | None = None
+) -> tuple[timedelta, timedelta]:
+    """
+    获取服务详情并计算总占用，返回 (技师总占用, 房间总占用)。
+    快照中没有 (例如快照之后新建的服务) 时查询数据库。
+    """
+    if schedule is not None and service_uid in schedule.services:
+        return schedule.services[service_uid]
+
     db_service = (await db.execute(
         select(Service).where(Service.uid == service_uid)
     )).scalars().first()
@@ -51,200 +406,628 @@ async def get_available_slots(
     total_room_duration = timedelta(minutes=(
         db_service.room_operation_duration + db_service.buffer_time
     ))
+    return total_tech_duration, total_room_duration
+
+async def _slot_step(
+    db: AsyncSession,
+    service_uid: str,
+    location_uid: str,
+    schedule: DaySchedule | None = None
+) -> timedelta | None:
+    """
+    可预约开始时间的步长：服务设置的 > 地点设置的；都没有设置时返回 None
+    (使用 SLOT_INTERVAL_MINUTES，网格从最早的排班开始，见 _day_engine_inputs)。
+    有快照时直接从快照中读取，否则查询一次数据库。
+    """
+    if schedule is not None and service_uid in schedule.services:
+        minutes = schedule.slot_intervals.get(service_uid) or schedule.location_slot_interval
+    else:
+        service_minutes, location_minutes = (await db.execute(
+            select(
+                select(Service.slot_interval_minutes).where(Service.uid == service_uid).scalar_subquery(),
+                select(Location.slot_interval_minutes).where(Location.uid == location_uid).scalar_subquery(),
+            )
+        )).one()
+        minutes = service_minutes or location_minutes
+    return timedelta(minutes=minutes) if minutes else None
+
+# --- 缓存 ---
+
+async def invalidate_cached_availability(
+    location_uid: str,
+    start_time: datetime,
+    end_time: datetime
+) -> None:
+    """
+    预约 / 排班变更后调用：使该地点在 [start_time, end_time] 覆盖到的每一天的可用时间缓存失效。
+    """
+    first_day = _local_date(start_time)
+    last_day = _local_date(end_time)
+    dates = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    await availability_cache.invalidate_days(location_uid, dates)
+
+def _holds_valid_until(holds: Sequence[slot_holds.SlotHold], days: list[date]) -> dict[date, float]:
+    """
+    计算结果中包含了预约保留的日期，缓存只在最早的保留过期之前有效 (返回 {日期: Unix 时间})。
+    保留过期不会触发失效，由缓存读取时检查这个时间。
+    """
+    valid_until: dict[date, float] = {}
+    for hold in holds:
+        for day in days:
+            day_start, day_end = _day_bounds(day)
+            if is_overlap(hold.start_time, max(hold.tech_end_time, hold.room_end_time), day_start, day_end):
+                valid_until[day] = min(valid_until.get(day, hold.expires_at), hold.expires_at)
+    return valid_until
+
+def _replica_unsettled(
+    db: AsyncSession,
+    lookup: availability_cache.CacheLookup,
+    days: list[date]
+) -> dict[date, float]:
+    """
+    从只读副本读取时，最近 DB_REPLICA_MAX_LAG_SECONDS 秒内有变更的日期：副本可能还没有同步这次变更。
+    返回 {日期: 副本一定已经同步的时间}。这些日期的结果只缓存到该时间，也不保存为 DaySchedule 快照。
+    """
+    if not is_replica_session(db):
+        return {}
+    now = datetime.now(timezone.utc).timestamp()
+    unsettled = {}
+    for day in days:
+        settled_at = lookup.last_change(day) + settings.DB_REPLICA_MAX_LAG_SECONDS
+        if settled_at > now:
+            unsettled[day] = settled_at
+    return unsettled
+
+def _cache_valid_until(
+    holds: Sequence[slot_holds.SlotHold],
+    days: list[date],
+    unsettled: dict[date, float]
+) -> dict[date, float]:
+    """写入缓存时每个日期的有效期：取预约保留过期时间和副本同步时间中较早的一个"""
+    valid_until = _holds_valid_until(holds, days)
+    for day, settled_at in unsettled.items():
+        valid_until[day] = min(valid_until.get(day, settled_at), settled_at)
+    return valid_until
+
+# --- 核心调度算法 ---
+
+async def get_available_slots(
+    db: AsyncSession,
+    location_uid: str,
+    service_uid: str,
+    target_date: date
+) -> list[str]:
+    """
+    查询某一天的可用时间槽 (优先读取 Redis 缓存，未命中时实时计算并写回)
+    """
+    lookup = await availability_cache.lookup_slots(location_uid, service_uid, [target_date])
+    if target_date in lookup.hits:
+        return lookup.hits[target_date]
+
+    holds = await slot_holds.active_holds(location_uid)
+    unsettled = _replica_unsettled(db, lookup, [target_date])
+    version = None if target_date in unsettled else lookup.version(target_date)
+    slots = await _load_available_slots(
+        db, location_uid, service_uid, target_date, holds, version=version
+    )
+    await availability_cache.store_slots(
+        location_uid, service_uid, lookup, {target_date: slots},
+        valid_until=_cache_valid_until(holds, [target_date], unsettled)
+    )
+    return slots
+
+async def _load_available_slots(
+    db: AsyncSession, 
+    location_uid: str, 
+    service_uid: str, 
+    target_date: date,
+    holds: Sequence[slot_holds.SlotHold] = (),
+    version: str | None = None
+) -> list[str]:
+    """基于当天的 DaySchedule 快照实时计算可用时间槽 (不使用可用时间缓存)"""
     
     # ----------------------------------------------------
-    # 步骤 3: 确定日期的时间范围
+    # 步骤 1: 当天的快照 (服务时长、排班、房间、预约)
     # ----------------------------------------------------
-    # 将 date 转换为 datetime (从当天 00:00 到 23:59:59)
-    # 我们使用您服务器/业务的本地时区
-    day_start = datetime.combine(target_date, time.min, tzinfo=LOCAL_TIMEZONE)
-    day_end = datetime.combine(target_date, time.max, tzinfo=LOCAL_TIMEZONE)
+    schedule = await get_day_schedule(db, location_uid, target_date, version)
 
     # ----------------------------------------------------
-    # 步骤 4.1: 筛选合格的技师 (V6 逻辑)
+    # 步骤 2: 服务的总占用
     # ----------------------------------------------------
-    # a. 找到能做该服务 (service_uid) 的所有技师
-    capable_tech_query = (
-        select(User)
-        .join(User.service)
-        .where(Service.uid == service_uid)
+    total_tech_duration, total_room_duration = await _service_durations(db, service_uid, schedule)
+    step = await _slot_step(db, service_uid, location_uid, schedule)
+
+    # ----------------------------------------------------
+    # 步骤 3: 计算可用时间 (核心算法)
+    # ----------------------------------------------------
+    return _schedule_slots(schedule, service_uid, total_tech_duration, total_room_duration, holds, step)
+
+def _schedule_slots(
+    schedule: DaySchedule,
+    service_uid: str,
+    tech_duration: timedelta,
+    room_duration: timedelta,
+    holds: Sequence[slot_holds.SlotHold] = (),
+    step: timedelta | None = None
+) -> list[str]:
+    """基于快照计算某个服务当天的可用时间槽 (不访问数据库)"""
+    # 能做该服务、且当天在该地点有排班的技师 (V6 逻辑)
+    shifts_by_tech = schedule.shifts_for(service_uid)
+    if not shifts_by_tech or not schedule.room_uids:
+        return [] # 没有技师在上班，或者这个地点没有任何房间/床位
+
+    return _compute_day_slots(
+        target_date=schedule.date,
+        shifts_by_tech=shifts_by_tech,
+        tech_bookings=schedule.tech_bookings,
+        room_uids=schedule.room_uids,
+        room_bookings=schedule.room_bookings,
+        tech_duration=tech_duration,
+        room_duration=room_duration,
+        holds=holds,
+        step=step,
     )
-    capable_techs = (await db.execute(capable_tech_query)).scalars().all()
-    capable_tech_uids = [tech.uid for tech in capable_techs]
 
-    if not capable_tech_uids:
-        return [] # 没有任何技师能做这个服务
+async def get_slot_capacity(
+    db: AsyncSession,
+    location_uid: str,
+    service_uid: str,
+    target_date: date
+) -> dict[str, int]:
+    """
+    查询某一天每个可用时间还能同时接的预约数 {"09:00": 2, ...} (用于团体预约 / 前台)。
+    键与 get_available_slots 的结果相同。
 
-    # b. 在这些技师中，找到在 'target_date' 于 'location_uid' 有排班 (Shift) 的人
-    # 并且预加载排班信息 (shifts)
-    shift_query = (
-        select(User)
-        .options(joinedload(User.shifts)) # 预加载排班
-        .where(
-            User.uid.in_(capable_tech_uids),
-            User.shifts.any(
-                Shift.location_id == location_uid,
-                Shift.start_time < day_end, # 排班开始 < 当天结束
-                Shift.end_time > day_start   # 排班结束 > 当天开始
-            )
+    基于 DaySchedule 快照实时计算 (engine.sweep_slot_capacity)，不读写可用时间缓存：
+    缓存只保存时间列表，容量查询的调用量也远小于普通的可用时间查询。
+    """
+    lookup = await availability_cache.lookup_slots(location_uid, service_uid, [target_date])
+    holds = await slot_holds.active_holds(location_uid)
+    unsettled = _replica_unsettled(db, lookup, [target_date])
+    version = None if target_date in unsettled else lookup.version(target_date)
+
+    schedule = await get_day_schedule(db, location_uid, target_date, version)
+    total_tech_duration, total_room_duration = await _service_durations(db, service_uid, schedule)
+    step = await _slot_step(db, service_uid, location_uid, schedule)
+
+    shifts_by_tech = schedule.shifts_for(service_uid)
+    if not shifts_by_tech or not schedule.room_uids:
+        return {}
+
+    return _compute_day_capacity(
+        target_date=target_date,
+        shifts_by_tech=shifts_by_tech,
+        tech_bookings=schedule.tech_bookings,
+        room_uids=schedule.room_uids,
+        room_bookings=schedule.room_bookings,
+        tech_duration=total_tech_duration,
+        room_duration=total_room_duration,
+        holds=holds,
+        step=step,
+    )
+
+async def get_available_slots_by_location(
+    db: AsyncSession,
+    location_uid: str,
+    target_date: date
+) -> dict[str, list[str]]:
+    """
+    查询某地点某一天所有服务的可用时间槽 (用于小程序的地点页面)，返回 {服务UID: ["08:30", ...]}。
+
+    与逐个服务调用 get_available_slots 结果相同，但：
+        - 缓存一次读取该地点当天所有服务 (一次 Redis 往返)
+        - 未命中的服务共用同一份 DaySchedule 快照计算，数据库查询次数固定 (快照可复用时为 0)，与服务数量无关
+    服务与地点之间没有关联表，这里返回所有服务；当天没有技师能做的服务为空列表。
+    """
+    lookup, hits = await availability_cache.lookup_location_day(location_uid, target_date)
+
+    # 1. 当天的快照 (包含所有服务的时长)
+    holds = await slot_holds.active_holds(location_uid)
+    unsettled = _replica_unsettled(db, lookup, [target_date])
+    version = None if target_date in unsettled else lookup.version(target_date)
+    schedule = await get_day_schedule(db, location_uid, target_date, version)
+
+    # 2. 逐个服务计算 (命中缓存的直接使用)
+    result: dict[str, list[str]] = {}
+    computed: dict[str, list[str]] = {}
+    for service_uid, (tech_duration, room_duration) in schedule.services.items():
+        if service_uid in hits:
+            result[service_uid] = hits[service_uid]
+            continue
+        result[service_uid] = computed[service_uid] = _schedule_slots(
+            schedule, service_uid, tech_duration, room_duration, holds,
+            step=await _slot_step(db, service_uid, location_uid, schedule)
         )
+
+    # 3. 写回未命中的服务
+    await availability_cache.store_services(
+        location_uid, target_date, lookup, computed,
+        valid_until=_cache_valid_until(holds, [target_date], unsettled).get(target_date)
     )
-    qualified_technicians = (await db.execute(shift_query)).scalars().unique().all()
-    qualified_tech_uids = [tech.uid for tech in qualified_technicians]
-    
-    if not qualified_technicians:
-        return [] # 今天这个地点，没有能做这个服务的技师在上班
+    return result
+
+async def get_available_slots_range(
+    db: AsyncSession,
+    location_uid: str,
+    service_uid: str,
+    start_date: date,
+    end_date: date
+) -> dict[str, list[str]]:
+    """
+    一次性查询 [start_date, end_date] 内每一天的可用时间槽 (用于小程序日历)。
+
+    与逐天调用 get_available_slots 结果相同，但整个日期范围只执行固定数量的查询：
+    服务、合格技师、排班、房间、技师预约、房间预约，然后在内存中逐天计算。
+    所有日期都命中缓存时不访问数据库。
+    """
+    if end_date < start_date:
+        raise Exception("结束日期不能早于开始日期")
+    n_days = (end_date - start_date).days + 1
+    if n_days > MAX_AVAILABILITY_RANGE_DAYS:
+        raise Exception(f"查询范围不能超过 {MAX_AVAILABILITY_RANGE_DAYS} 天")
+
+    days = [start_date + timedelta(days=i) for i in range(n_days)]
+    lookup = await availability_cache.lookup_slots(location_uid, service_uid, days)
+    if len(lookup.hits) == n_days:
+        return {day.isoformat(): lookup.hits[day] for day in days}
+
+    holds = await slot_holds.active_holds(location_uid)
+    computed = await _load_available_slots_range(db, location_uid, service_uid, days, holds)
+    await availability_cache.store_slots(
+        location_uid,
+        service_uid,
+        lookup,
+        {day: slots for day, slots in computed.items() if day not in lookup.hits},
+        valid_until=_cache_valid_until(holds, days, _replica_unsettled(db, lookup, days)),
+    )
+    return {day.isoformat(): computed[day] for day in days}
+
+async def _load_available_slots_range(
+    db: AsyncSession,
+    location_uid: str,
+    service_uid: str,
+    days: list[date],
+    holds: Sequence[slot_holds.SlotHold] = ()
+) -> dict[date, list[str]]:
+    """从数据库一次性加载整个日期范围的数据，并在内存中逐天计算 (不使用缓存)"""
 
     # ----------------------------------------------------
-    # 步骤 4.2: 筛选合格的房间
+    # 步骤 1: 服务详情
     # ----------------------------------------------------
-    room_query = select(Resource).where(Resource.location_id == location_uid)
-    qualified_rooms = (await db.execute(room_query)).scalars().all()
-    qualified_room_uids = [room.uid for room in qualified_rooms]
+    total_tech_duration, total_room_duration = await _service_durations(db, service_uid)
+    step = await _slot_step(db, service_uid, location_uid)
 
-    if not qualified_rooms:
-        return [] # 这个地点没有任何房间/床位
+    result: dict[date, list[str]] = {day: [] for day in days}
+
+    window_start, _ = _day_bounds(days[0])
+    _, window_end = _day_bounds(days[-1])
 
     # ----------------------------------------------------
-    # 步骤 5: 获取当天的所有现有预约
+    # 步骤 2: 能做该服务的技师在该地点、整个日期范围内的排班
     # ----------------------------------------------------
-    
-    # a. 技师的预约
-    tech_bookings_query = select(AppointmentTechnicianLink).where(
-        AppointmentTechnicianLink.technician_id.in_(qualified_tech_uids),
-        AppointmentTechnicianLink.start_time < day_end,
-        AppointmentTechnicianLink.end_time > day_start
+    # (具体到哪一天有排班，交给 _compute_day_slots 判断)
+    shifts_by_tech = await load_shift_intervals(
+        db, service_uid, location_uid, window_start, window_end
     )
-    tech_bookings = (await db.execute(tech_bookings_query)).scalars().all()
+    if not shifts_by_tech:
+        return result
 
-    # b. 房间的预约
-    room_bookings_query = select(AppointmentResourceLink).where(
-        AppointmentResourceLink.resource_id.in_(qualified_room_uids),
-        AppointmentResourceLink.start_time < day_end,
-        AppointmentResourceLink.end_time > day_start
+    # ----------------------------------------------------
+    # 步骤 3: 房间
+    # ----------------------------------------------------
+    room_uids = list((await db.execute(
+        select(Resource.uid).where(Resource.location_id == location_uid)
+    )).scalars().all())
+
+    if not room_uids:
+        return result
+
+    # ----------------------------------------------------
+    # 步骤 4: 整个日期范围内的预约
+    # ----------------------------------------------------
+    tech_bookings, room_bookings = await _load_bookings(
+        db, list(shifts_by_tech), room_uids, window_start, window_end
     )
-    room_bookings = (await db.execute(room_bookings_query)).scalars().all()
 
     # ----------------------------------------------------
-    # 步骤 6: 迭代计算 (核心算法)
+    # 步骤 5: 在内存中逐天计算
     # ----------------------------------------------------
-    available_slots = []
-    
-    # 我们只在技师的最早排班时间和最晚排班时间之间搜索
-    # (为简化，我们先从 8:00 到 20:00 搜索，后续可优化)
-    
-    # 确定当天的最早工作时间和最晚工作时间（基于所有排班）
-    all_shifts_today = []
-    for tech in qualified_technicians:
-        for shift in tech.shifts:
-            # 筛选出当天的排班
-            if is_overlap(shift.start_time, shift.end_time, day_start, day_end):
-                all_shifts_today.append(shift)
-    
-    if not all_shifts_today:
-        return [] # 虽然查到了技师，但他们的排班可能不在今天 (逻辑冗余，以防万一)
+    for day in days:
+        result[day] = _compute_day_slots(
+            target_date=day,
+            shifts_by_tech=shifts_by_tech,
+            tech_bookings=tech_bookings,
+            room_uids=room_uids,
+            room_bookings=room_bookings,
+            tech_duration=total_tech_duration,
+            room_duration=total_room_duration,
+            holds=holds,
+            step=step,
+        )
 
-    # 找到搜索的起点和终点
-    search_start = max(day_start, min(s.start_time for s in all_shifts_today))
-    search_end = min(day_end, max(s.end_time for s in all_shifts_today))
+    return result
 
-    current_slot_start = search_start
-    
-    while current_slot_start < search_end:
-        
-        # a. 计算此槽的技师和房间占用时段
-        slot_tech_end = current_slot_start + total_tech_duration
-        slot_room_end = current_slot_start + total_room_duration
-        
-        # b. 检查技师可用性
-        found_tech = False
-        for tech in qualified_technicians:
-            # i. 检查技师是否正在排班
-            is_on_shift = False
-            for shift in tech.shifts:
-                if (shift.start_time <= current_slot_start and 
-                    shift.end_time >= slot_tech_end): # 技师的排班必须完全覆盖技师的操作时间
-                    is_on_shift = True
-                    break
-            
-            if not is_on_shift:
-                continue # 技师不在班，看下一个技师
-            
-            # ii. 检查技师是否已有预约
-            is_booked = False
-            for booking in tech_bookings:
-                if booking.technician_id == tech.uid:
-                    if is_overlap(booking.start_time, booking.end_time, 
-                                  current_slot_start, slot_tech_end):
-                        is_booked = True
-                        break # 技师被占用了，跳出预约循环
-            
-            if not is_booked:
-                found_tech = True # 找到了一个空闲且在班的技师！
-                break # 跳出技师循环
-        
-        if not found_tech:
-            # 没有技师可用，跳到下一个时间槽
-            current_slot_start += timedelta(minutes=SLOT_INTERVAL_MINUTES)
+async def _first_shift_starts(
+    db: AsyncSession,
+    service_uid: str,
+    days: list[date]
+) -> dict[date, list[tuple[datetime, str]]]:
+    """
+    能做该服务的技师在日期范围内的排班 (所有地点，一次查询)，整理为
+    {日期: [(当天最早的排班开始时间, 地点UID), ...]}，按时间排序。
+
+    这是该地点当天最早可约时间的下界：可约时间必须被某个合格技师的排班完整覆盖，
+    所以不会早于最早的排班开始 (跨天的排班从当天 00:00 算起)。没有出现的 (日期, 地点) 当天一定没有可约时间。
+    """
+    window_start, _ = _day_bounds(days[0])
+    _, window_end = _day_bounds(days[-1])
+
+    first_starts: dict[tuple[date, str], datetime] = {}
+    for location_uid, start_time, end_time in (await db.execute(
+        select(Shift.location_id, Shift.start_time, Shift.end_time)
+        .join(
+            technician_service_link_table,
+            technician_service_link_table.c.user_id == Shift.technician_id
+        )
+        .where(
+            technician_service_link_table.c.service_id == service_uid,
+            Shift.start_time < window_end,
+            Shift.end_time > window_start,
+            Shift.start_time > window_start - MAX_INTERVAL_DURATION # 索引范围下界
+        )
+    )).all():
+        start_time, end_time = _as_local(start_time), _as_local(end_time)
+        for day in days:
+            day_start, day_end = _day_bounds(day)
+            if not is_overlap(start_time, end_time, day_start, day_end):
+                continue
+            key = (day, location_uid)
+            first_start = max(start_time, day_start)
+            if key not in first_starts or first_start < first_starts[key]:
+                first_starts[key] = first_start
+
+    by_day: dict[date, list[tuple[datetime, str]]] = {}
+    for (day, location_uid), first_start in first_starts.items():
+        by_day.setdefault(day, []).append((first_start, location_uid))
+    for candidates in by_day.values():
+        candidates.sort()
+    return by_day
+
+async def _load_first_slot(
+    db: AsyncSession,
+    location_uid: str,
+    service_uid: str,
+    target_date: date,
+    holds: Sequence[slot_holds.SlotHold] = (),
+    version: str | None = None,
+    not_before: datetime | None = None
+) -> datetime | None:
+    """
+    基于当天的 DaySchedule 快照计算第一个不早于 not_before 的可用时间 (没有时为 None)。
+    与 get_available_slots 结果的第一个相同，但找到第一个放得下的网格点就停止 (engine.sweep_first_start)。
+    """
+    schedule = await get_day_schedule(db, location_uid, target_date, version)
+    tech_duration, room_duration = await _service_durations(db, service_uid, schedule)
+    step = await _slot_step(db, service_uid, location_uid, schedule)
+
+    shifts_by_tech = schedule.shifts_for(service_uid)
+    if not shifts_by_tech or not schedule.room_uids:
+        return None
+    inputs = _day_engine_inputs(
+        target_date, shifts_by_tech, schedule.tech_bookings, schedule.room_uids, schedule.room_bookings,
+        tech_duration, room_duration, holds, step
+    )
+    if inputs is None:
+        return None
+    return engine.sweep_first_start(**inputs, not_before=not_before)
+
+def _slot_datetime(target_date: date, slot: str) -> datetime:
+    """可用时间 "09:00" -> 当天的 datetime (业务本地时区)"""
+    hour, minute = map(int, slot.split(":"))
+    return datetime.combine(target_date, time(hour, minute), tzinfo=LOCAL_TIMEZONE)
+
+async def find_earliest_slots(
+    db: AsyncSession,
+    service_uid: str,
+    start_date: date,
+    end_date: date,
+    limit: int
+) -> list[tuple[datetime, str]]:
+    """
+    跨所有地点查询某服务最早的 limit 个可约时间，返回 [(开始时间, 地点UID), ...]，按时间排序。
+    已经过去的时间不返回。
+
+    不会对每个 (地点, 日期) 都计算完整的可用时间：
+        - 先用一次查询取出每个 (日期, 地点) 的最早排班开始时间 (见 _first_shift_starts)，
+          没有合格技师排班的 (日期, 地点) 直接跳过
+        - 每个 (地点, 日期, 服务) 当天的第一个可用时间作为摘要缓存在可用时间缓存中 (与完整列表同时失效)，
+          一次 Redis 往返读出所有候选的摘要；未命中的基于快照计算到第一个放得下的网格点为止，再写回
+        - 每天用一个小顶堆合并各地点：堆中先放最早排班开始 (下界)，弹出时才换成该地点真正的第一个可用时间，
+          弹出的可用时间一定是剩下所有候选中最早的。只有下界早于已找到的时间的地点才需要读取摘要
+        - 某个地点的第一个可用时间被选中、还需要更多时，才读取该地点当天的完整列表 (get_available_slots，优先读取缓存)
+        - 凑够 limit 个之后不再计算后面的日期
+    """
+    if end_date < start_date:
+        raise Exception("结束日期不能早于开始日期")
+    n_days = (end_date - start_date).days + 1
+    if n_days > MAX_AVAILABILITY_RANGE_DAYS:
+        raise Exception(f"查询范围不能超过 {MAX_AVAILABILITY_RANGE_DAYS} 天")
+    if not 1 <= limit <= MAX_EARLIEST_SLOTS:
+        raise Exception(f"返回数量必须在 1 到 {MAX_EARLIEST_SLOTS} 之间")
+
+    await _service_durations(db, service_uid) # 服务不存在时抛出异常
+
+    days = [start_date + timedelta(days=i) for i in range(n_days)]
+    candidates_by_day = await _first_shift_starts(db, service_uid, days)
+    lookups, first_hits = await availability_cache.lookup_first_slots(service_uid, [
+        (location_uid, day) for day in days for _, location_uid in candidates_by_day.get(day, ())
+    ])
+    not_before = datetime.now(LOCAL_TIMEZONE)
+    holds_by_location: dict[str, list[slot_holds.SlotHold]] = {}
+
+    async def holds_for(location_uid: str) -> list[slot_holds.SlotHold]:
+        if location_uid not in holds_by_location:
+            holds_by_location[location_uid] = await slot_holds.active_holds(location_uid)
+        return holds_by_location[location_uid]
+
+    async def first_slot(location_uid: str, day: date) -> datetime | None:
+        """该地点当天第一个不早于现在的可用时间 (优先读取摘要，未命中时计算并写回)"""
+        lookup = lookups[location_uid]
+        unsettled = _replica_unsettled(db, lookup, [day])
+        version = None if day in unsettled else lookup.version(day)
+
+        if (location_uid, day) in first_hits:
+            cached = first_hits[(location_uid, day)]
+            first = None if cached is None else _slot_datetime(day, cached)
+        else:
+            holds = await holds_for(location_uid)
+            first = await _load_first_slot(db, location_uid, service_uid, day, holds, version)
+            await availability_cache.store_first_slots(
+                location_uid, service_uid, lookup, {day: first and first.strftime('%H:%M')},
+                valid_until=_cache_valid_until(holds, [day], unsettled)
+            )
+        if first is not None and first < not_before:
+            # 只有今天会出现：当天的第一个可用时间已经过去，从现在起重新找 (不写缓存)
+            first = await _load_first_slot(
+                db, location_uid, service_uid, day, await holds_for(location_uid), version, not_before
+            )
+        return first
+
+    result: list[tuple[datetime, str]] = []
+    for day in days:
+        # (时间, 地点UID, 是否为确定的可用时间)；False 表示最早排班开始 (下界)
+        heap = [(first_start, location_uid, False) for first_start, location_uid in candidates_by_day.get(day, ())]
+        heapq.heapify(heap)
+        following: dict[str, list[datetime]] = {} # 已读取完整列表的地点，剩下的可用时间
+        while heap and len(result) < limit:
+            start_time, location_uid, exact = heapq.heappop(heap)
+            if not exact:
+                first = await first_slot(location_uid, day)
+                if first is not None:
+                    heapq.heappush(heap, (first, location_uid, True))
+                continue
+
+            result.append((start_time, location_uid))
+            if len(result) >= limit:
+                break
+            if location_uid not in following:
+                following[location_uid] = [
+                    slot_time
+                    for slot_time in (
+                        _slot_datetime(day, slot)
+                        for slot in await get_available_slots(db, location_uid, service_uid, day)
+                    )
+                    if slot_time > start_time
+                ]
+            if following[location_uid]:
+                heapq.heappush(heap, (following[location_uid].pop(0), location_uid, True))
+
+        if len(result) >= limit:
+            break
+    return result
+
+# --- 预约并发控制 ---
+
+async def _begin_booking_transaction(db: AsyncSession) -> None:
+    """
+    为创建预约开启一个新事务。
+    1. 结束认证依赖 (get_current_user) 留下的只读事务
+    2. MySQL 下使用 READ COMMITTED：加锁之后的复查必须读到其他事务刚提交的预约，
+       而 InnoDB 默认的 REPEATABLE READ 会一直读事务开始时的快照；同时避免间隙锁
+    """
+    await db.commit()
+    if db.get_bind().dialect.name == "mysql":
+        await db.connection(execution_options={"isolation_level": "READ COMMITTED"})
+
+
+async def _lock_first_free(
+    db: AsyncSession,
+    lock_model,
+    link_column,
+    candidate_uids: list[str],
+    start: datetime,
+    end: datetime
+) -> str | None:
+    """
+    在候选的技师 / 房间中锁定第一个仍然空闲的，返回其 UID (都不空闲时返回 None)。
+    candidate_uids 按优先顺序排列 (见 assignment.rank_candidates)。
+
+    锁的粒度是技师 (users 行) / 房间 (resources 行)，只有争抢同一个技师或房间的预约才会互相等待：
+    1. 先用 SKIP LOCKED 按优先顺序尝试：被其他预约锁住的直接跳过，从不等待，所以这一轮的顺序不会造成死锁
+    2. 如果没有拿到，再按 UID 从小到大阻塞等待刚才跳过的那些
+    拿到锁之后重新检查一次时间重叠，此时读到的是最新提交的预约。
+
+    死锁：所有事务都按 "先技师后房间、UID 从小到大" 的顺序阻塞等待，并且只在要等待的行比自己已持有的
+    同类行都大时才等待，所以不会形成等待环。
+    已持有的行只可能是 "加锁后发现刚被别人订走" 的候选：InnoDB 的行锁要到事务结束才释放
+    (ROLLBACK TO SAVEPOINT 也不会释放)，无法提前放掉，
+    所以 UID 比它们小的候选只会不等待地再试一次 (SKIP LOCKED)，仍被锁住则跳过。
+    """
+    link_table = link_column.class_
+
+    async def try_lock(uid: str, skip_locked: bool) -> bool:
+        locked = (await db.execute(
+            select(lock_model.uid)
+            .where(lock_model.uid == uid)
+            .with_for_update(skip_locked=skip_locked)
+        )).first()
+        return locked is not None
+
+    async def is_free(uid: str) -> bool:
+        booked = (await db.execute(
+            select(link_table.uid).where(
+                link_column == uid,
+                link_table.start_time < end,
+                link_table.end_time > start,
+                link_table.start_time > start - MAX_INTERVAL_DURATION
+            ).limit(1)
+        )).first()
+        return booked is None
+
+    skipped: list[str] = []
+    held: list[str] = [] # 已锁定、但已被预约的候选 (锁要到事务结束才释放)
+    for uid in candidate_uids:
+        if not await try_lock(uid, skip_locked=True):
+            skipped.append(uid)
+        elif await is_free(uid):
+            return uid
+        else:
+            held.append(uid)
+
+    for uid in sorted(skipped):
+        blocking = not held or uid > max(held)
+        if not await try_lock(uid, skip_locked=not blocking):
             continue
+        if await is_free(uid):
+            return uid
+        held.append(uid)
 
-        # c. 检查房间可用性
-        found_room = False
-        for room in qualified_rooms:
-            # i. 检查房间是否已有预约
-            is_booked = False
-            for booking in room_bookings:
-                if booking.resource_id == room.uid:
-                    if is_overlap(booking.start_time, booking.end_time, 
-                                  current_slot_start, slot_room_end):
-                        is_booked = True
-                        break # 房间被占用了，跳出预约循环
-            
-            if not is_booked:
-                found_room = True # 找到了一个空闲的房间！
-                break # 跳出房间循环
-        
-        # d. 决策
-        if found_tech and found_room:
-            # 格式化时间 (例如 "09:00")
-            slot_str = current_slot_start.strftime('%H:%M')
-            available_slots.append(slot_str)
-            
-        # 移到下一个时间槽
-        current_slot_start += timedelta(minutes=SLOT_INTERVAL_MINUTES)
-
-    return available_slots
+    return None
 
-async def create_appointment(
-    db: AsyncSession, 
-    customer: User, # <-- 传入当前登录的用户
-    appt_data: AppointmentCreate
-) -> Appointment:
-    
-    # ----------------------------------------------------
-    # 步骤 1 & 2: 获取服务详情并计算总占用
-    # (与 get_available_slots 相同的逻辑)
-    # ----------------------------------------------------
-    db_service = (await db.execute(
-        select(Service).where(Service.uid == appt_data.service_uid)
-    )).scalars().first()
-    
-    if not db_service:
-        raise Exception("服务项目不存在")
 
-    total_tech_duration = timedelta(minutes=(
-        db_service.technician_operation_duration + db_service.buffer_time
-    ))
-    total_room_duration = timedelta(minutes=(
-        db_service.room_operation_duration + db_service.buffer_time
-    ))
-    
-    # ----------------------------------------------------
-    # 步骤 3: 确定预约的时间范围
-    # ----------------------------------------------------
-    appt_start = appt_data.start_time
-    appt_tech_end = appt_start + total_tech_duration
-    appt_room_end = appt_start + total_room_duration
+async def _free_candidates(
+    db: AsyncSession,
+    service_uid: str,
+    location_uid: str,
+    appt_start: datetime,
+    appt_tech_end: datetime,
+    appt_room_end: datetime,
+    schedule: DaySchedule | None = None
+) -> tuple[list[str], list[str]]:
+    """
+    不加锁地查找该时间段空闲的合格技师和房间，返回 (技师UID列表, 房间UID列表)。
+    只用于过滤掉明显不可用的候选；真正的并发控制在 _lock_first_free (数据库行锁)
+    和 slot_holds.create_hold (Redis 原子操作) 中。
+
+    有当天的快照时直接在内存中判断，不查询数据库。
+    (快照只包含与当天重叠的预约：跨过午夜的预约由加锁后的复查兜底)
+    """
+    if schedule is not None:
+        if not schedule.qualified_technicians(service_uid, appt_start, appt_tech_end):
+            raise Exception("没有技师在此时间排班或排班时间不足")
+        if not schedule.room_uids:
+            raise Exception("该地点没有可用的房间/床位")
+        return schedule.free_candidates(service_uid, appt_start, appt_tech_end, appt_room_end)
 
     # ----------------------------------------------------
     # 步骤 4.1: (重构) 查找空闲的合格技师
@@ -253,7 +1036,7 @@ async def create_appointment(
     
     capable_tech_uids = [
         tech.uid for tech in (await db.execute(
-            select(User).join(User.service).where(Service.uid == appt_data.service_uid)
+            select(User).join(User.service).where(Service.uid == service_uid)
         )).scalars().all()
     ]
     
@@ -262,19 +1045,16 @@ async def create_appointment(
     # 2. 且没有被预约
     # 的技师
     
-    # 使用 FOR UPDATE (Pessimistic Locking) 锁定技师的预约表
-    # 这不是 SQL-Alchemy 异步的直接支持方式，
-    # 我们使用简化的“先检查后创建”逻辑，并依赖事务的原子性
-    
     # 找到所有合格的技师 (在班 + 能做服务)
     shift_query = (
         select(User)
         .join(User.shifts)
         .where(
             User.uid.in_(capable_tech_uids),
-            Shift.location_id == appt_data.location_uid,
+            Shift.location_id == location_uid,
             Shift.start_time <= appt_start, # 技师的排班必须在预约开始前 *开始*
-            Shift.end_time >= appt_tech_end   # 技师的排班必须在预约结束后 *结束*
+            Shift.end_time >= appt_tech_end,  # 技师的排班必须在预约结束后 *结束*
+            Shift.start_time > appt_start - MAX_INTERVAL_DURATION
         )
     )
     qualified_technicians = (await db.execute(shift_query)).scalars().unique().all()
@@ -287,25 +1067,16 @@ async def create_appointment(
         AppointmentTechnicianLink.technician_id.in_([t.uid for t in qualified_technicians]),
         # 检查时间重叠
         AppointmentTechnicianLink.start_time < appt_tech_end,
-        AppointmentTechnicianLink.end_time > appt_start
+        AppointmentTechnicianLink.end_time > appt_start,
+        AppointmentTechnicianLink.start_time > appt_start - MAX_INTERVAL_DURATION
     )
     booked_tech_ids = (await db.execute(booked_techs_query)).scalars().all()
 
-    # 找到第一个空闲的技师
-    available_technician: User | None = None
-    for tech in qualified_technicians:
-        if tech.uid not in booked_tech_ids:
-            available_technician = tech
-            break # 找到一个！
-
-    if not available_technician:
-        raise Exception("该时间段的技师已被预约，请选择其他时间") # 竞态条件失败
-
     # ----------------------------------------------------
     # 步骤 4.2: (重构) 查找空闲的合格房间
     # ----------------------------------------------------
     qualified_rooms = (await db.execute(
-        select(Resource).where(Resource.location_id == appt_data.location_uid)
+        select(Resource).where(Resource.location_id == location_uid)
     )).scalars().all()
 
     if not qualified_rooms:
@@ -315,22 +1086,159 @@ async def create_appointment(
         AppointmentResourceLink.resource_id.in_([r.uid for r in qualified_rooms]),
         # 检查时间重叠
         AppointmentResourceLink.start_time < appt_room_end,
-        AppointmentResourceLink.end_time > appt_start
+        AppointmentResourceLink.end_time > appt_start,
+        AppointmentResourceLink.start_time > appt_start - MAX_INTERVAL_DURATION
     )
     booked_room_ids = (await db.execute(booked_rooms_query)).scalars().all()
 
-    # 找到第一个空闲的房间
-    available_room: Resource | None = None
-    for room in qualified_rooms:
-        if room.uid not in booked_room_ids:
-            available_room = room
-            break # 找到一个！
+    return (
+        [tech.uid for tech in qualified_technicians if tech.uid not in booked_tech_ids],
+        [room.uid for room in qualified_rooms if room.uid not in booked_room_ids],
+    )
+
+def _exclude_held(
+    holds: Sequence[slot_holds.SlotHold],
+    tech_uids: list[str],
+    room_uids: list[str],
+    appt_start: datetime,
+    appt_tech_end: datetime,
+    appt_room_end: datetime
+) -> tuple[list[str], list[str]]:
+    """从候选中去掉在该时间段被其他客户保留的技师 / 房间"""
+    held_techs = {
+        hold.technician_id for hold in holds
+        if is_overlap(hold.start_time, hold.tech_end_time, appt_start, appt_tech_end)
+    }
+    held_rooms = {
+        hold.resource_id for hold in holds
+        if is_overlap(hold.start_time, hold.room_end_time, appt_start, appt_room_end)
+    }
+    return (
+        [uid for uid in tech_uids if uid not in held_techs],
+        [uid for uid in room_uids if uid not in held_rooms],
+    )
+
+def _prefer(candidates: list[str], uid: str) -> list[str]:
+    """把 uid 移到候选的最前面 (不在候选中时原样返回)"""
+    if uid not in candidates:
+        return candidates
+    return [uid] + [candidate for candidate in candidates if candidate != uid]
 
-    if not available_room:
+async def _booking_day_schedule(
+    db: AsyncSession,
+    location_uid: str,
+    appt_start: datetime
+) -> DaySchedule | None:
+    """预约开始当天的快照；无法确认快照是否最新 (Redis 不可用) 时返回 None，改为直接查询数据库"""
+    target_date = _local_date(appt_start)
+    version = await availability_cache.day_version(location_uid, target_date)
+    if version is None:
+        return None
+    return await get_day_schedule(db, location_uid, target_date, version)
+
+async def create_appointment(
+    db: AsyncSession, 
+    customer: User, # <-- 传入当前登录的用户
+    appt_data: AppointmentCreate
+) -> Appointment:
+
+    # ----------------------------------------------------
+    # 步骤 0: 开启预约事务 (READ COMMITTED)
+    # ----------------------------------------------------
+    await _begin_booking_transaction(db)
+    
+    # ----------------------------------------------------
+    # 步骤 1: 当天的快照 (通常在客户查询可用时间时已经加载过)
+    # ----------------------------------------------------
+    appt_start = appt_data.start_time
+    schedule = await _booking_day_schedule(db, appt_data.location_uid, appt_start)
+
+    # ----------------------------------------------------
+    # 步骤 2 & 3: 获取服务详情，确定预约的时间范围
+    # ----------------------------------------------------
+    total_tech_duration, total_room_duration = await _service_durations(db, appt_data.service_uid, schedule)
+    appt_tech_end = appt_start + total_tech_duration
+    appt_room_end = appt_start + total_room_duration
+
+    # ----------------------------------------------------
+    # 步骤 4: 确定候选的技师 / 房间
+    # ----------------------------------------------------
+    if appt_data.hold_uid:
+        # a. 使用之前保留的技师和房间，不再重新搜索
+        held = await slot_holds.get_hold(appt_data.hold_uid)
+        if held is None:
+            raise Exception("预约保留已过期，请重新选择时间")
+        info, hold = held
+        if (
+            info["customer"] != customer.uid
+            or info["service"] != appt_data.service_uid
+            or info["location"] != appt_data.location_uid
+            or hold.start_time != appt_start
+        ):
+            raise Exception("预约信息与保留的时间不一致")
+        tech_candidates, room_candidates = [hold.technician_id], [hold.resource_id]
+        consumed_holds = [appt_data.hold_uid]
+    else:
+        # b. 搜索空闲的技师和房间，并排除被其他客户保留的 (客户自己的保留不算占用)
+        active_holds = await slot_holds.active_holds(appt_data.location_uid)
+        own_holds = [
+            hold for hold in active_holds
+            if hold.customer_id == customer.uid and is_overlap(
+                hold.start_time, max(hold.tech_end_time, hold.room_end_time),
+                appt_start, max(appt_tech_end, appt_room_end)
+            )
+        ]
+        tech_candidates, room_candidates = _exclude_held(
+            [hold for hold in active_holds if hold.customer_id != customer.uid],
+            *await _free_candidates(
+                db, appt_data.service_uid, appt_data.location_uid,
+                appt_start, appt_tech_end, appt_room_end, schedule
+            ),
+            appt_start, appt_tech_end, appt_room_end
+        )
+        # c. 按分配策略排序 (优先选择留下碎片最少的技师 / 房间)
+        tech_candidates, room_candidates = assignment.rank_candidates(
+            settings.APPOINTMENT_ASSIGNMENT_STRATEGY, schedule,
+            tech_candidates, room_candidates, appt_start, appt_tech_end, appt_room_end
+        )
+        # d. 客户保留了同一时间 (没有带 hold_uid 提交)：优先使用保留的技师和房间，预约成功后释放这些保留
+        for hold in own_holds:
+            if hold.start_time == appt_start:
+                tech_candidates = _prefer(tech_candidates, hold.technician_id)
+                room_candidates = _prefer(room_candidates, hold.resource_id)
+        consumed_holds = [hold.uid for hold in own_holds]
+
+    # ----------------------------------------------------
+    # 步骤 5: 锁定技师和房间 (SELECT ... FOR UPDATE 后复查)
+    # ----------------------------------------------------
+    available_technician_uid = await _lock_first_free(
+        db,
+        User,
+        AppointmentTechnicianLink.technician_id,
+        tech_candidates,
+        appt_start,
+        appt_tech_end
+    )
+
+    if not available_technician_uid:
+        await db.rollback()
+        raise Exception("该时间段的技师已被预约，请选择其他时间") # 竞态条件失败
+
+    available_room_uid = await _lock_first_free(
+        db,
+        Resource,
+        AppointmentResourceLink.resource_id,
+        room_candidates,
+        appt_start,
+        appt_room_end
+    )
+
+    if not available_room_uid:
+        await db.rollback()
         raise Exception("该时间段的房间已被预约，请选择其他时间") # 竞态条件失败
 
     # ----------------------------------------------------
-    # 步骤 5: 创建所有记录 (事务)
+    # 步骤 6: 创建所有记录 (事务)
     # ----------------------------------------------------
     try:
         # 1. 创建 Appointment 主记录
@@ -347,7 +1255,7 @@ async def create_appointment(
         # 2. 创建 技师 占用记录
         tech_link = AppointmentTechnicianLink(
             appointment_id=new_appointment.uid,
-            technician_id=available_technician.uid,
+            technician_id=available_technician_uid,
             start_time=appt_start,
             end_time=appt_tech_end
         )
@@ -356,19 +1264,93 @@ async def create_appointment(
         # 3. 创建 房间 占用记录
         room_link = AppointmentResourceLink(
             appointment_id=new_appointment.uid,
-            resource_id=available_room.uid,
+            resource_id=available_room_uid,
             start_time=appt_start,
             end_time=appt_room_end
         )
         db.add(room_link)
 
-        # 4. 提交事务
+        # 4. 提交事务 (同时释放技师 / 房间的行锁)
         await db.commit()
-        
-        return new_appointment
 
     except Exception as e:
         # 如果任何一步失败（例如数据库的唯一约束冲突），则全部回滚
         await db.rollback()
         print(f"创建预约时发生严重错误: {e}")
-        raise Exception(f"预约失败，请重试。错误: {e}")
\ No newline at end of file
+        raise Exception(f"预约失败，请重试。错误: {e}")
+
+    # 5. 提交成功后，释放客户的保留，并使该地点相关日期的可用时间缓存失效
+    for hold_uid in consumed_holds:
+        await slot_holds.release_hold(hold_uid)
+    await invalidate_cached_availability(
+        appt_data.location_uid,
+        appt_start,
+        max(appt_tech_end, appt_room_end)
+    )
+
+    return new_appointment
+
+# --- 预约保留 ---
+
+async def create_slot_hold(
+    db: AsyncSession,
+    customer: User,
+    hold_data: SlotHoldCreate
+) -> slot_holds.SlotHold:
+    """
+    为客户保留一个具体的技师和房间 SLOT_HOLD_TTL_SECONDS 秒 (不写数据库)。
+    之后带着 hold_uid 调用 create_appointment 即可直接使用保留的技师和房间。
+    """
+    appt_start = hold_data.start_time
+    schedule = await _booking_day_schedule(db, hold_data.location_uid, appt_start)
+    total_tech_duration, total_room_duration = await _service_durations(db, hold_data.service_uid, schedule)
+    appt_tech_end = appt_start + total_tech_duration
+    appt_room_end = appt_start + total_room_duration
+    tech_candidates, room_candidates = await _free_candidates(
+        db, hold_data.service_uid, hold_data.location_uid,
+        appt_start, appt_tech_end, appt_room_end, schedule
+    )
+    if not tech_candidates:
+        raise Exception("该时间段的技师已被预约，请选择其他时间")
+    if not room_candidates:
+        raise Exception("该时间段的房间已被预约，请选择其他时间")
+
+    # 与其他保留的冲突检查和占用在 Lua 脚本中原子完成 (按分配策略的顺序选择第一个没有被保留的)
+    tech_candidates, room_candidates = assignment.rank_candidates(
+        settings.APPOINTMENT_ASSIGNMENT_STRATEGY, schedule,
+        tech_candidates, room_candidates, appt_start, appt_tech_end, appt_room_end
+    )
+    hold = await slot_holds.create_hold(
+        customer.uid,
+        hold_data.service_uid,
+        hold_data.location_uid,
+        appt_start,
+        appt_tech_end,
+        appt_room_end,
+        tech_candidates,
+        room_candidates
+    )
+
+    # 被保留的容量在可用时间中视为已占用
+    await invalidate_cached_availability(
+        hold_data.location_uid,
+        appt_start,
+        max(appt_tech_end, appt_room_end)
+    )
+    return hold
+
+async def release_slot_hold(customer: User, hold_uid: str) -> None:
+    """客户放弃保留 (例如退出确认页面)，让出技师和房间"""
+    held = await slot_holds.get_hold(hold_uid)
+    if held is None:
+        return # 已过期或已被使用
+    info, hold = held
+    if info["customer"] != customer.uid:
+        raise Exception("无权释放该预约保留")
+
+    await slot_holds.release_hold(hold_uid)
+    await invalidate_cached_availability(
+        info["location"],
+        hold.start_time,
+        max(hold.tech_end_time, hold.room_end_time)
+    )
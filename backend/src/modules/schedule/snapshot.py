@@ -0,0 +1,134 @@
+# src/modules/schedule/snapshot.py
+
+"""
+某地点某一天的排班 / 预约快照 (DaySchedule)
+
+查询可用时间和创建预约都需要同一份数据：服务时长、技师技能、当天排班、房间、当天预约。
+这里把它们从数据库中一次性加载出来，整理成按技师 / 按房间分组的区间列表，
+放在进程内的 LRU 中复用，同一天的多次查询 (不同服务)、以及最终的预约检查都不必再各自查询 5~7 次数据库。
+
+版本号：
+    快照带有一个版本号，取自 Redis 可用时间缓存的 (全局版本号, 日期版本号)。
+    预约、排班、技能等任何变更都会递增这两个版本号之一 (见 cache.py)，
+    版本号不一致的快照直接丢弃重建。Redis 不可用时没有版本号，此时不使用快照。
+    另外快照最多使用 AVAILABILITY_CACHE_TTL_SECONDS 秒 (与 Redis 缓存相同)，
+    不依赖版本号永远不会重复：Redis 数据丢失 (重启、清空) 后版本号会从 0 重新开始。
+"""
+
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from src.core.config import settings
+
+from .engine import Interval
+
+
+class DaySchedule:
+    """
+    某地点某一天的只读快照。
+    所有时间都已转换为带时区的本地时间，区间列表按开始时间排序。
+    """
+    __slots__ = (
+        "location_uid", "date", "version",
+        "services", "tech_services", "shifts", "room_uids", "tech_bookings", "room_bookings",
+        "slot_intervals", "location_slot_interval", "loaded_at",
+    )
+
+    def __init__(
+        self,
+        location_uid: str,
+        target_date: date,
+        version: str | None,
+        services: dict[str, tuple[timedelta, timedelta]],
+        tech_services: dict[str, frozenset[str]],
+        shifts: dict[str, list[Interval]],
+        room_uids: list[str],
+        tech_bookings: dict[str, list[Interval]],
+        room_bookings: dict[str, list[Interval]],
+        slot_intervals: dict[str, int] | None = None,
+        location_slot_interval: int | None = None,
+    ):
+        self.location_uid = location_uid
+        self.date = target_date
+        self.version = version
+        self.services = services            # {服务UID: (技师总占用, 房间总占用)}
+        self.tech_services = tech_services  # {技师UID: 能做的服务UID集合} (只包含当天有排班的技师)
+        self.shifts = shifts                # {技师UID: [排班区间]} (该地点、与当天重叠)
+        self.room_uids = room_uids
+        self.tech_bookings = tech_bookings  # {技师UID: [已占用区间]}
+        self.room_bookings = room_bookings  # {房间UID: [已占用区间]}
+        self.slot_intervals = slot_intervals or {}      # {服务UID: 时间步长 (分钟)} (只包含设置了步长的服务)
+        self.location_slot_interval = location_slot_interval  # 地点的时间步长 (分钟)，未设置时为 None
+        self.loaded_at = time.monotonic()
+
+    def shifts_for(self, service_uid: str) -> dict[str, list[Interval]]:
+        """能做该服务的技师的排班"""
+        return {
+            tech_uid: shifts
+            for tech_uid, shifts in self.shifts.items()
+            if service_uid in self.tech_services.get(tech_uid, ())
+        }
+
+    def qualified_technicians(self, service_uid: str, start: datetime, tech_end: datetime) -> list[str]:
+        """能做该服务、且有一个排班完整覆盖 [start, tech_end] 的技师"""
+        return [
+            tech_uid for tech_uid, shifts in self.shifts_for(service_uid).items()
+            if any(s <= start and e >= tech_end for s, e in shifts)
+        ]
+
+    def free_candidates(
+        self,
+        service_uid: str,
+        start: datetime,
+        tech_end: datetime,
+        room_end: datetime
+    ) -> tuple[list[str], list[str]]:
+        """
+        该时间段空闲的合格技师和房间 (在班 + 能做服务 + 没有预约)。
+        与 service._free_candidates 的数据库查询结果相同，用于不加锁的预检查。
+        """
+        techs = [
+            tech_uid for tech_uid in self.qualified_technicians(service_uid, start, tech_end)
+            if not any(s < tech_end and e > start for s, e in self.tech_bookings.get(tech_uid, ()))
+        ]
+        rooms = [
+            room_uid for room_uid in self.room_uids
+            if not any(s < room_end and e > start for s, e in self.room_bookings.get(room_uid, ()))
+        ]
+        return techs, rooms
+
+
+# --- 进程内 LRU ---
+
+_snapshots: "OrderedDict[tuple[str, date], DaySchedule]" = OrderedDict()
+
+
+def get_snapshot(location_uid: str, target_date: date, version: str | None) -> DaySchedule | None:
+    """取出版本号一致、且未超过有效期的快照；否则直接丢弃"""
+    if version is None:
+        return None
+    key = (location_uid, target_date)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        return None
+    if (
+        snapshot.version != version
+        or time.monotonic() - snapshot.loaded_at > settings.AVAILABILITY_CACHE_TTL_SECONDS
+    ):
+        del _snapshots[key]
+        return None
+    _snapshots.move_to_end(key)
+    return snapshot
+
+
+def put_snapshot(snapshot: DaySchedule) -> None:
+    """放入快照，超过 DAY_SCHEDULE_CACHE_SIZE 时淘汰最久未使用的"""
+    if settings.DAY_SCHEDULE_CACHE_SIZE <= 0:
+        return
+    key = (snapshot.location_uid, snapshot.date)
+    _snapshots[key] = snapshot
+    _snapshots.move_to_end(key)
+    while len(_snapshots) > settings.DAY_SCHEDULE_CACHE_SIZE:
+        _snapshots.popitem(last=False)
+
@@ -4,6 +4,10 @@ import psutil
 import os
 from fastapi import APIRouter
 
+from src.core.database import pool_status
+from src.core.metrics import endpoint_sql_snapshot
+from src.modules.auth.service import password_executor
+
 router = APIRouter(
     tags=["Test 测试"],
     responses={404: {"description": "Not found"}},
@@ -44,4 +48,19 @@ async def memory_info():
     return {
         "memory_mb": process.memory_info().rss / 1024 / 1024
         #"workers": 2  # 你的worker数量
-    }
\ No newline at end of file
+    }
+
+@router.get("/password-hash")
+async def password_hash_stats():
+    """密码哈希线程池的状态 (排队数、执行中、已完成、已拒绝)"""
+    return password_executor.stats()
+
+@router.get("/db-pool")
+async def db_pool_stats():
+    """数据库连接池的状态 (已借出 / 空闲 / 溢出) 和累计指标 (取连接次数、等待时间、超时次数)"""
+    return pool_status()
+
+@router.get("/sql-stats")
+async def sql_stats():
+    """按接口累计的 SQL 统计 (平均 / 最大条数、平均数据库耗时、疑似 N+1 的请求数)"""
+    return endpoint_sql_snapshot()
@@ -1,9 +1,20 @@
 # src/shared/deps/arq.py
-from fastapi import Request
-from arq.connections import ArqRedis
+from typing import TYPE_CHECKING
 
-def get_arq_pool(request: Request) -> ArqRedis:
+from fastapi import HTTPException, Request, status
+
+if TYPE_CHECKING:
+    from arq.connections import ArqRedis
+
+def get_arq_pool(request: Request) -> "ArqRedis":
     """
     一个 FastAPI 依赖项，用于从 app.state 中获取 arq 连接池。
+    连接池由 src/core/lifespan.py 在启动时创建；未安装 arq 或 Redis 不可用时为 None。
     """
-    return request.app.state.arq_pool
\ No newline at end of file
+    arq_pool = getattr(request.app.state, "arq_pool", None)
+    if arq_pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="任务队列暂不可用"
+        )
+    return arq_pool
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 import datetime
-from sqlalchemy import Column, String, Integer, Enum, ForeignKey, DateTime, func
+from sqlalchemy import Column, String, Integer, Enum, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from src.core.database import Base
 import ulid
@@ -23,6 +23,12 @@ class AppointmentTechnicianLink(Base):
     appointment: Mapped["Appointment"] = relationship("Appointment", back_populates="technician_link")
     technician: Mapped["User"] = relationship("User") # 单向关联到 User
 
+    __table_args__ = (
+        # 可用时间计算 / 预约校验的时间重叠查询:
+        # technician_id IN (...) AND start_time < :end AND end_time > :start
+        Index("ix_appt_tech_links_tech_time", "technician_id", "start_time", "end_time"),
+    )
+
 # 预约模型
 class Appointment(Base):
     __tablename__ = "appointments"
@@ -67,4 +73,9 @@ class AppointmentResourceLink(Base):
     end_time: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     appointment: Mapped["Appointment"] = relationship("Appointment", back_populates="resources_link")
-    resource: Mapped["Resource"] = relationship("Resource") # 单向关联到 Resource
\ No newline at end of file
+    resource: Mapped["Resource"] = relationship("Resource") # 单向关联到 Resource
+
+    __table_args__ = (
+        # resource_id IN (...) AND start_time < :end AND end_time > :start
+        Index("ix_appt_resource_links_resource_time", "resource_id", "start_time", "end_time"),
+    )
@@ -13,6 +13,8 @@ class Location(Base):
     uid: Mapped[str] = mapped_column(String(26), primary_key=True, default=lambda: str(ulid.new()), index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     address: Mapped[str] = mapped_column(String(255), nullable=True)
+    # 可预约开始时间的步长 (分钟)，为空时使用系统默认 (schedule.service.SLOT_INTERVAL_MINUTES)
+    slot_interval_minutes: Mapped[int | None] = mapped_column(Integer, nullable=True, comment="in minutes")
     resources: Mapped[list["Resource"]] = relationship("Resource", back_populates="location")
     shifts: Mapped[list["Shift"]] = relationship(
         "Shift",
@@ -42,6 +44,8 @@ class Service(Base):
     technician_operation_duration: Mapped[int] = mapped_column(Integer, comment="in minutes")
     room_operation_duration: Mapped[int] = mapped_column(Integer, comment="in minutes")
     buffer_time: Mapped[int] = mapped_column(Integer, default=15, comment="in minutes")
+    # 可预约开始时间的步长 (分钟)，为空时使用地点的设置
+    slot_interval_minutes: Mapped[int | None] = mapped_column(Integer, nullable=True, comment="in minutes")
 
     technicians: Mapped[list["User"]] = relationship(
         "User", secondary=technician_service_link_table, back_populates="service"
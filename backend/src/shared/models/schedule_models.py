@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 import datetime
-from sqlalchemy import Column, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from src.core.database import Base
 import ulid
@@ -39,4 +39,11 @@ class Shift(Base):
     location: Mapped["Location"] = relationship(
         "Location", 
         back_populates="shifts"
-    )
\ No newline at end of file
+    )
+
+    __table_args__ = (
+        # 可用时间计算: location_id = :loc AND start_time < :end AND end_time > :start
+        Index("ix_shifts_location_time", "location_id", "start_time", "end_time"),
+        # 排班防重叠检查 / 预约校验: technician_id = :tech AND start_time < :end AND end_time > :start
+        Index("ix_shifts_technician_time", "technician_id", "start_time", "end_time"),
+    )